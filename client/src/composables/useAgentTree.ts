@@ -1,5 +1,6 @@
 import { computed } from 'vue'
 import { useEventsStore } from '../stores/events'
+import { isSessionEvent } from '../types/events'
 
 export interface AgentNode { session_id: string; trace_id: string; parent_session_id: string | null; children: AgentNode[]; startTime: number; stopped: boolean; agent_type: string }
 
@@ -9,6 +10,7 @@ export function useAgentTree() {
     const nodeMap = new Map<string, AgentNode>()
     const stoppedSessions = new Set<string>()
     store.events.forEach(e => {
+      if (!isSessionEvent(e)) return
       if (e.event_type === 'SessionStart' || e.event_type === 'SubagentStart') {
         if (!nodeMap.has(e.session_id)) {
           let agentType = 'unknown'
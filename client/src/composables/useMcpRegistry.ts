@@ -2,7 +2,7 @@ import { computed } from 'vue'
 import { useEventsStore } from '../stores/events'
 import { parseEvent } from '../types/events'
 
-interface McpServer { name: string; tools: string[]; lastSeen: number; calls: number; failures: number }
+interface McpServer { name: string; tools: string[]; lastSeen: number; calls: number; failures: number; timedCalls: number; totalMs: number; maxMs: number }
 
 export function useMcpRegistry() {
   const store = useEventsStore()
@@ -10,16 +10,22 @@ export function useMcpRegistry() {
     const registry = new Map<string, McpServer>()
     store.events.forEach(e => {
       const p = parseEvent(e).payload
-      if (!p.is_mcp_tool) return
-      const serverName = String(p.mcp_server ?? 'unknown')
-      const toolName = String(p.tool_name ?? '')
-      if (!registry.has(serverName)) registry.set(serverName, { name: serverName, tools: [], lastSeen: e.timestamp, calls: 0, failures: 0 })
+      if (!p.is_mcp_tool && !p.is_mcp) return
+      const toolName = String(p.tool_name ?? p.tool ?? '')
+      const serverName = String(p.mcp_server ?? toolName.split('__')[1] ?? 'unknown')
+      if (!registry.has(serverName)) registry.set(serverName, { name: serverName, tools: [], lastSeen: e.timestamp, calls: 0, failures: 0, timedCalls: 0, totalMs: 0, maxMs: 0 })
       const server = registry.get(serverName)
       if (!server) return
       if (e.timestamp > server.lastSeen) server.lastSeen = e.timestamp
       if (!server.tools.includes(toolName)) server.tools.push(toolName)
       if (e.event_type === 'PostToolUse') server.calls++
       if (e.event_type === 'PostToolUseFailure') server.failures++
+      // Span duration measured by the hooks between PreToolUse and this event
+      if (typeof p.duration_ms === 'number') {
+        server.timedCalls++
+        server.totalMs += p.duration_ms
+        if (p.duration_ms > server.maxMs) server.maxMs = p.duration_ms
+      }
     })
     return [...registry.values()].sort((a, b) => b.lastSeen - a.lastSeen)
   })
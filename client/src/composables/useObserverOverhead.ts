@@ -0,0 +1,103 @@
+import { computed } from 'vue'
+import { useEventsStore } from '../stores/events'
+import { parseEvent } from '../types/events'
+
+const BASELINE_WINDOWS = 12
+const GROWTH_FACTOR = 1.5
+const MIN_GROWTH_MS = 5
+
+interface Histogram { count: number; sum_ms: number; max_ms: number; buckets: number[] }
+interface Window { start: number; invocations: number; timeouts: number; errors: number; bounds: number[]; run: Histogram; startup: Histogram }
+
+export interface AppOverhead {
+  sourceApp: string
+  invocations: number
+  p95Ms: number          // hook run time, dispatch to exit, in the latest window
+  baselineP95Ms: number  // median p95 of the windows before it
+  avgStartupMs: number
+  timeouts: number
+  errors: number
+  lastWindow: number
+  growing: boolean
+}
+
+function emptyHistogram(): Histogram {
+  return { count: 0, sum_ms: 0, max_ms: 0, buckets: [] }
+}
+
+function mergeHistogram(into: Histogram, h: unknown) {
+  if (!h || typeof h !== 'object') return
+  const src = h as Partial<Histogram>
+  into.count += Number(src.count) || 0
+  into.sum_ms += Number(src.sum_ms) || 0
+  into.max_ms = Math.max(into.max_ms, Number(src.max_ms) || 0)
+  const buckets = src.buckets ?? []
+  buckets.forEach((n, i) => { into.buckets[i] = (into.buckets[i] ?? 0) + (Number(n) || 0) })
+}
+
+// Upper bound of the bucket holding the 95th percentile; the max for the overflow bucket
+export function p95(h: Histogram, bounds: number[]): number {
+  if (h.count === 0) return 0
+  const target = Math.ceil(h.count * 0.95)
+  let seen = 0
+  for (let i = 0; i < h.buckets.length; i++) {
+    seen += h.buckets[i] ?? 0
+    if (seen >= target) return i < bounds.length ? Math.min(bounds[i], h.max_ms) : h.max_ms
+  }
+  return h.max_ms
+}
+
+function median(values: number[]): number {
+  if (values.length === 0) return 0
+  const sorted = [...values].sort((a, b) => a - b)
+  return sorted[Math.floor(sorted.length / 2)]
+}
+
+export function useObserverOverhead() {
+  const store = useEventsStore()
+  const apps = computed<AppOverhead[]>(() => {
+    // source_app -> window start -> window summed over hosts
+    const byApp = new Map<string, Map<number, Window>>()
+    store.events.forEach(e => {
+      if (e.event_type !== 'HookTelemetry') return
+      const p = parseEvent(e).payload
+      const start = Number(p.window_start)
+      if (!Number.isFinite(start)) return
+      if (!byApp.has(e.source_app)) byApp.set(e.source_app, new Map())
+      const windows = byApp.get(e.source_app)!
+      if (!windows.has(start)) {
+        windows.set(start, { start, invocations: 0, timeouts: 0, errors: 0, bounds: (p.bucket_bounds_ms as number[]) ?? [], run: emptyHistogram(), startup: emptyHistogram() })
+      }
+      const w = windows.get(start)!
+      const outcomes = (p.outcomes ?? {}) as Record<string, number>
+      const phases = (p.phases ?? {}) as Record<string, unknown>
+      w.invocations += Number(p.invocations) || 0
+      w.timeouts += Number(outcomes.timeout) || 0
+      w.errors += (Number(outcomes.error) || 0) + (Number(outcomes.server_error) || 0)
+      mergeHistogram(w.run, phases.run)
+      mergeHistogram(w.startup, phases.startup)
+    })
+    const result: AppOverhead[] = []
+    byApp.forEach((windows, sourceApp) => {
+      const ordered = [...windows.values()].sort((a, b) => a.start - b.start)
+      const latest = ordered[ordered.length - 1]
+      const p95Ms = p95(latest.run, latest.bounds)
+      const baseline = ordered.slice(-1 - BASELINE_WINDOWS, -1).map(w => p95(w.run, w.bounds))
+      const baselineP95Ms = median(baseline)
+      result.push({
+        sourceApp,
+        invocations: latest.invocations,
+        p95Ms,
+        baselineP95Ms,
+        avgStartupMs: latest.startup.count ? latest.startup.sum_ms / latest.startup.count : 0,
+        timeouts: latest.timeouts,
+        errors: latest.errors,
+        lastWindow: latest.start,
+        growing: latest.timeouts > 0
+          || (baseline.length > 0 && p95Ms > baselineP95Ms * GROWTH_FACTOR && p95Ms - baselineP95Ms >= MIN_GROWTH_MS),
+      })
+    })
+    return result.sort((a, b) => Number(b.growing) - Number(a.growing) || b.p95Ms - a.p95Ms)
+  })
+  return { apps }
+}
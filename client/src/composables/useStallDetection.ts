@@ -1,5 +1,6 @@
 import { computed } from 'vue'
 import { useEventsStore } from '../stores/events'
+import { isSessionEvent } from '../types/events'
 
 const STALL_THRESHOLD_MS = 60_000
 const STOPPED_EVENT_TYPES = new Set(['Stop', 'SubagentStop', 'SessionEnd'])
@@ -16,6 +17,7 @@ export function useStallDetection() {
   const lastEventBySession = computed<Record<string, { timestamp: number; event_type: string }>>(() => {
     const result: Record<string, { timestamp: number; event_type: string }> = {}
     store.events.forEach(e => {
+      if (!isSessionEvent(e)) return
       if (!result[e.session_id] || e.timestamp > result[e.session_id].timestamp) {
         result[e.session_id] = { timestamp: e.timestamp, event_type: e.event_type }
       }
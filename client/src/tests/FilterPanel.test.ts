@@ -20,6 +20,15 @@ describe('FilterPanel', () => {
     expect(store.activeFilters.source_app).toBe('app-a')
   })
 
+  it('leaves the hook telemetry placeholder out of the session list', () => {
+    const store = useEventsStore()
+    store.addEvent({ id:1, event_type:'SessionStart', session_id:'s1', trace_id:'t1', source_app:'app-a', tags:'[]', payload:'{}', timestamp: Date.now() })
+    store.addEvent({ id:2, event_type:'HookTelemetry', session_id:'hook-telemetry', trace_id:'hook-telemetry', source_app:'app-a', tags:'[]', payload:'{}', timestamp: Date.now() })
+    const wrapper = mount(FilterPanel, { global: { plugins: [getActivePinia()!] } })
+    const sessions = wrapper.findAll('[data-filter="session_id"] option').map(o => o.attributes('value'))
+    expect(sessions).toEqual(['', 's1'])
+  })
+
   it('clear button resets all filters', async () => {
     const store = useEventsStore()
     store.setFilter('source_app', 'app-a')
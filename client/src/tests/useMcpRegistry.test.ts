@@ -21,4 +21,15 @@ describe('useMcpRegistry', () => {
     const ctx7 = servers.value.find(s => s.name === 'context7')
     expect(ctx7?.failures).toBe(1)
   })
+
+  it('aggregates span latency from hook events', () => {
+    const store = useEventsStore()
+    store.addEvent({ id: 1, event_type: 'PostToolUse', session_id: 's1', trace_id: 't1', source_app: 'app', tags: '[]', payload: JSON.stringify({ tool: 'mcp__github__get_issue', is_mcp: true, span_id: 'a', duration_ms: 120 }), timestamp: Date.now() })
+    store.addEvent({ id: 2, event_type: 'PostToolUseFailure', session_id: 's1', trace_id: 't1', source_app: 'app', tags: '[]', payload: JSON.stringify({ tool: 'mcp__github__get_issue', is_mcp: true, span_id: 'b', duration_ms: 40 }), timestamp: Date.now() })
+    const { servers } = useMcpRegistry()
+    const github = servers.value.find(s => s.name === 'github')
+    expect(github?.timedCalls).toBe(2)
+    expect(github?.totalMs).toBe(160)
+    expect(github?.maxMs).toBe(120)
+  })
 })
@@ -0,0 +1,55 @@
+// client/src/tests/useObserverOverhead.test.ts
+import { describe, it, expect, beforeEach } from 'vitest'
+import { createPinia, setActivePinia } from 'pinia'
+import { useEventsStore } from '../stores/events'
+import { useObserverOverhead, p95 } from '../composables/useObserverOverhead'
+
+beforeEach(() => setActivePinia(createPinia()))
+
+const BOUNDS = [0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096]
+
+function telemetry(id: number, app: string, windowStart: number, runBuckets: number[], outcomes: Record<string, number> = { ok: 1 }) {
+  const count = runBuckets.reduce((a, b) => a + b, 0)
+  return {
+    id, event_type: 'HookTelemetry', session_id: 'hook-telemetry', trace_id: 'hook-telemetry', source_app: app, tags: '[]',
+    payload: JSON.stringify({
+      window_start: windowStart, window_secs: 300, bucket_bounds_ms: BOUNDS, invocations: count, outcomes,
+      phases: { run: { count, sum_ms: count * 10, max_ms: 3000, buckets: runBuckets }, startup: { count, sum_ms: count * 30, max_ms: 40, buckets: [] } },
+    }),
+    timestamp: windowStart + 300_000,
+  }
+}
+
+describe('useObserverOverhead', () => {
+  it('estimates p95 from histogram buckets', () => {
+    expect(p95({ count: 20, sum_ms: 0, max_ms: 50, buckets: [0, 0, 0, 0, 19, 1] }, BOUNDS)).toBe(4)
+    expect(p95({ count: 2, sum_ms: 0, max_ms: 9000, buckets: [...Array(15).fill(0), 2] }, BOUNDS)).toBe(9000)
+  })
+
+  it('flags an app whose hook p95 grew against its earlier windows', () => {
+    const store = useEventsStore()
+    const fast = [0, 0, 0, 0, 0, 0, 10]  // all under 16ms
+    const slow = [0, 0, 0, 0, 0, 0, 0, 0, 0, 10]  // all under 128ms
+    store.addEvent(telemetry(1, 'api', 0, fast))
+    store.addEvent(telemetry(2, 'api', 300_000, fast))
+    store.addEvent(telemetry(3, 'api', 600_000, slow))
+    store.addEvent(telemetry(4, 'web', 600_000, fast))
+    const { apps } = useObserverOverhead()
+    const api = apps.value.find(a => a.sourceApp === 'api')
+    expect(api?.p95Ms).toBe(128)
+    expect(api?.baselineP95Ms).toBe(16)
+    expect(api?.growing).toBe(true)
+    expect(apps.value[0].sourceApp).toBe('api')
+    expect(apps.value.find(a => a.sourceApp === 'web')?.growing).toBe(false)
+  })
+
+  it('flags timeouts and sums windows reported by several hosts', () => {
+    const store = useEventsStore()
+    store.addEvent(telemetry(1, 'api', 0, [0, 0, 0, 0, 5]))
+    store.addEvent(telemetry(2, 'api', 0, [0, 0, 0, 0, 5], { ok: 4, timeout: 1 }))
+    const { apps } = useObserverOverhead()
+    expect(apps.value[0].invocations).toBe(10)
+    expect(apps.value[0].timeouts).toBe(1)
+    expect(apps.value[0].growing).toBe(true)
+  })
+})
@@ -30,4 +30,13 @@ describe('useStallDetection', () => {
     const { stalledSessions } = useStallDetection()
     expect(stalledSessions.value['done-sess']).toBeUndefined()
   })
+
+  it('does not count a window rollup as activity or as a session', () => {
+    const store = useEventsStore()
+    store.addEvent({ id: 1, event_type: 'PreToolUse', session_id: 'quiet-sess', trace_id: 't1', source_app: 'app', tags: '[]', payload: '{}', timestamp: Date.now() - 90_000 })
+    store.addEvent({ id: 2, event_type: 'MetricRollup', session_id: 'metric-rollup', trace_id: 'metric-rollup', source_app: 'app', tags: '[]', payload: '{"sessions":{"quiet-sess":{}}}', timestamp: Date.now() - 10_000 })
+    const { stalledSessions } = useStallDetection()
+    expect(stalledSessions.value['quiet-sess']).toBeDefined()
+    expect(stalledSessions.value['metric-rollup']).toBeUndefined()
+  })
 })
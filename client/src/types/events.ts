@@ -23,6 +23,22 @@ export function parseEvent(e: StoredEvent): ParsedEvent {
   return { ...e, tags, payload }
 }
 
+// HookTelemetry and the per-window MetricRollup are posted by the hooks under
+// these placeholder session_ids: they are not sessions and must not show up as
+// (or keep alive) one
+export const HOOK_TELEMETRY_SESSION = 'hook-telemetry'
+export const METRIC_ROLLUP_SESSION = 'metric-rollup'
+
+const HOST_EVENT_TYPES = new Set(['HookTelemetry', 'MetricRollup'])
+
+export function isHostSession(sessionId: string): boolean {
+  return sessionId === HOOK_TELEMETRY_SESSION || sessionId === METRIC_ROLLUP_SESSION
+}
+
+export function isSessionEvent(e: { session_id: string; event_type?: string }): boolean {
+  return !isHostSession(e.session_id) && !HOST_EVENT_TYPES.has(e.event_type ?? '')
+}
+
 export const EVENT_EMOJIS: Record<string, string> = {
   PreToolUse:          '🔧',
   PostToolUse:         '✅',
@@ -37,6 +53,9 @@ export const EVENT_EMOJIS: Record<string, string> = {
   SessionStart:        '🚀',
   SessionEnd:          '🏁',
   GuardBlock:          '🚫',
+  TokenUsage:          '🪙',
+  MetricRollup:        '📈',
+  HookTelemetry:       '🩺',
 }
 
 export const TOOL_EMOJIS: Record<string, string> = {
@@ -4,21 +4,285 @@ from __future__ import annotations
 import json
 import os
 import sys
-import urllib.request
-import urllib.error
-from typing import Any
+import time
+
+# Hooks pay for every import on every tool call: keep this module's imports
+# to what the hot path needs and defer the rest (typing alone costs ~15ms).
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Any, Callable
 
 OBS_SERVER = os.environ.get("OBS_SERVER", "http://localhost:4000")
 SOURCE_APP = os.environ.get("CLAUDE_SOURCE_APP", "unknown")
 STOP_HOOK_ACTIVE = os.environ.get("STOP_HOOK_ACTIVE", "").lower() in ("1", "true")
 
+# Payload budgets, in UTF-8 bytes as sent on the wire. See sanitize().
+FIELD_BUDGET = int(os.environ.get("OBS_FIELD_BUDGET", "16384"))
+EVENT_BUDGET = int(os.environ.get("OBS_EVENT_BUDGET", "65536"))
+BLOB_BUDGET = int(os.environ.get("OBS_BLOB_BUDGET", str(1024 * 1024)))  # blob content per event
+BLOB_MIN_CHARS = int(os.environ.get("OBS_BLOB_MIN_CHARS", "4096"))  # 0 disables blob refs
+BLOB_MAX_CHARS = int(os.environ.get("OBS_BLOB_MAX_CHARS", str(1024 * 1024)))
+BLOB_TTL_SECS = float(os.environ.get("OBS_BLOB_TTL_SECS", "3600"))
+BLOB_PREVIEW_CHARS = 200
+MAX_DEPTH = 12
+
+# This process's own overhead, reported by _telemetry: nanoseconds spent per
+# phase and delivery outcomes. Plain counters, so measuring costs ~nothing.
+PHASE_NS = dict.fromkeys(("parse", "build", "serialize", "network"), 0)
+OUTCOMES: dict[str, int] = {}
+
+
+def env_flag(name: str) -> bool:
+    """True when an opt-in environment switch is set to 1/true."""
+    return os.environ.get(name, "").lower() in ("1", "true")
+
+
+def state_dir() -> str:
+    """Per-user directory for hook-local state (relay socket, caches).
+
+    Override with OBS_STATE_DIR; defaults to $XDG_CACHE_HOME/obs-hooks.
+    """
+    path = os.environ.get("OBS_STATE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "obs-hooks"
+    )
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+
+def spawn_detached(module: str, *args: str, backoff_secs: float = 5.0) -> None:
+    """Start ``python -m <module>`` in the background, detached from the hook.
+
+    Rate-limited through a marker file in the state dir so a burst of hook
+    processes starts one helper, not one each.
+    """
+    marker = os.path.join(state_dir(), f"{module.lstrip('_')}.spawn")
+    try:
+        if time.time() - os.stat(marker).st_mtime < backoff_secs:
+            return
+    except FileNotFoundError:
+        pass
+    try:
+        with open(marker, "a"):
+            pass
+        os.utime(marker)
+    except OSError:
+        return
+    import subprocess
+
+    # dirname(__file__) is the hooks directory, or the .pyz when zipped.
+    here = os.path.dirname(os.path.abspath(__file__))
+    pythonpath = os.pathsep.join(p for p in (here, os.environ.get("PYTHONPATH", "")) if p)
+    try:
+        subprocess.Popen(
+            [sys.executable, "-m", module, *args],
+            env=dict(os.environ, PYTHONPATH=pythonpath),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+            close_fds=True,
+        )
+    except OSError:
+        pass
+
+
+class _Sanitizer:
+    """Single pass over a payload that enforces the budgets as it copies.
+
+    Strings are sliced before anything is built from them, so a multi-MB
+    tool response costs a walk and a slice, not a full str() or json.dumps.
+    Only strings that could fit are encoded to measure their UTF-8 size.
+    """
+
+    def __init__(self, field_budget: int, event_budget: int, blob_min: int, blob_budget: int) -> None:
+        self.field_budget = field_budget
+        self.remaining = event_budget
+        self.blob_min = blob_min
+        self.blob_remaining = blob_budget
+        self.truncated: list[str] = []
+        self.blobs: dict[str, str] = {}
+        self.blobs_dropped: list[str] = []
+
+    def walk(self, value: Any, path: str, depth: int = 0) -> Any:
+        if isinstance(value, str):
+            return self.string(value, path)
+        if value is None or isinstance(value, (bool, int, float)):
+            self.remaining -= 8
+            return value
+        if depth >= MAX_DEPTH:
+            self.truncated.append(path)
+            return "…[nested too deep]"
+        if isinstance(value, dict):
+            out = {}
+            for i, (key, item) in enumerate(value.items()):
+                if self.remaining <= 0:
+                    out["…"] = f"[+{len(value) - i} keys]"
+                    self.truncated.append(f"{path}.*" if path else "*")
+                    break
+                key = str(key)
+                self.remaining -= _utf8_len(key) + 4
+                out[key] = self.walk(item, f"{path}.{key}" if path else key, depth + 1)
+            return out
+        if isinstance(value, (list, tuple)):
+            items = []
+            for i, item in enumerate(value):
+                if self.remaining <= 0:
+                    items.append(f"…[+{len(value) - i} items]")
+                    self.truncated.append(f"{path}[*]")
+                    break
+                self.remaining -= 2
+                items.append(self.walk(item, f"{path}[{i}]", depth + 1))
+            return items
+        return self.string(f"<{type(value).__name__}>", path)
+
+    def string(self, value: str, path: str) -> Any:
+        if self.blob_min and len(value) >= self.blob_min:
+            return self.blob(value, path)
+        return self.inline(value, path)
+
+    def inline(self, value: str, path: str) -> str:
+        n = len(value)
+        limit = max(0, min(self.field_budget, self.remaining))
+        # Every char is at least one byte, so only a short string can fit.
+        size = n if n > limit else _utf8_len(value)
+        if size > limit:
+            kept = value[:limit].encode("utf-8", "surrogatepass")[:limit].decode("utf-8", "ignore")
+            self.truncated.append(path)
+            self.remaining -= limit + 32
+            return f"{kept}…[truncated {n - len(kept)} chars]"
+        self.remaining -= size + 2
+        return value
+
+    def blob(self, value: str, path: str) -> Any:
+        """Replace a large string with a content-hash reference.
+
+        Content that would overrun the event's blob budget is not attached;
+        the string is cut inline instead and its path listed in blobs_dropped.
+        """
+        import hashlib
+
+        n = len(value)
+        content = value[:BLOB_MAX_CHARS] if n > BLOB_MAX_CHARS else value
+        data = content.encode("utf-8", "surrogatepass")
+        digest = hashlib.sha256(data).hexdigest()
+        if digest not in self.blobs and not _blob_recently_sent(digest):
+            if len(data) > self.blob_remaining:
+                self.blobs_dropped.append(path)
+                return self.inline(value, path)
+            self.blob_remaining -= len(data)
+            self.blobs[digest] = content
+        ref: dict[str, Any] = {"$blob": digest, "chars": n, "preview": value[:BLOB_PREVIEW_CHARS]}
+        if len(content) < n:
+            ref["clipped"] = len(content)
+            self.truncated.append(path)
+        self.remaining -= BLOB_PREVIEW_CHARS + 120
+        return ref
+
+
+def _utf8_len(value: str) -> int:
+    return len(value) if value.isascii() else len(value.encode("utf-8", "surrogatepass"))
+
+
+def _blob_recently_sent(digest: str) -> bool:
+    """True if this hook host handed the blob on recently (see _mark_blobs_sent).
+
+    One empty marker file per blob in the state dir, aged out after
+    OBS_BLOB_TTL_SECS so the server gets the content again eventually.
+    """
+    try:
+        marker = os.path.join(state_dir(), "blobs", digest)
+        return time.time() - os.stat(marker).st_mtime < BLOB_TTL_SECS
+    except OSError:
+        return False
+
+
+def _mark_blobs_sent(digests) -> None:
+    """Record blobs as sent, once the event carrying them was accepted.
+
+    Marking them earlier would leave later refs pointing at content the
+    server never got whenever that event is dropped.
+    """
+    try:
+        directory = os.path.join(state_dir(), "blobs")
+        os.makedirs(directory, exist_ok=True)
+        for digest in digests:
+            marker = os.path.join(directory, digest)
+            with open(marker, "a"):
+                pass
+            os.utime(marker)
+        now = time.time()
+        if int(now * 1000) % 100 == 0:  # occasional sweep of stale markers
+            for entry in os.scandir(directory):
+                if now - entry.stat().st_mtime > BLOB_TTL_SECS:
+                    os.unlink(entry.path)
+    except OSError:
+        pass
+
+
+def sanitize(
+    payload: dict[str, Any],
+    *,
+    field_budget: int | None = None,
+    event_budget: int | None = None,
+    blob_min: int | None = None,
+    blob_budget: int | None = None,
+) -> tuple[dict[str, Any], list[str], dict[str, str]]:
+    """Bound a payload to the per-field and per-event budgets (UTF-8 bytes).
+
+    Returns (payload copy, paths that were cut, blobs). Over-long strings
+    end in "…[truncated N chars]"; strings of at least blob_min chars become
+    {"$blob": sha256, "chars", "preview"} references whose content is
+    returned in blobs (only if not sent recently) for the server to store,
+    up to blob_budget bytes of content per event.
+    post_event marks them sent once the event is accepted.
+    """
+    s = _sanitizer(field_budget, event_budget, blob_min, blob_budget)
+    return s.walk(payload, ""), s.truncated, s.blobs
+
+
+def _sanitizer(field_budget: int | None = None, event_budget: int | None = None,
+               blob_min: int | None = None, blob_budget: int | None = None) -> _Sanitizer:
+    return _Sanitizer(
+        FIELD_BUDGET if field_budget is None else field_budget,
+        EVENT_BUDGET if event_budget is None else event_budget,
+        BLOB_MIN_CHARS if blob_min is None else blob_min,
+        BLOB_BUDGET if blob_budget is None else blob_budget,
+    )
+
+
+def preview(value: Any, limit: int) -> str:
+    """Short text rendering of any JSON-ish value without rendering all of it."""
+    if isinstance(value, str):
+        return value[:limit]
+    bounded, _, _ = sanitize({"v": value}, field_budget=limit, event_budget=limit, blob_min=0)
+    return json.dumps(bounded["v"], ensure_ascii=False)[:limit]
+
 
 def read_hook_input() -> dict[str, Any]:
     """Read and parse JSON from stdin."""
+    t = time.perf_counter_ns()
     try:
         return json.loads(sys.stdin.read())
     except (json.JSONDecodeError, EOFError):
         return {}
+    finally:
+        PHASE_NS["parse"] += time.perf_counter_ns() - t
+
+
+def run_hook(main: Callable[[dict[str, Any]], None]) -> None:
+    """Entry point of every hook script: read stdin, run ``main``, report overhead.
+
+    Standalone ``<event>.py`` commands and dispatch.py both come through
+    here, so HookTelemetry covers whichever way the hooks are installed.
+    """
+    started = time.perf_counter_ns()
+    data = read_hook_input()
+    try:
+        main(data)
+    finally:
+        import _telemetry
+        if _telemetry.enabled():
+            _telemetry.record(data, started)
 
 
 def build_payload(
@@ -30,36 +294,178 @@ def build_payload(
     parent_session_id: str | None = None,
     trace_id: str | None = None,
 ) -> dict[str, Any]:
-    """Build the event dict for POST /events."""
+    """Build the event dict for POST /events, with the payload sanitized.
+
+    Without an explicit trace_id, a subagent session registered by
+    SubagentStart (see _registry) gets its root trace, parent and depth.
+    """
+    t = time.perf_counter_ns()
     try:
         tags = json.loads(os.environ.get("HOOK_TAGS", "[]"))
     except json.JSONDecodeError:
         tags = []
-    return {
+    s = _sanitizer()
+    clean = s.walk(payload or {}, "")
+    if s.truncated:
+        clean["_truncated"] = s.truncated
+    if s.blobs_dropped:
+        clean["_blobs_dropped"] = s.blobs_dropped
+    if trace_id is None and isinstance(session_id, str):
+        import _registry
+        entry = _registry.lookup(session_id)
+        if entry is not None:
+            trace_id = entry["trace_id"]
+            parent_session_id = parent_session_id or entry["parent"]
+            clean.setdefault("depth", entry["depth"])
+    event = {
         "event_type": event_type,
         "session_id": session_id,
         "source_app": source_app,
-        "payload": payload or {},
+        "payload": clean,
         "tags": tags,
         "parent_session_id": parent_session_id,
         "trace_id": trace_id or session_id,
     }
+    if s.blobs:
+        event["blobs"] = s.blobs
+    PHASE_NS["build"] += time.perf_counter_ns() - t
+    return event
 
 
 def post_event(payload: dict[str, Any]) -> None:
-    """POST event to server. Silent on failure — never blocks the agent."""
+    """Deliver event to the server. Silent on failure — never blocks the agent.
+
+    With OBS_RELAY=1 the event is handed to the local relay daemon (started on
+    first use); if the relay is unavailable it falls back to a direct POST.
+    Events the server does not accept in time are written to the spool.
+    """
     if STOP_HOOK_ACTIVE:
         return
+    data = serialize(payload)
+    if data is not None and deliver(data) and payload.get("blobs"):
+        _mark_blobs_sent(payload["blobs"])
+
+
+def serialize(payload: dict[str, Any]) -> bytes | None:
+    """Encode an event for the wire; None if it cannot be encoded."""
+    # Stamp the hook-side time: delivery may be deferred by the relay.
+    payload.setdefault("timestamp", int(time.time() * 1000))
+    t = time.perf_counter_ns()
+    try:
+        text = json.dumps(payload, ensure_ascii=False)
+        try:
+            return text.encode()  # as measured by the budgets, not \uXXXX-escaped
+        except UnicodeEncodeError:
+            return json.dumps(payload).encode()  # lone surrogates: escaped, still valid JSON
+    except (TypeError, ValueError):
+        return None
+    finally:
+        PHASE_NS["serialize"] += time.perf_counter_ns() - t
+
+
+def deliver(data: bytes) -> bool:
+    """Send one encoded event via the relay or directly.
+
+    True once the relay, the server or the spool has taken it.
+    """
+    t = time.perf_counter_ns()
+    try:
+        if env_flag("OBS_RELAY"):
+            import _relay
+            if _relay.send(data):
+                _count("relayed")
+                return True
+        return _post_direct(data)
+    finally:
+        PHASE_NS["network"] += time.perf_counter_ns() - t
+
+
+def _count(outcome: str) -> None:
+    OUTCOMES[outcome] = OUTCOMES.get(outcome, 0) + 1
+
+
+def _post_direct(data: bytes) -> bool:
+    """One-shot POST /events with a 1s timeout; spool on failure. True if accepted or spooled."""
     server = os.environ.get("OBS_SERVER", OBS_SERVER)
     try:
-        data = json.dumps(payload).encode()
-        req = urllib.request.Request(
-            f"{server}/events",
-            data=data,
-            headers={"Content-Type": "application/json"},
-            method="POST",
-        )
-        with urllib.request.urlopen(req, timeout=1.0):
-            pass
+        status = _http_post(f"{server}/events", data, timeout=1.0)
+    except Exception as e:
+        status = None
+        # socket.timeout is TimeoutError; urllib wraps it in URLError.reason.
+        _count("timeout" if isinstance(getattr(e, "reason", e), TimeoutError) else "error")
+    else:
+        _count("ok" if status < 400 else "rejected" if status < 500 else "server_error")
+    if status is None or status >= 500:
+        return _spool_quietly(data)
+    if not env_flag("OBS_RELAY"):
+        # Without a relay nobody drains the spool; do it out of band.
+        import _spool
+        _spool.replay_in_background()
+    return status < 400
+
+
+def _http_post(url: str, body: bytes, timeout: float) -> int:
+    return http_request("POST", url, body, timeout=timeout)[0]
+
+
+def http_request(
+    method: str,
+    url: str,
+    body: bytes | None = None,
+    *,
+    headers: dict[str, str] | None = None,
+    timeout: float = 1.0,
+) -> tuple[int, dict[str, str], bytes]:
+    """Minimal HTTP/1.1 client: (status, lower-cased headers, body). Raises OSError.
+
+    Plain http:// goes over a bare socket: urllib.request drags in
+    http.client, email and ssl, which triples a hook's startup time.
+    """
+    if not url.startswith("http://"):
+        import urllib.error
+        import urllib.request
+
+        req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json", **(headers or {})}, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                return resp.status, {k.lower(): v for k, v in resp.headers.items()}, resp.read()
+        except urllib.error.HTTPError as e:
+            return e.code, {k.lower(): v for k, v in e.headers.items()}, e.read()
+    import socket
+
+    hostport, _, path = url[len("http://"):].partition("/")
+    host, _, port = hostport.rpartition(":") if hostport.rfind(":") > hostport.rfind("]") else (hostport, "", "")
+    host = host.strip("[]")
+    lines = [f"{method} /{path} HTTP/1.1", f"Host: {hostport}", "Connection: close"]
+    if body is not None:
+        lines += ["Content-Type: application/json", f"Content-Length: {len(body)}"]
+    lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+    request = ("\r\n".join(lines) + "\r\n\r\n").encode() + (body or b"")
+    with socket.create_connection((host, int(port or 80)), timeout=timeout) as sock:
+        sock.sendall(request)
+        reader = sock.makefile("rb")
+        # b"HTTP/1.1 201 Created\r\n"
+        status = int(reader.readline(256).split(None, 2)[1])
+        resp_headers: dict[str, str] = {}
+        while (line := reader.readline(8192)) not in (b"\r\n", b"\n", b""):
+            key, _, value = line.decode("latin-1").partition(":")
+            resp_headers[key.strip().lower()] = value.strip()
+        if method == "HEAD" or status in (204, 304):
+            return status, resp_headers, b""
+        if resp_headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while (size := int(reader.readline(64).split(b";")[0] or b"0", 16)) > 0:
+                chunks.append(reader.read(size))
+                reader.readline(8)
+            return status, resp_headers, b"".join(chunks)
+        if "content-length" in resp_headers:
+            return status, resp_headers, reader.read(int(resp_headers["content-length"]))
+        return status, resp_headers, reader.read()
+
+
+def _spool_quietly(data: bytes) -> bool:
+    try:
+        import _spool
+        return _spool.append([data])
     except Exception:
-        pass
+        return False
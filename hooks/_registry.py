@@ -0,0 +1,106 @@
+"""Host-local session registry: which trace a session belongs to, and how deep.
+
+SubagentStart registers the new session under ``<state dir>/sessions`` as
+one small JSON file: its parent, the parent's root trace_id (or the parent
+itself when the parent is a root) and depth = parent depth + 1. Every later
+event from that session looks its own file up by name in build_payload, so
+subagent events carry the swarm's root trace_id without walking parents.
+Sessions that were never registered are their own root at depth 0.
+
+Files are written to a temp name and renamed into place, so concurrent hook
+processes see a whole entry or none. Entries expire OBS_REGISTRY_TTL_SECS
+after their last use; a lookup refreshes an entry once it is half way
+there, and each registration sweeps out expired ones.
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+
+import _base
+
+TTL_SECS = float(os.environ.get("OBS_REGISTRY_TTL_SECS", "86400"))
+
+
+def registry_dir() -> str:
+    return os.path.join(_base.state_dir(), "sessions")
+
+
+def _path(session_id: str) -> str:
+    bare = session_id.replace("-", "").replace("_", "").replace(".", "")
+    if len(session_id) <= 128 and session_id[:1] not in ("", ".") and bare.isascii() and bare.isalnum():
+        name = session_id  # session ids are UUIDs: no hashing on the hot path
+    else:
+        import hashlib
+
+        name = "~" + hashlib.sha1(session_id.encode()).hexdigest()[:16]
+    return os.path.join(registry_dir(), name + ".json")
+
+
+def lookup(session_id: str, now: float | None = None) -> dict | None:
+    """{"parent", "trace_id", "depth"} for a registered session, else None."""
+    path = _path(session_id)
+    try:
+        with open(path, "rb") as f:
+            age = (time.time() if now is None else now) - os.fstat(f.fileno()).st_mtime
+            if age > TTL_SECS:
+                return None
+            entry = json.loads(f.read())
+        if age > TTL_SECS / 2:
+            os.utime(path)
+    except (OSError, ValueError):
+        return None
+    return entry if isinstance(entry, dict) and entry.get("session_id") == session_id else None
+
+
+def register(session_id: str, parent_session_id: str | None) -> dict:
+    """Record a subagent under its parent's root trace; returns the entry.
+
+    Without a parent the session is a root and nothing is written.
+    """
+    if not parent_session_id or parent_session_id == session_id:
+        return {"session_id": session_id, "parent": None, "trace_id": session_id, "depth": 0}
+    parent = lookup(parent_session_id)
+    entry = {
+        "session_id": session_id,
+        "parent": parent_session_id,
+        "trace_id": parent["trace_id"] if parent else parent_session_id,
+        "depth": parent["depth"] + 1 if parent else 1,
+    }
+    path = _path(session_id)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(registry_dir(), mode=0o700, exist_ok=True)
+        with open(tmp, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+        sweep()
+    except OSError:
+        pass  # the session's events fall back to their own trace
+    return entry
+
+
+def discard(session_id: str) -> None:
+    try:
+        os.unlink(_path(session_id))
+    except OSError:
+        pass
+
+
+def sweep(now: float | None = None) -> int:
+    """Remove expired entries (and temp files of writers that died). Returns the count."""
+    now = time.time() if now is None else now
+    removed = 0
+    try:
+        entries = list(os.scandir(registry_dir()))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if now - entry.stat().st_mtime > TTL_SECS:
+                os.unlink(entry.path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
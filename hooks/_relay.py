@@ -0,0 +1,289 @@
+"""Local relay daemon between hook processes and the observability server.
+
+Hooks hand each serialized event to the relay over a Unix domain socket
+(``send``) instead of opening their own HTTP connection. The relay coalesces
+events into batches by size and time window and forwards them to
+POST /events/batch over a small pool of keep-alive connections. Batches the
+server cannot take go to the on-disk spool, which the relay also replays.
+
+Run in the foreground with ``python -m _relay``; hooks start it on demand
+when OBS_RELAY=1. It exits by itself after OBS_RELAY_IDLE_SECS without events.
+"""
+from __future__ import annotations
+
+import os
+import socket
+import sys
+import time
+
+import _base
+
+BATCH_MAX = int(os.environ.get("OBS_RELAY_BATCH", "200"))
+WINDOW_MS = int(os.environ.get("OBS_RELAY_WINDOW_MS", "50"))
+POOL_SIZE = int(os.environ.get("OBS_RELAY_POOL", "2"))
+IDLE_EXIT_SECS = float(os.environ.get("OBS_RELAY_IDLE_SECS", "900"))
+SEND_TIMEOUT = 0.05
+SHUTDOWN_GRACE_SECS = 0.2
+
+
+def socket_path() -> str:
+    return os.environ.get("OBS_RELAY_SOCKET") or os.path.join(_base.state_dir(), "relay.sock")
+
+
+def send(data: bytes) -> bool:
+    """Hand one serialized event to the relay. False means: use the fallback."""
+    if not hasattr(socket, "AF_UNIX"):
+        return False
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(SEND_TIMEOUT)
+    try:
+        sock.connect(socket_path())
+        # The relay only forwards newline-terminated lines, so a send cut
+        # short by the timeout is discarded there rather than half-delivered.
+        sock.sendall(data + b"\n")
+        return True
+    except (FileNotFoundError, ConnectionRefusedError):
+        spawn()
+        return False
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+def spawn() -> None:
+    """Start the relay in the background, at most once per backoff window."""
+    if os.environ.get("OBS_RELAY_AUTOSTART", "1").lower() in ("0", "false"):
+        return
+    _base.spawn_detached("_relay")
+
+
+class Forwarder:
+    """Keep-alive HTTP client for batched delivery, one connection per thread."""
+
+    def __init__(self, server: str | None = None) -> None:
+        import threading
+
+        self.server = server or os.environ.get("OBS_SERVER", _base.OBS_SERVER)
+        self.local = threading.local()
+
+    def post_batch(self, batch: list[bytes]) -> list[bytes]:
+        """POST one batch; return the lines worth retrying later.
+
+        Degrades to per-event POSTs if the server rejects the batch. Events
+        the server refuses as invalid (4xx) are dropped, not retried.
+        """
+        status = self._request("/events/batch", b"[" + b",".join(batch) + b"]")
+        if status == 201:
+            return []
+        if status is None or status >= 500:
+            return batch
+        # Older server without the batch route, or a malformed line that
+        # spoiled the whole body: isolate it.
+        retry = []
+        for line in batch:
+            status = self._request("/events", line)
+            if status is None or status >= 500:
+                retry.append(line)
+        return retry
+
+    def _connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            import http.client
+            from urllib.parse import urlsplit
+
+            url = urlsplit(self.server)
+            cls = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+            conn = cls(url.hostname or "localhost", url.port, timeout=5.0)
+            self.local.conn = conn
+        return conn
+
+    def _request(self, path: str, body: bytes) -> int | None:
+        import http.client
+
+        # Second attempt covers a keep-alive connection the server closed idle.
+        for _ in range(2):
+            conn = self._connection()
+            try:
+                conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+                resp = conn.getresponse()
+                resp.read()
+                return resp.status
+            except (http.client.HTTPException, OSError):
+                conn.close()
+        return None
+
+
+class Relay:
+    """Batching forwarder. All state except the HTTP pool lives on the event loop."""
+
+    def __init__(
+        self,
+        server: str | None = None,
+        *,
+        batch_max: int = BATCH_MAX,
+        window_ms: int = WINDOW_MS,
+        pool_size: int = POOL_SIZE,
+        idle_exit_secs: float = IDLE_EXIT_SECS,
+        replay: bool = True,
+    ) -> None:
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.forwarder = Forwarder(server)
+        self.batch_max = max(1, batch_max)
+        self.window = max(1, window_ms) / 1000
+        self.idle_exit_secs = idle_exit_secs
+        self.replay = replay
+        self.pool = ThreadPoolExecutor(max(1, pool_size), thread_name_prefix="obs-relay")
+        self.pool_size = max(1, pool_size)
+        self.pending: list[bytes] = []
+        self.last_activity = time.monotonic()
+        self.stats = {"received": 0, "delivered": 0, "spooled": 0, "batches": 0}
+        self._stats_lock = threading.Lock()
+        self._loop = None
+        self._stopping = None
+        self._wakeup = None
+
+    # ── event loop side ──────────────────────────────────────────────────────
+
+    async def run(self, path: str) -> None:
+        import asyncio
+
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        self._wakeup = asyncio.Event()
+        server = await asyncio.start_unix_server(self._handle, path=path)
+        os.chmod(path, 0o600)
+        flusher = asyncio.create_task(self._flush_loop())
+        replayer = self._start_replayer()
+        async with server:
+            await self._until_stopped()
+            # Unlink first so new senders fall back to a direct POST, then
+            # give connections already queued on the socket time to be read.
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            await asyncio.sleep(SHUTDOWN_GRACE_SECS)
+        if replayer is not None:
+            replayer.stop()
+        self._wakeup.set()
+        await flusher
+        self.pool.shutdown(wait=True)
+
+    def _start_replayer(self):
+        """Drain the spool in the background while the relay is up."""
+        if not self.replay:
+            return None
+        import threading
+        import _spool
+
+        replayer = _spool.Replayer(self.forwarder.server)
+        threading.Thread(target=replayer.run_forever, name="obs-replay", daemon=True).start()
+        return replayer
+
+    def stop(self) -> None:
+        """Thread-safe shutdown request; pending events are still flushed."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+
+    async def _until_stopped(self) -> None:
+        import asyncio
+
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=1.0)
+            except TimeoutError:
+                pass
+            idle = time.monotonic() - self.last_activity
+            if self.idle_exit_secs and idle > self.idle_exit_secs and not self.pending:
+                self._stopping.set()
+
+    async def _handle(self, reader, writer) -> None:
+        try:
+            data = await reader.read()
+        finally:
+            writer.close()
+        lines = data.split(b"\n")
+        # The last element is whatever followed the final newline: either
+        # empty or a truncated write from a sender that timed out.
+        accepted = [line for line in lines[:-1] if line]
+        self.pending.extend(accepted)
+        self.stats["received"] += len(accepted)
+        self.last_activity = time.monotonic()
+        if len(self.pending) >= self.batch_max:
+            self._wakeup.set()
+
+    async def _flush_loop(self) -> None:
+        import asyncio
+
+        inflight = asyncio.Semaphore(self.pool_size)
+        tasks: set = set()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.window)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self.pending:
+                batch = self.pending[: self.batch_max]
+                del self.pending[: self.batch_max]
+                await inflight.acquire()
+                task = asyncio.ensure_future(self._loop.run_in_executor(self.pool, self.deliver, batch))
+                tasks.add(task)
+                task.add_done_callback(lambda t: (tasks.discard(t), inflight.release()))
+            if self._stopping.is_set() and not self.pending:
+                break
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    # ── pool side ────────────────────────────────────────────────────────────
+
+    def deliver(self, batch: list[bytes]) -> bool:
+        """Forward one batch; spool whatever could not be delivered."""
+        retry = self.forwarder.post_batch(batch)
+        if retry:
+            import _spool
+            _spool.append(retry)
+        with self._stats_lock:
+            self.stats["batches"] += 1
+            self.stats["delivered"] += len(batch) - len(retry)
+            self.stats["spooled"] += len(retry)
+        return not retry
+
+
+def serve() -> int:
+    """Run the relay in the foreground until idle or signalled."""
+    import asyncio
+    import fcntl
+    import signal
+
+    path = socket_path()
+    lock = open(path + ".lock", "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return 0  # another relay owns the socket
+    lock.write(str(os.getpid()))
+    lock.flush()
+    try:
+        os.unlink(path)  # stale socket from a relay that died
+    except FileNotFoundError:
+        pass
+
+    relay = Relay()
+
+    async def main() -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, relay.stop)
+        await relay.run(path)
+
+    asyncio.run(main())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(serve())
@@ -0,0 +1,259 @@
+"""Per-window tool metrics aggregated on the hook host (OBS_ROLLUP=1).
+
+Hooks are short-lived processes, so the window lives on disk: every tool
+event appends one tab-separated line (session, app, tool, kind, sent,
+duration) to ``<state dir>/rollup/<window start>.win`` with a single
+O_APPEND write. The first hook to run after a window closes starts a
+detached flusher (``python -m _rollup flush``), which claims the file by
+renaming it, folds it into counters and a log-scale latency histogram per
+(source_app, session, tool), and posts one MetricRollup event for that
+window. The hooks themselves only ever append.
+
+The rollup is a single event per window for each source_app (normally just
+the one app per host), not one per session: ``tools`` holds the counters
+merged across sessions and ``sessions`` the per-session breakdown. It is
+posted under the placeholder session ROLLUP_SESSION, which the dashboard
+leaves out of its session views and stall detection.
+
+The sampling policy decides which raw PreToolUse/PostToolUse events are
+still sent in full. Failures, MCP calls and calls matching a HITL rule
+always are; the rest are kept at OBS_SAMPLE_RATE, decided by the hash of
+the tool call so both halves of a call are kept or dropped together.
+Dropped events are still counted in the rollup.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+
+import _base
+
+WINDOW_SECS = max(1, int(os.environ.get("OBS_ROLLUP_WINDOW_SECS", "60")))
+SAMPLE_RATE = float(os.environ.get("OBS_SAMPLE_RATE", "0.1"))
+GRACE_SECS = 2.0  # late writers from the previous window
+BUCKET_BOUNDS_MS = tuple(2 ** i for i in range(17))  # 1ms .. ~65s, then overflow
+TOOL_EVENTS = {"PreToolUse": "P", "PostToolUse": "C", "PostToolUseFailure": "F"}
+MCP_PREFIXES = ("mcp__", "mcp_")
+ROLLUP_SESSION = "metric-rollup"
+
+_SUFFIX = ".win"
+_CLAIMED = ".flushing"
+
+
+def enabled() -> bool:
+    return _base.env_flag("OBS_ROLLUP")
+
+
+def rollup_dir() -> str:
+    path = os.path.join(_base.state_dir(), "rollup")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+
+def bucket(duration_ms: float) -> int:
+    """Histogram bucket: first bound >= duration, or len(bounds) for overflow."""
+    from bisect import bisect_left
+
+    return bisect_left(BUCKET_BOUNDS_MS, duration_ms)
+
+
+def always_send(event_type: str, data: dict, payload: dict) -> bool:
+    tool = data.get("tool_name", "")
+    if event_type == "PostToolUseFailure" or tool.startswith(MCP_PREFIXES):
+        return True
+    hitl = payload.get("hitl")
+    if isinstance(hitl, dict):
+        return hitl.get("rule_id") is not None
+    import _rules
+
+    if not _rules.enabled():
+        return False
+    rules = _rules.load()
+    return len(rules) > 0 and rules.match(tool, _rules.subject(data.get("tool_input", {}))) is not None
+
+
+def sampled(data: dict) -> bool:
+    import _spans
+
+    return _spans.key_of(data) < SAMPLE_RATE * 2 ** 64
+
+
+def keep(event_type: str, data: dict, payload: dict) -> bool:
+    """Count a tool event in the current window; True if it should be sent in full."""
+    kind = TOOL_EVENTS.get(event_type)
+    if kind is None or not enabled():
+        return True
+    send = always_send(event_type, data, payload) or sampled(data)
+    try:
+        _append(data, kind, send, payload.get("duration_ms"))
+        if has_closed(rollup_dir(), WINDOW_SECS):
+            _base.spawn_detached("_rollup", "flush")
+    except OSError:
+        return True  # can't count it, so don't drop it
+    return send
+
+
+def _field(value: object) -> str:
+    return str(value).replace("\t", " ").replace("\n", " ")
+
+
+def _append(data: dict, kind: str, sent: bool, duration_ms: object, now: float | None = None) -> None:
+    append_line(rollup_dir(), WINDOW_SECS, (
+        data.get("session_id", "unknown"),
+        data.get("source_app", _base.SOURCE_APP),
+        data.get("tool_name", ""),
+        kind,
+        "1" if sent else "0",
+        duration_ms if isinstance(duration_ms, (int, float)) else "",
+    ), now)
+
+
+def append_line(directory: str, window_secs: int, fields, now: float | None = None) -> None:
+    """Append one tab-separated line to the current window file in ``directory``."""
+    now = time.time() if now is None else now
+    start = int(now // window_secs) * window_secs
+    line = ("\t".join(_field(f) for f in fields) + "\n").encode()
+    fd = os.open(os.path.join(directory, f"{start}{_SUFFIX}"), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+def _counters() -> dict:
+    return {"calls": 0, "failures": 0, "dropped": 0,
+            "latency": {"count": 0, "sum_ms": 0.0, "max_ms": 0.0, "buckets": [0] * (len(BUCKET_BOUNDS_MS) + 1)}}
+
+
+def _compact(tools: dict[str, dict]) -> None:
+    for c in tools.values():
+        buckets = c["latency"]["buckets"]
+        while buckets and buckets[-1] == 0:
+            buckets.pop()  # compact: trailing empty buckets are implied
+
+
+def aggregate(lines) -> dict[str, dict[str, dict[str, dict]]]:
+    """Fold window lines into {app: {session: {tool: counters}}}."""
+    apps: dict[str, dict[str, dict[str, dict]]] = {}
+    for raw in lines:
+        parts = raw.rstrip("\n").split("\t")
+        if len(parts) != 6:
+            continue  # torn line
+        session, app, tool, kind, sent, duration = parts
+        c = apps.setdefault(app, {}).setdefault(session, {}).setdefault(tool, _counters())
+        if kind in ("C", "F"):
+            c["calls"] += 1
+            c["failures"] += kind == "F"
+        if sent == "0":
+            c["dropped"] += 1
+        if duration:
+            try:
+                ms = float(duration)
+            except ValueError:
+                continue
+            lat = c["latency"]
+            lat["count"] += 1
+            lat["sum_ms"] = round(lat["sum_ms"] + ms, 3)
+            lat["max_ms"] = max(lat["max_ms"], ms)
+            lat["buckets"][bucket(ms)] += 1
+    for sessions in apps.values():
+        for tools in sessions.values():
+            _compact(tools)
+    return apps
+
+
+def merge(sessions: dict[str, dict[str, dict]]) -> dict[str, dict]:
+    """Sum per-session counters into one {tool: counters} for the whole window."""
+    merged: dict[str, dict] = {}
+    for tools in sessions.values():
+        for tool, c in tools.items():
+            m = merged.setdefault(tool, _counters())
+            for key in ("calls", "failures", "dropped"):
+                m[key] += c[key]
+            lat, mlat = c["latency"], m["latency"]
+            mlat["count"] += lat["count"]
+            mlat["sum_ms"] = round(mlat["sum_ms"] + lat["sum_ms"], 3)
+            mlat["max_ms"] = max(mlat["max_ms"], lat["max_ms"])
+            for i, n in enumerate(lat["buckets"]):
+                mlat["buckets"][i] += n
+    _compact(merged)
+    return merged
+
+
+def has_closed(directory: str, window_secs: int, now: float | None = None) -> bool:
+    """True if ``directory`` holds a closed window (or one a dead flusher left claimed)."""
+    now = time.time() if now is None else now
+    for name in os.listdir(directory):
+        if name.endswith(_CLAIMED):
+            return True
+        if name.endswith(_SUFFIX) and int(name[: -len(_SUFFIX)]) + window_secs + GRACE_SECS <= now:
+            return True
+    return False
+
+
+def closed_windows(directory: str, window_secs: int, now: float | None = None):
+    """Claim window files in ``directory`` that have closed; yield (start, lines) for each.
+
+    Runs under a non-blocking lock, so at most one hook flushes at a time. A
+    window file is removed once the consumer is done with its lines; one left
+    claimed by a flusher that died is picked up again by the next.
+    """
+    import fcntl
+
+    now = time.time() if now is None else now
+    names = os.listdir(directory)
+    due = [n for n in names if n.endswith(_SUFFIX) and int(n[: -len(_SUFFIX)]) + window_secs + GRACE_SECS <= now]
+    stale = [n for n in names if n.endswith(_CLAIMED)]
+    if not due and not stale:
+        return
+    fd = os.open(os.path.join(directory, ".flush.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return  # another hook is flushing
+        for name in sorted(due) + stale:
+            path = os.path.join(directory, name)
+            claimed = path if name.endswith(_CLAIMED) else path[: -len(_SUFFIX)] + _CLAIMED
+            try:
+                if claimed != path:
+                    os.rename(path, claimed)
+                with open(claimed, encoding="utf-8", errors="replace") as f:
+                    lines = f.readlines()
+            except FileNotFoundError:
+                continue
+            yield int(os.path.basename(claimed)[: -len(_CLAIMED)]), lines
+            os.unlink(claimed)
+    finally:
+        os.close(fd)
+
+
+def flush_closed(now: float | None = None) -> int:
+    """Post rollups for every window that has closed. Returns events posted."""
+    posted = 0
+    for start, lines in closed_windows(rollup_dir(), WINDOW_SECS, now):
+        for app, sessions in aggregate(lines).items():
+            tools = merge(sessions)
+            event = _base.build_payload(
+                event_type="MetricRollup",
+                session_id=ROLLUP_SESSION,
+                source_app=app,
+                payload={
+                    "window_start": start * 1000,
+                    "window_secs": WINDOW_SECS,
+                    "bucket_bounds_ms": list(BUCKET_BOUNDS_MS),
+                    "dropped": sum(c["dropped"] for c in tools.values()),
+                    "tools": tools,
+                    "sessions": sessions,
+                },
+            )
+            event["timestamp"] = (start + WINDOW_SECS) * 1000
+            _base.post_event(event)
+            posted += 1
+    return posted
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["flush"]:
+        flush_closed()
@@ -0,0 +1,170 @@
+"""In-hook HITL rule engine for PreToolUse.
+
+The server's HITL rules are cached in ``<state dir>/rules.json`` and
+revalidated with If-None-Match once the file is older than
+OBS_RULES_TTL_SECS. Per tool, the applicable patterns (the tool's own rules
+plus ``*`` rules) are compiled into one case-insensitive alternation, so a
+tool call that matches nothing costs a single regex search. Patterns that
+refer to their own groups by number are searched one by one instead, since
+the alternation renumbers groups. Only a call that matches goes to the
+server (GET /hitl/check) and waits for a human decision.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import time
+
+import _base
+
+RULES_TTL_SECS = float(os.environ.get("OBS_RULES_TTL_SECS", "30"))
+FETCH_TIMEOUT = 0.3
+DECISION_TIMEOUT_SECS = float(os.environ.get("OBS_HITL_TIMEOUT_SECS", "60"))
+POLL_SECS = 0.5
+SUBJECT_MAX_CHARS = 8192
+# \1..\99, (?P=name) and (?(1)...) depend on group numbering; an escaped
+# backslash before the digit is a literal, not a reference.
+_GROUP_REF = re.compile(r"(?<!\\)(?:\\\\)*\\[1-9]|\(\?P=|\(\?\(")
+
+
+def enabled() -> bool:
+    return os.environ.get("OBS_HITL", "1").lower() not in ("0", "false")
+
+
+class RuleSet:
+    """Rules compiled into one combined matcher per tool, built on first use."""
+
+    def __init__(self, rules: list[dict]) -> None:
+        self.rules = []
+        for rule in rules:
+            if not isinstance(rule, dict):
+                continue  # a hand-edited or foreign cache: skip, never crash the hook
+            try:
+                compiled = re.compile(str(rule.get("pattern", "")), re.IGNORECASE)
+            except re.error:
+                continue  # the server treats an invalid pattern as no match, too
+            self.rules.append((rule, compiled))
+        self._by_tool: dict[str, tuple[re.Pattern | None, list]] = {}
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def _matcher(self, tool: str) -> tuple[re.Pattern | None, list, list]:
+        cached = self._by_tool.get(tool)
+        if cached is None:
+            candidates = [(r, rx) for r, rx in self.rules if r.get("tool", "*") in (tool, "*")]
+            standalone = [(r, rx) for r, rx in candidates if _GROUP_REF.search(rx.pattern)]
+            combinable = [rx.pattern for _, rx in candidates if not _GROUP_REF.search(rx.pattern)]
+            combined = None
+            if combinable:
+                try:
+                    combined = re.compile("|".join(f"(?:{p})" for p in combinable), re.IGNORECASE)
+                except re.error:
+                    # e.g. inline global flags: fall back to one search per rule
+                    combined, standalone = None, candidates
+            cached = self._by_tool[tool] = (combined, candidates, standalone)
+        return cached
+
+    def match(self, tool: str, subject: str) -> dict | None:
+        """First rule, in insertion order, whose pattern matches; None if none do."""
+        combined, candidates, standalone = self._matcher(tool)
+        if not candidates:
+            return None
+        if combined is None or combined.search(subject) is None:
+            candidates = standalone  # none of the combined rules can match
+        for rule, rx in candidates:
+            if rx.search(subject):
+                return rule
+        return None
+
+
+def subject(tool_input: object) -> str:
+    """The text rules are matched against: the command, else the string inputs."""
+    if isinstance(tool_input, dict):
+        command = tool_input.get("command")
+        if isinstance(command, str):
+            return command[:SUBJECT_MAX_CHARS]
+        parts = [v for v in tool_input.values() if isinstance(v, str)]
+        return "\n".join(parts)[:SUBJECT_MAX_CHARS]
+    return str(tool_input)[:SUBJECT_MAX_CHARS] if isinstance(tool_input, str) else ""
+
+
+def _cache_path() -> str:
+    return os.path.join(_base.state_dir(), "rules.json")
+
+
+def load(server: str | None = None) -> RuleSet:
+    """Rules from the local cache, revalidated against the server when stale."""
+    path = _cache_path()
+    cached: dict = {}
+    try:
+        age = time.time() - os.stat(path).st_mtime
+        with open(path) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        age = float("inf")
+    if not isinstance(cached, dict):
+        cached, age = {}, float("inf")
+    if age > RULES_TTL_SECS:
+        cached = _refresh(path, cached, server)
+    rules = cached.get("rules")
+    return RuleSet(rules if isinstance(rules, list) else [])
+
+
+def _refresh(path: str, cached: dict, server: str | None) -> dict:
+    server = server or os.environ.get("OBS_SERVER", _base.OBS_SERVER)
+    etag = cached.get("etag")
+    headers = {"If-None-Match": etag} if isinstance(etag, str) and etag else {}
+    try:
+        status, resp_headers, body = _base.http_request(
+            "GET", f"{server}/hitl/rules", headers=headers, timeout=FETCH_TIMEOUT
+        )
+        if status == 200:
+            rules = json.loads(body)
+            if isinstance(rules, list):
+                cached = {"etag": resp_headers.get("etag", ""), "rules": rules}
+    except (OSError, ValueError, IndexError):
+        pass  # server unreachable: keep the rules we had
+    try:
+        # Rewrite even on 304/failure: the mtime is the freshness clock, so a
+        # down server is retried once per TTL rather than on every tool call.
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(cached, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    return cached
+
+
+def await_decision(session_id: str, tool: str, text: str, server: str | None = None) -> dict:
+    """Ask the server to intercept and wait for a human. Never blocks forever.
+
+    Returns {"decision": "approved"|"blocked"|"timeout"|"no_intercept"|"error", ...}.
+    Anything but "blocked" lets the tool call proceed.
+    """
+    from urllib.parse import urlencode
+
+    server = server or os.environ.get("OBS_SERVER", _base.OBS_SERVER)
+    query = urlencode({"tool_name": tool, "session_id": session_id, "command": text})
+    try:
+        status, _, body = _base.http_request("GET", f"{server}/hitl/check?{query}", timeout=1.0)
+        check = json.loads(body) if status == 200 else {}
+    except (OSError, ValueError, IndexError):
+        return {"decision": "error"}
+    if check.get("action") != "intercept":
+        return {"decision": "no_intercept"}
+    intercept_id = str(check.get("intercept_id", ""))
+    message = str(check.get("message", ""))
+    deadline = time.monotonic() + DECISION_TIMEOUT_SECS
+    while time.monotonic() < deadline:
+        time.sleep(POLL_SECS)
+        try:
+            status, _, body = _base.http_request("GET", f"{server}/hitl/intercepts/{intercept_id}", timeout=1.0)
+            state = json.loads(body).get("status") if status == 200 else None
+        except (OSError, ValueError, IndexError):
+            state = None
+        if state in ("approved", "blocked"):
+            return {"decision": state, "intercept_id": intercept_id, "message": message}
+    return {"decision": "timeout", "intercept_id": intercept_id, "message": message}
@@ -0,0 +1,140 @@
+"""Per-session span store pairing PreToolUse with its PostToolUse.
+
+Each session gets one fixed-size file under ``<state dir>/spans`` holding
+SLOTS records of (key hash, start ns, span id), 24 bytes each. The key is
+the hook input's ``tool_use_id``, or a hash of the tool name and input when
+there is none. A start is written with one pwrite into the first free,
+expired or same-key slot of a short linear probe; the finishing hook preads
+the probe window, takes its record and zeroes the slot. Single-record
+pwrite/pread on a regular file do not tear in practice, so concurrent hook
+processes need no lock, and an overwritten slot costs one span's duration,
+never a wrong one: records only match on their full 64-bit key.
+
+Starts whose finish never arrives (interrupted calls, crashed hooks) expire
+after OBS_SPAN_TTL_SECS and their slots are reused.
+
+OBS_SPAN_MODE selects what is sent: ``split`` (default) posts both halves
+with a shared span_id, ``combined`` posts only the finishing event, which
+carries everything the start did, and ``off`` disables the store.
+"""
+from __future__ import annotations
+
+import os
+import struct
+import time
+
+import _base
+
+SLOTS = 256
+PROBE = 8
+TTL_SECS = float(os.environ.get("OBS_SPAN_TTL_SECS", "3600"))
+_RECORD = struct.Struct("<QQQ")
+
+
+def mode() -> str:
+    value = os.environ.get("OBS_SPAN_MODE", "split").lower()
+    return value if value in ("split", "combined", "off") else "split"
+
+
+def key_of(data: dict) -> int:
+    """64-bit identity of a tool call, shared by its Pre and Post hooks."""
+    import hashlib
+    import json
+
+    tool_use_id = data.get("tool_use_id")
+    if tool_use_id:
+        raw = f"id:{tool_use_id}"
+    else:
+        raw = f"{data.get('tool_name', '')}:{json.dumps(data.get('tool_input'), sort_keys=True, default=str)}"
+    return int.from_bytes(hashlib.blake2b(raw.encode(), digest_size=8).digest(), "little") or 1
+
+
+def _path(session_id: str) -> str:
+    import hashlib
+
+    directory = os.path.join(_base.state_dir(), "spans")
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    return os.path.join(directory, hashlib.sha1(session_id.encode()).hexdigest()[:16] + ".slots")
+
+
+def _window(fd: int, key: int) -> list[tuple[int, tuple[int, int, int]]]:
+    """(offset, record) for each slot in the probe window of ``key``, in one pread."""
+    first = key % SLOTS
+    wraps = first + PROBE > SLOTS
+    base = 0 if wraps else first  # a wrapping window reads the whole file
+    raw = os.pread(fd, _RECORD.size * (SLOTS if wraps else PROBE), base * _RECORD.size)
+    window = []
+    for i in range(PROBE):
+        slot = (first + i) % SLOTS
+        chunk = raw[(slot - base) * _RECORD.size:(slot - base + 1) * _RECORD.size]
+        record = _RECORD.unpack(chunk) if len(chunk) == _RECORD.size else (0, 0, 0)  # sparse tail
+        window.append((slot * _RECORD.size, record))
+    return window
+
+
+def start(data: dict) -> str | None:
+    """Record the start of this tool call and return its span id (None on I/O error)."""
+    session_id = data.get("session_id", "unknown")
+    key = key_of(data)
+    now = time.time_ns()
+    span = int.from_bytes(os.urandom(8), "little") or 1
+    try:
+        fd = os.open(_path(session_id), os.O_RDWR | os.O_CREAT, 0o600)
+    except OSError:
+        return None
+    try:
+        expired = now - int(TTL_SECS * 1e9)
+        target, oldest = None, None
+        for offset, (k, started, _) in _window(fd, key):
+            if k == key or k == 0 or started < expired:
+                target = offset
+                break
+            if oldest is None or started < oldest[1]:
+                oldest = (offset, started)
+        if target is None:
+            target = oldest[0]  # window full of live spans: evict the oldest
+        os.pwrite(fd, _RECORD.pack(key, now, span), target)
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+    return f"{span:016x}"
+
+
+def finish(data: dict) -> dict | None:
+    """Close the span opened by the matching start: span_id, start_ts, duration_ms.
+
+    Returns None when no live start is found (span store off, expired, evicted).
+    """
+    session_id = data.get("session_id", "unknown")
+    key = key_of(data)
+    now = time.time_ns()
+    try:
+        fd = os.open(_path(session_id), os.O_RDWR)
+    except OSError:
+        return None
+    try:
+        for offset, (k, started, span) in _window(fd, key):
+            if k != key:
+                continue
+            os.pwrite(fd, _RECORD.pack(0, 0, 0), offset)
+            if started < now - int(TTL_SECS * 1e9):
+                return None
+            return {
+                "span_id": f"{span:016x}",
+                "start_ts": started // 1_000_000,
+                "duration_ms": round(max(0, now - started) / 1e6, 3),
+            }
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+    return None
+
+
+def discard(session_id: str) -> None:
+    """Drop a finished session's span file."""
+    try:
+        os.unlink(_path(session_id))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,381 @@
+"""Durable on-disk spool for events the server could not take.
+
+Events are appended to segment files under ``<state dir>/spool``. Each record
+is one line, ``<crc32 hex> <event json>\\n``, so a write torn by a crash is
+detected and skipped on replay instead of corrupting its neighbours. Writers
+always append to the newest segment and roll to a new one past
+OBS_SPOOL_SEGMENT_BYTES; once the spool exceeds OBS_SPOOL_MAX_BYTES the
+oldest segments are dropped.
+
+The Replayer drains sealed segments oldest first, in batches, with bounded
+concurrency and exponential backoff while the server keeps failing. Progress
+within a segment is kept in a ``.ack`` file so a restart does not resend what
+was acknowledged; delivery is at-least-once around a failed batch.
+
+    python -m _spool status [--watch SECS]   # depth and replay rate
+    python -m _spool replay                  # drain once, then exit
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+import zlib
+
+import _base
+
+SEGMENT_BYTES = int(os.environ.get("OBS_SPOOL_SEGMENT_BYTES", str(4 * 1024 * 1024)))
+MAX_BYTES = int(os.environ.get("OBS_SPOOL_MAX_BYTES", str(256 * 1024 * 1024)))
+REPLAY_BATCH = int(os.environ.get("OBS_SPOOL_REPLAY_BATCH", "200"))
+REPLAY_CONCURRENCY = int(os.environ.get("OBS_SPOOL_REPLAY_CONCURRENCY", "2"))
+MAX_BACKOFF_SECS = 60.0
+POLL_SECS = 5.0
+
+_SUFFIX = ".seg"
+
+
+def enabled() -> bool:
+    return os.environ.get("OBS_SPOOL", "1").lower() not in ("0", "false")
+
+
+def spool_dir() -> str:
+    path = os.path.join(_base.state_dir(), "spool")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+
+class _Lock:
+    """Exclusive flock on a file in the spool dir (blocking unless told not to)."""
+
+    def __init__(self, name: str, blocking: bool = True) -> None:
+        self.path = os.path.join(spool_dir(), name)
+        self.blocking = blocking
+        self.fd = -1
+
+    def __enter__(self) -> bool:
+        import fcntl
+
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_EX | (0 if self.blocking else fcntl.LOCK_NB))
+        except OSError:
+            os.close(self.fd)
+            self.fd = -1
+            return False
+        return True
+
+    def __exit__(self, *exc) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)  # releases the flock
+
+
+def _segments(directory: str) -> list[str]:
+    """Segment paths, oldest first."""
+    try:
+        names = sorted(n for n in os.listdir(directory) if n.endswith(_SUFFIX))
+    except FileNotFoundError:
+        return []
+    return [os.path.join(directory, n) for n in names]
+
+
+def _segment_path(directory: str, seq: int) -> str:
+    return os.path.join(directory, f"{seq:016d}{_SUFFIX}")
+
+
+def _seq(path: str) -> int:
+    return int(os.path.basename(path)[: -len(_SUFFIX)])
+
+
+def _frame(line: bytes) -> bytes:
+    return b"%08x %s\n" % (zlib.crc32(line), line)
+
+
+def _read_counter(path: str) -> int:
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def _write_atomic(path: str, text: str) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def append(lines: list[bytes]) -> bool:
+    """Durably append serialized events. Returns False if spooling is off or failed."""
+    if not lines or not enabled():
+        return False
+    directory = spool_dir()
+    records = b"".join(_frame(line) for line in lines)
+    with _Lock(".lock"):
+        segments = _segments(directory)
+        if not segments:
+            active = _segment_path(directory, 1)
+        else:
+            active = segments[-1]
+            try:
+                if os.path.getsize(active) >= SEGMENT_BYTES:
+                    active = _segment_path(directory, _seq(active) + 1)
+            except FileNotFoundError:
+                pass
+        fd = os.open(active, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, 1, size - 1) != b"\n":
+                records = b"\n" + records  # fence off a torn tail
+            os.write(fd, records)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        _enforce_cap(directory)
+    return True
+
+
+def _enforce_cap(directory: str) -> None:
+    """Drop the oldest segments while the spool is over MAX_BYTES. Caller holds the lock.
+
+    Skipped while a replayer holds the replay lock: it may be reading the very
+    segments that would go, and it is shrinking the spool anyway.
+    """
+    segments = _segments(directory)
+    sizes = {}
+    for seg in segments:
+        try:
+            sizes[seg] = os.path.getsize(seg)
+        except FileNotFoundError:
+            sizes[seg] = 0
+    total = sum(sizes.values())
+    if total <= MAX_BYTES:
+        return
+    dropped = 0
+    with _Lock(".replay.lock", blocking=False) as owned:
+        if not owned:
+            return
+        for seg in segments[:-1]:
+            if total <= MAX_BYTES:
+                break
+            total -= sizes[seg]
+            try:
+                with open(seg, "rb") as f:
+                    f.seek(_read_counter(seg + ".ack"))
+                    dropped += f.read().count(b"\n")
+            except FileNotFoundError:
+                pass  # drained and removed since it was listed
+            for path in (seg, seg + ".ack"):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+    if dropped:
+        counter = os.path.join(directory, "dropped")
+        _write_atomic(counter, str(_read_counter(counter) + dropped))
+
+
+def _seal(directory: str) -> list[str]:
+    """Start a fresh segment for writers and return every older one."""
+    with _Lock(".lock"):
+        segments = _segments(directory)
+        if segments and os.path.getsize(segments[-1]) > 0:
+            open(_segment_path(directory, _seq(segments[-1]) + 1), "ab").close()
+            segments = _segments(directory)
+        return segments[:-1]
+
+
+def read_records(path: str, start: int = 0):
+    """Yield (end_offset, event_bytes) for intact records from byte ``start``."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        offset = start
+        for raw in f:
+            offset += len(raw)
+            if not raw.endswith(b"\n") or len(raw) < 10 or raw[8:9] != b" ":
+                continue
+            line = raw[9:-1]
+            try:
+                if int(raw[:8], 16) != zlib.crc32(line):
+                    continue
+            except ValueError:
+                continue
+            yield offset, line
+
+
+def depth() -> dict[str, int]:
+    """Spooled events still waiting for replay."""
+    directory = spool_dir()
+    segments, records, size = 0, 0, 0
+    for seg in _segments(directory):
+        start = _read_counter(seg + ".ack")
+        try:
+            with open(seg, "rb") as f:
+                f.seek(start)
+                while chunk := f.read(1 << 20):
+                    records += chunk.count(b"\n")
+                    size += len(chunk)
+        except FileNotFoundError:
+            continue
+        segments += 1
+    return {"segments": segments, "records": records, "bytes": size}
+
+
+def status() -> dict:
+    """Depth plus the last replayer's progress, for operators."""
+    directory = spool_dir()
+    try:
+        with open(os.path.join(directory, "stats.json")) as f:
+            replay = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        replay = {}
+    return {**depth(), "dropped": _read_counter(os.path.join(directory, "dropped")), "replay": replay}
+
+
+def replay_in_background() -> None:
+    """Cheaply check for a backlog and, if there is one, drain it out of process."""
+    try:
+        for seg in _segments(os.path.join(_base.state_dir(), "spool")):
+            if os.path.getsize(seg) > _read_counter(seg + ".ack"):
+                _base.spawn_detached("_spool", "replay", backoff_secs=POLL_SECS)
+                return
+    except OSError:
+        pass
+
+
+class Replayer:
+    """Drains the spool to the server in order, without swamping it."""
+
+    def __init__(
+        self,
+        server: str | None = None,
+        *,
+        batch_size: int = REPLAY_BATCH,
+        concurrency: int = REPLAY_CONCURRENCY,
+    ) -> None:
+        import threading
+        import _relay
+
+        self.forwarder = _relay.Forwarder(server)
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.backoff = 0.0
+        self.replayed = 0
+        self.last_error = ""
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run_forever(self) -> None:
+        """Drain, then poll; back off exponentially while the server fails."""
+        while not self._stop.is_set():
+            ok = self.drain()
+            if ok:
+                self.backoff = 0.0
+                delay = POLL_SECS
+            else:
+                self.backoff = min(MAX_BACKOFF_SECS, max(1.0, self.backoff * 2))
+                delay = self.backoff
+            self._stop.wait(delay)
+
+    def drain(self) -> bool:
+        """Replay every sealed segment once. False if the server stopped accepting."""
+        with _Lock(".replay.lock", blocking=False) as owned:
+            if not owned:
+                return True  # another replayer is on it
+            started, sent = time.monotonic(), 0
+            ok = True
+            self.last_error = ""
+            for seg in _seal(spool_dir()):
+                if self._stop.is_set():
+                    break
+                n, ok = self._drain_segment(seg)
+                sent += n
+                if not ok:
+                    break
+            if sent or not ok:
+                self._record(sent, time.monotonic() - started)
+            return ok
+
+    def _drain_segment(self, seg: str) -> tuple[int, bool]:
+        from concurrent.futures import ThreadPoolExecutor
+
+        ack = seg + ".ack"
+        acked = _read_counter(ack)
+        sent = 0
+        records = read_records(seg, acked)
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            while not self._stop.is_set():
+                # Up to `concurrency` batches in flight; acknowledge only the
+                # prefix that fully landed so ordering on disk is preserved.
+                window = []
+                for _ in range(self.concurrency):
+                    batch, end = [], acked
+                    for end, line in records:
+                        batch.append(line)
+                        if len(batch) >= self.batch_size:
+                            break
+                    if not batch:
+                        break
+                    window.append((end, batch, pool.submit(self.forwarder.post_batch, batch)))
+                if not window:
+                    break
+                for end, batch, future in window:
+                    if future.result():
+                        if acked:
+                            _write_atomic(ack, str(acked))
+                        self.last_error = "server unavailable"
+                        return sent, False
+                    acked = end
+                    sent += len(batch)
+                _write_atomic(ack, str(acked))
+        if self._stop.is_set():
+            return sent, True
+        for path in (seg, ack):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        return sent, True
+
+    def _record(self, sent: int, elapsed: float) -> None:
+        self.replayed += sent
+        stats = {
+            "last_run": int(time.time() * 1000),
+            "last_sent": sent,
+            "rate_per_sec": round(sent / elapsed, 1) if elapsed > 0 else 0.0,
+            "total_replayed": self.replayed,
+            "backoff_secs": self.backoff,
+            "last_error": self.last_error,
+        }
+        try:
+            _write_atomic(os.path.join(spool_dir(), "stats.json"), json.dumps(stats))
+        except OSError:
+            pass
+
+
+def main(argv: list[str]) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m _spool", description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    watch = sub.add_parser("status", help="show spool depth and replay rate")
+    watch.add_argument("--watch", type=float, metavar="SECS", help="repeat every SECS seconds")
+    sub.add_parser("replay", help="drain the spool once")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "replay":
+        return 0 if Replayer().drain() else 1
+    while True:
+        print(json.dumps(status()), flush=True)
+        if not args.watch:
+            return 0
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,163 @@
+"""Hook self-telemetry: what observing the agent costs the agent.
+
+Every hook invocation, standalone script or dispatch.py alike, goes through
+_base.run_hook and measures its own phases with monotonic clocks: startup
+(process start to the hook's entry point, i.e. interpreter init and
+imports), parse (stdin read and JSON decode), build, serialize, network
+(relay hand-off or POST, including spooling) and run (entry point to exit).
+_base keeps the per-phase counters and the delivery outcomes; at the end of
+the invocation one line goes to ``<state dir>/telemetry/<window start>.win``,
+the same append-only window files as _rollup. The first hook to run after a
+window closes starts a detached flusher (``python -m _telemetry flush``)
+that folds it into counts and log-scale histograms and posts one
+HookTelemetry event per source_app, so the overhead is reported every
+OBS_TELEMETRY_WINDOW_SECS rather than attached to every event, and no
+hook waits on that POST.
+
+Startup comes from /proc/self/stat (clock-tick resolution, ~10ms) and is
+left out where that is unavailable. Set OBS_TELEMETRY=0 to turn this off.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+
+import _base
+import _rollup
+
+WINDOW_SECS = max(1, int(os.environ.get("OBS_TELEMETRY_WINDOW_SECS", "300")))
+PHASES = ("startup", "parse", "build", "serialize", "network", "run")
+BUCKET_BOUNDS_MS = tuple(2 ** i / 4 for i in range(15))  # 0.25ms .. ~4s, then overflow
+# Worst delivery outcome of an invocation wins; "idle" means nothing was sent.
+OUTCOME_ORDER = ("timeout", "error", "server_error", "rejected", "relayed", "ok")
+
+
+def enabled() -> bool:
+    return os.environ.get("OBS_TELEMETRY", "1").lower() not in ("0", "false")
+
+
+def telemetry_dir() -> str:
+    path = os.path.join(_base.state_dir(), "telemetry")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+
+def process_age_ns() -> int | None:
+    """Time since this process started (Linux); None where it can't be read."""
+    try:
+        with open("/proc/self/stat", "rb") as f:
+            fields = f.read().rpartition(b")")[2].split()
+        ticks = int(fields[19])  # field 22, starttime, counted from boot
+        return time.clock_gettime_ns(time.CLOCK_BOOTTIME) - ticks * 1_000_000_000 // os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def outcome(outcomes: dict[str, int]) -> str:
+    for name in OUTCOME_ORDER:
+        if outcomes.get(name):
+            return name
+    return "idle"
+
+
+def record(data: dict, started_ns: int, now: float | None = None) -> None:
+    """Log this invocation's phases and outcome; start a flusher for closed windows.
+
+    ``started_ns`` is time.perf_counter_ns() when dispatch began. The flush
+    check comes first so that its cost is part of the run it reports.
+    """
+    try:
+        directory = telemetry_dir()
+        # A Stop hook under STOP_HOOK_ACTIVE posts nothing, and neither would
+        # a flusher inheriting its environment: leave the window to the next hook.
+        if not _base.STOP_HOOK_ACTIVE and _rollup.has_closed(directory, WINDOW_SECS, now):
+            _base.spawn_detached("_telemetry", "flush")
+    except OSError:
+        return
+    run_ns = time.perf_counter_ns() - started_ns
+    age_ns = process_age_ns()
+    timings = {
+        **_base.PHASE_NS,
+        "startup": max(0, age_ns - run_ns) if age_ns is not None else None,
+        "run": run_ns,
+    }
+    try:
+        _rollup.append_line(directory, WINDOW_SECS, (
+            data.get("source_app", _base.SOURCE_APP),
+            data.get("hook_event_name", ""),
+            outcome(_base.OUTCOMES),
+            ",".join(f"{k}={v}" for k, v in _base.OUTCOMES.items()),
+            *("" if timings[p] is None else timings[p] // 1000 for p in PHASES),  # microseconds
+        ), now)
+    except OSError:
+        pass
+
+
+def _histogram() -> dict:
+    return {"count": 0, "sum_ms": 0.0, "max_ms": 0.0, "buckets": [0] * (len(BUCKET_BOUNDS_MS) + 1)}
+
+
+def aggregate(lines) -> dict[str, dict]:
+    """Fold window lines into {source_app: summary}."""
+    from bisect import bisect_left
+
+    apps: dict[str, dict] = {}
+    for raw in lines:
+        parts = raw.rstrip("\n").split("\t")
+        if len(parts) != 4 + len(PHASES):
+            continue  # torn line
+        app, event, result, deliveries = parts[:4]
+        s = apps.setdefault(app, {"invocations": 0, "hooks": {}, "outcomes": {}, "deliveries": {},
+                                  "phases": {p: _histogram() for p in PHASES}})
+        s["invocations"] += 1
+        s["hooks"][event] = s["hooks"].get(event, 0) + 1
+        s["outcomes"][result] = s["outcomes"].get(result, 0) + 1
+        for item in filter(None, deliveries.split(",")):
+            name, _, n = item.partition("=")
+            if n.isdigit():
+                s["deliveries"][name] = s["deliveries"].get(name, 0) + int(n)
+        for phase, value in zip(PHASES, parts[4:]):
+            if not value.isdigit():
+                continue
+            ms = int(value) / 1000
+            h = s["phases"][phase]
+            h["count"] += 1
+            h["sum_ms"] = round(h["sum_ms"] + ms, 3)
+            h["max_ms"] = max(h["max_ms"], ms)
+            h["buckets"][bisect_left(BUCKET_BOUNDS_MS, ms)] += 1
+    for s in apps.values():
+        for h in s["phases"].values():
+            while h["buckets"] and h["buckets"][-1] == 0:
+                h["buckets"].pop()
+    return apps
+
+
+def flush_closed(now: float | None = None) -> int:
+    """Post a HookTelemetry event per source_app for each closed window."""
+    if _base.STOP_HOOK_ACTIVE:
+        return 0  # post_event would drop the events after the windows were claimed
+    posted = 0
+    for start, lines in _rollup.closed_windows(telemetry_dir(), WINDOW_SECS, now):
+        for app, summary in aggregate(lines).items():
+            event = _base.build_payload(
+                event_type="HookTelemetry",
+                session_id="hook-telemetry",
+                source_app=app,
+                payload={
+                    "window_start": start * 1000,
+                    "window_secs": WINDOW_SECS,
+                    "host": os.uname().nodename,
+                    "bucket_bounds_ms": list(BUCKET_BOUNDS_MS),
+                    **summary,
+                },
+            )
+            event["timestamp"] = (start + WINDOW_SECS) * 1000
+            _base.post_event(event)
+            posted += 1
+    return posted
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["flush"]:
+        flush_closed()
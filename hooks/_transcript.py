@@ -0,0 +1,216 @@
+"""Incremental token-usage indexer for Claude Code transcript files.
+
+Transcripts are append-only JSONL and grow to tens of MB, so each one gets a
+small state file (inode, byte offset, turn count) and a sidecar index under
+``<state dir>/transcripts``. Every update maps the file and scans only the
+bytes appended since the last offset. The sidecar is a flat array of uint64
+line offsets, one per assistant turn, so turn N is one 8-byte read away.
+
+Hooks call report_usage() on Stop, SubagentStop and PreCompact. It emits one
+compact TokenUsage event per new turn with the flat input_tokens /
+output_tokens / model fields the dashboard's token-burn view already reads.
+
+A streamed assistant message is written as several lines sharing one
+message id, and the hook can run between them. The state keeps the usage
+already reported for the last turn, so when its id continues in a later
+update the index slot moves to the newest line and one ``continued``
+TokenUsage event carries only the growth. The dashboard sums the events,
+so re-sending the whole turn would count it twice.
+"""
+from __future__ import annotations
+
+import json
+import os
+
+import _base
+
+USAGE_KEYS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+MAX_TURN_EVENTS = int(os.environ.get("OBS_USAGE_MAX_EVENTS", "50"))
+_OFFSET_BYTES = 8
+
+
+def _parse_turn(line: bytes) -> dict | None:
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return None
+    message = entry.get("message") if isinstance(entry, dict) else None
+    usage = message.get("usage") if isinstance(message, dict) else None
+    if not isinstance(usage, dict):
+        return None
+    turn = {"message_id": message.get("id") or entry.get("uuid"), "model": message.get("model", "")}
+    for key in USAGE_KEYS:
+        value = usage.get(key, 0)
+        turn[key] = value if isinstance(value, int) else 0
+    turn["timestamp"] = _epoch_ms(entry.get("timestamp"))
+    return turn
+
+
+def _epoch_ms(value: object) -> int | None:
+    if not isinstance(value, str):
+        return None
+    from datetime import datetime
+
+    try:
+        return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() * 1000)
+    except ValueError:
+        return None
+
+
+class TranscriptIndex:
+    """Byte-offset cursor plus turn index for one transcript file."""
+
+    def __init__(self, path: str) -> None:
+        import hashlib
+
+        self.path = os.path.abspath(path)
+        key = hashlib.sha1(self.path.encode()).hexdigest()[:16]
+        directory = os.path.join(_base.state_dir(), "transcripts")
+        os.makedirs(directory, exist_ok=True)
+        self.state_path = os.path.join(directory, f"{key}.json")
+        self.index_path = os.path.join(directory, f"{key}.idx")
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {"ino": None, "offset": 0, "turns": 0, "last_message_id": None, "last_usage": None}
+
+    def _save_state(self, state: dict) -> None:
+        tmp = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+
+    def update(self) -> list[dict]:
+        """Index lines appended since the last call and return their new turns."""
+        import fcntl
+        import mmap
+        from array import array
+
+        idx_fd = os.open(self.index_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # Stop and PreCompact for one session can race; one indexer at a time.
+            fcntl.flock(idx_fd, fcntl.LOCK_EX)
+            state = self._load_state()
+            with open(self.path, "rb") as f:
+                st = os.fstat(f.fileno())
+                if st.st_ino != state["ino"] or st.st_size < state["offset"]:
+                    # New or rewritten transcript: start over.
+                    state = {"ino": st.st_ino, "offset": 0, "turns": 0, "last_message_id": None, "last_usage": None}
+                    os.ftruncate(idx_fd, 0)
+                start = state["offset"]
+                if st.st_size <= start:
+                    return []
+                turns: list[dict] = []
+                offsets = array("Q")
+                continued, continued_at = None, 0  # later line of the turn indexed last time
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    end = mm.rfind(b"\n", start) + 1  # complete lines only
+                    pos = start
+                    last_id = state["last_message_id"]
+                    while 0 < end and pos < end:
+                        nl = mm.find(b"\n", pos, end)
+                        if mm.find(b'"usage"', pos, nl) != -1:
+                            turn = _parse_turn(mm[pos:nl])
+                            if turn is not None:
+                                if turn["message_id"] and turn["message_id"] == last_id:
+                                    # One assistant message spans several lines: its latest
+                                    # line has the final usage, so the index points there.
+                                    if turns:
+                                        turns[-1].update({k: turn[k] for k in USAGE_KEYS})
+                                        offsets[-1] = pos
+                                    else:
+                                        continued, continued_at = turn, pos
+                                else:
+                                    turns.append(turn)
+                                    offsets.append(pos)
+                                    last_id = turn["message_id"]
+                        pos = nl + 1
+                if end > start:
+                    state["offset"] = end
+            for i, turn in enumerate(turns):
+                turn["turn"] = state["turns"] + i
+            if continued is not None and state["turns"]:
+                os.pwrite(idx_fd, array("Q", [continued_at]).tobytes(), (state["turns"] - 1) * _OFFSET_BYTES)
+                reported = state.get("last_usage")
+                if reported is not None:
+                    growth = {k: max(0, continued[k] - reported.get(k, 0)) for k in USAGE_KEYS}
+                    if any(growth.values()):
+                        turns.insert(0, {**continued, **growth, "turn": state["turns"] - 1, "continued": True})
+                state["last_usage"] = {k: continued[k] for k in USAGE_KEYS}
+            if offsets:
+                os.lseek(idx_fd, state["turns"] * _OFFSET_BYTES, os.SEEK_SET)
+                os.write(idx_fd, offsets.tobytes())
+                state["turns"] += len(offsets)
+                state["last_message_id"] = last_id
+                state["last_usage"] = {k: turns[-1][k] for k in USAGE_KEYS}
+            self._save_state(state)
+            return turns
+        finally:
+            os.close(idx_fd)
+
+    def turn_count(self) -> int:
+        try:
+            return os.path.getsize(self.index_path) // _OFFSET_BYTES
+        except FileNotFoundError:
+            return 0
+
+    def turn(self, n: int) -> dict | None:
+        """Usage of turn ``n`` (0-based) via the sidecar index, without a scan."""
+        from array import array
+
+        if n < 0:
+            return None
+        try:
+            with open(self.index_path, "rb") as idx:
+                idx.seek(n * _OFFSET_BYTES)
+                raw = idx.read(_OFFSET_BYTES)
+            if len(raw) < _OFFSET_BYTES:
+                return None
+            with open(self.path, "rb") as f:
+                f.seek(array("Q", raw)[0])
+                turn = _parse_turn(f.readline())
+        except OSError:
+            return None
+        if turn is not None:
+            turn["turn"] = n
+        return turn
+
+
+def report_usage(data: dict) -> None:
+    """Emit TokenUsage events for turns appended to the hook's transcript."""
+    path = data.get("transcript_path")
+    if not path:
+        return
+    try:
+        turns = TranscriptIndex(path).update()
+    except (OSError, ValueError):
+        return
+    if not turns:
+        return
+    session_id = data.get("session_id", "unknown")
+    source_app = data.get("source_app", _base.SOURCE_APP)
+    # A first pass over a long transcript can find thousands of turns: send
+    # the newest individually and fold the rest into one total per model.
+    cut = max(0, len(turns) - MAX_TURN_EVENTS)
+    older, recent = turns[:cut], turns[cut:]
+    folded: dict[str, dict] = {}
+    for turn in older:
+        total = folded.setdefault(turn["model"], {"model": turn["model"], "turns": 0, "first_turn": turn["turn"], **dict.fromkeys(USAGE_KEYS, 0)})
+        total["turns"] += 0 if turn.get("continued") else 1
+        total["timestamp"] = turn["timestamp"] or total.get("timestamp")
+        for key in USAGE_KEYS:
+            total[key] += turn[key]
+    for payload in [*folded.values(), *recent]:
+        timestamp = payload.pop("timestamp", None)
+        event = _base.build_payload(
+            event_type="TokenUsage",
+            session_id=session_id,
+            source_app=source_app,
+            payload={**payload, "transcript_path": path},
+        )
+        if timestamp:
+            event["timestamp"] = timestamp
+        _base.post_event(event)
@@ -0,0 +1,159 @@
+"""Minimal asyncio WebSocket client (RFC 6455) for the server's /stream.
+
+Only what a read-mostly consumer needs: the opening handshake, text and
+binary messages (reassembled from fragments), ping/pong and the close
+handshake. Client frames are masked as the RFC requires. ``wss://`` uses
+the default SSL context.
+
+    ws = await _ws.connect("ws://localhost:4000/stream")
+    while (message := await ws.recv()) is not None:
+        ...
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import os
+import struct
+
+_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+OP_CONT, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+
+class HandshakeError(OSError):
+    """The server did not upgrade the connection."""
+
+
+class WebSocket:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.closed = False
+
+    async def _send_frame(self, opcode: int, data: bytes = b"") -> None:
+        header = bytearray([0x80 | opcode])
+        n = len(data)
+        if n < 126:
+            header.append(0x80 | n)
+        elif n < 1 << 16:
+            header.append(0x80 | 126)
+            header += struct.pack("!H", n)
+        else:
+            header.append(0x80 | 127)
+            header += struct.pack("!Q", n)
+        mask = os.urandom(4)
+        header += mask
+        masked = bytes(b ^ mask[i & 3] for i, b in enumerate(data))
+        self.writer.write(bytes(header) + masked)
+        await self.writer.drain()
+
+    async def send(self, message: str | bytes) -> None:
+        if isinstance(message, str):
+            await self._send_frame(OP_TEXT, message.encode())
+        else:
+            await self._send_frame(OP_BINARY, message)
+
+    async def _read_frame(self) -> tuple[bool, int, bytes]:
+        b0, b1 = await self.reader.readexactly(2)
+        n = b1 & 0x7F
+        if n == 126:
+            (n,) = struct.unpack("!H", await self.reader.readexactly(2))
+        elif n == 127:
+            (n,) = struct.unpack("!Q", await self.reader.readexactly(8))
+        if n > MAX_MESSAGE_BYTES:
+            raise ValueError(f"websocket frame of {n} bytes exceeds {MAX_MESSAGE_BYTES}")
+        mask = await self.reader.readexactly(4) if b1 & 0x80 else None
+        data = await self.reader.readexactly(n)
+        if mask:
+            data = bytes(b ^ mask[i & 3] for i, b in enumerate(data))
+        return bool(b0 & 0x80), b0 & 0x0F, data
+
+    async def recv(self) -> str | bytes | None:
+        """Next message (str for text frames), or None once the connection closed."""
+        parts: list[bytes] = []
+        kind = OP_TEXT
+        while not self.closed:
+            try:
+                fin, opcode, data = await self._read_frame()
+            except (asyncio.IncompleteReadError, ConnectionError):
+                self.closed = True
+                break
+            if opcode == OP_PING:
+                await self._send_frame(OP_PONG, data)
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                await self.close(data[:2] or b"\x03\xe8")
+                break
+            if opcode != OP_CONT:
+                kind, parts = opcode, []
+            parts.append(data)
+            if fin:
+                message = b"".join(parts)
+                return message.decode("utf-8", "replace") if kind == OP_TEXT else message
+        return None
+
+    async def close(self, code: bytes = b"\x03\xe8") -> None:
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            await self._send_frame(OP_CLOSE, code)
+        except (ConnectionError, RuntimeError):
+            pass
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    async def __aenter__(self) -> "WebSocket":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+
+async def connect(url: str, *, timeout: float = 5.0, headers: dict[str, str] | None = None) -> WebSocket:
+    """Open a WebSocket to ``ws://`` or ``wss://`` ``url``."""
+    from urllib.parse import urlsplit
+
+    parts = urlsplit(url)
+    secure = parts.scheme in ("wss", "https")
+    port = parts.port or (443 if secure else 80)
+    path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parts.hostname, port, ssl=True if secure else None), timeout
+    )
+    key = base64.b64encode(os.urandom(16)).decode()
+    lines = [
+        f"GET {path} HTTP/1.1",
+        f"Host: {parts.netloc}",
+        "Upgrade: websocket",
+        "Connection: Upgrade",
+        f"Sec-WebSocket-Key: {key}",
+        "Sec-WebSocket-Version: 13",
+        *(f"{k}: {v}" for k, v in (headers or {}).items()),
+    ]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+    await writer.drain()
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+        writer.close()
+        raise HandshakeError(f"{url}: no handshake response") from e
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    response = {}
+    for line in header_lines:
+        name, sep, value = line.partition(":")
+        if sep:
+            response[name.strip().lower()] = value.strip()
+    expected = base64.b64encode(hashlib.sha1(key.encode() + _GUID).digest()).decode()
+    if status_line.split(" ")[1:2] != ["101"] or response.get("sec-websocket-accept") != expected:
+        writer.close()
+        raise HandshakeError(f"{url}: upgrade refused ({status_line})")
+    return WebSocket(reader, writer)
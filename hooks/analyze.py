@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""Offline post-mortem report over the server's SQLite event store.
+
+Opens the database read-only (memory-mapped), walks ``events`` in id order
+with keyset pagination (``WHERE id > ? ORDER BY id LIMIT n``, so every chunk
+costs the same however deep it is), and folds each chunk into running
+aggregates. Memory grows with the number of sessions and tools, never with
+the number of events, so multi-GB databases are fine.
+
+    python analyze.py ../server/data.sqlite --format md --out report.md
+    python analyze.py events.db --since 1772100000000 --source-app api --format json
+
+The report covers:
+
+    traces    session trees per trace (parent_session_id links)
+    tools     calls, failure rate, latency p50/p95/p99/max from span durations
+              (duration_ms) and MetricRollup histograms
+    cost      tokens and USD per session and source_app, priced like the
+              dashboard's token-burn view
+
+Latency percentiles come from a fixed log-scale histogram (8 buckets per
+doubling, so within ~9%). When NumPy is installed, each chunk's durations
+are bucketed and counted in one vectorized pass.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+from bisect import bisect_left
+from collections import Counter
+
+# Keep in sync with client/src/composables/useTokenBurn.ts (USD per 1M tokens).
+MODEL_PRICING = {
+    "claude-opus-4-6": (15.00, 75.00),
+    "claude-sonnet-4-6": (3.00, 15.00),
+    "claude-haiku-4-5": (0.80, 4.00),
+    "default": (3.00, 15.00),
+}
+CHUNK_ROWS = 5000
+# Log-scale latency bounds in ms: 0.1ms .. ~1.8h, 8 buckets per doubling.
+LATENCY_BOUNDS_MS = tuple(0.1 * 2 ** (i / 8) for i in range(8 * 26 + 1))
+TOOL_EVENTS = ("PostToolUse", "PostToolUseFailure")
+DECODE_EVENTS = (*TOOL_EVENTS, "TokenUsage")
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def open_db(path: str):
+    """Read-only, memory-mapped connection and the name of its time column."""
+    import sqlite3
+    from urllib.parse import quote
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"no such database: {path}")
+    conn = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True)
+    conn.execute("PRAGMA query_only = 1")
+    conn.execute(f"PRAGMA mmap_size = {1 << 30}")
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(events)")}
+    if not columns:
+        conn.close()
+        raise ValueError(f"{path}: no events table")
+    # data.sqlite (current server) uses `timestamp`; older events.db files `created_at`.
+    time_col = "timestamp" if "timestamp" in columns else "created_at"
+    return conn, time_col
+
+
+def scan(conn, time_col: str, *, chunk: int = CHUNK_ROWS, since: int | None = None,
+         until: int | None = None, source_app: str | None = None):
+    """Yield lists of event rows in id order, ``chunk`` rows at a time."""
+    where, params = ["id > ?"], []
+    if since is not None:
+        where.append(f"{time_col} >= ?")
+        params.append(since)
+    if until is not None:
+        where.append(f"{time_col} < ?")
+        params.append(until)
+    if source_app is not None:
+        where.append("source_app = ?")
+        params.append(source_app)
+    sql = (f"SELECT id, event_type, session_id, trace_id, parent_session_id, source_app, payload, {time_col} "
+           f"FROM events WHERE {' AND '.join(where)} ORDER BY id LIMIT ?")
+    last = 0
+    while True:
+        rows = conn.execute(sql, (last, *params, chunk)).fetchall()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][0]
+
+
+def cost_usd(input_tokens: int, output_tokens: int, model: str) -> float:
+    price_in, price_out = MODEL_PRICING.get(model, MODEL_PRICING["default"])
+    return input_tokens / 1e6 * price_in + output_tokens / 1e6 * price_out
+
+
+def bucket_counts(keys: list, durations: list[float]) -> Counter:
+    """(key, histogram bucket) -> count for parallel lists of keys and durations (ms)."""
+    if not durations:
+        return Counter()
+    if np is None:
+        return Counter((k, bisect_left(LATENCY_BOUNDS_MS, d)) for k, d in zip(keys, durations))
+    # One searchsorted for the whole chunk, then count (key, bucket) pairs.
+    labels = {k: i for i, k in enumerate(dict.fromkeys(keys))}
+    names = list(labels)
+    idx = np.searchsorted(np.asarray(LATENCY_BOUNDS_MS), np.asarray(durations, dtype=float), side="left")
+    pairs = np.asarray([labels[k] for k in keys], dtype=np.int64) * (len(LATENCY_BOUNDS_MS) + 1) + idx
+    values, counts = np.unique(pairs, return_counts=True)
+    width = len(LATENCY_BOUNDS_MS) + 1
+    return Counter({(names[v // width], v % width): c for v, c in zip(values.tolist(), counts.tolist())})
+
+
+def percentile(hist: Counter, p: float) -> float | None:
+    """Upper bound of the bucket holding the p-th percentile."""
+    total = sum(hist.values())
+    if not total:
+        return None
+    rank = total * p / 100
+    seen = 0
+    for i in sorted(hist):
+        seen += hist[i]
+        if seen >= rank:
+            return round(LATENCY_BOUNDS_MS[min(i, len(LATENCY_BOUNDS_MS) - 1)], 2)
+    return None
+
+
+class _ToolStats:
+    __slots__ = ("calls", "failures", "hist", "max_ms")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.failures = 0
+        self.hist: Counter = Counter()
+        self.max_ms = 0.0
+
+    def merge(self, other: "_ToolStats") -> None:
+        self.calls += other.calls
+        self.failures += other.failures
+        self.hist.update(other.hist)
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+
+class Analysis:
+    """Running aggregates over event rows; feed chunks, then call report()."""
+
+    def __init__(self) -> None:
+        self.events = 0
+        self.first_ts: int | None = None
+        self.last_ts: int | None = None
+        self.event_types: Counter = Counter()
+        self.sessions: dict[str, dict] = {}
+        # (session, tool) -> stats from raw events and from rollups. Once a
+        # session sends rollups its raw tool events are only a sample, so the
+        # rollup side wins for that pair.
+        self.raw: dict[tuple[str, str], _ToolStats] = {}
+        self.rolled: dict[tuple[str, str], _ToolStats] = {}
+
+    def _session(self, session_id: str, row) -> dict:
+        s = self.sessions.get(session_id)
+        if s is None:
+            s = self.sessions[session_id] = {
+                "session_id": session_id, "source_app": row[5], "trace_id": row[3] or None,
+                "parent_session_id": row[4] or None, "events": 0, "failures": 0,
+                "first_ts": row[7], "last_ts": row[7],
+                "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0,
+            }
+        return s
+
+    def feed(self, rows: list) -> None:
+        timed_keys: list[tuple[str, str]] = []
+        durations: list[float] = []
+        for row in rows:
+            _, event_type, session_id, trace_id, parent, _, payload_raw, ts = row
+            self.events += 1
+            self.event_types[event_type] += 1
+            if self.first_ts is None or ts < self.first_ts:
+                self.first_ts = ts
+            if self.last_ts is None or ts > self.last_ts:
+                self.last_ts = ts
+            if event_type == "MetricRollup":
+                # Not session activity: one per window, per-session counts inside.
+                self._feed_rollup_event(session_id, payload_raw)
+                continue
+            s = self._session(session_id, row)
+            s["events"] += 1
+            s["last_ts"] = max(s["last_ts"], ts)
+            s["trace_id"] = s["trace_id"] or trace_id or None
+            s["parent_session_id"] = s["parent_session_id"] or parent or None
+            # Decode only the payloads the report reads.
+            if event_type not in DECODE_EVENTS and '"input_tokens"' not in payload_raw:
+                continue
+            try:
+                payload = json.loads(payload_raw)
+            except ValueError:
+                continue
+            if not isinstance(payload, dict):
+                continue
+            if event_type in TOOL_EVENTS:
+                tool = str(payload.get("tool") or payload.get("tool_name") or "")
+                stats = self.raw.setdefault((session_id, tool), _ToolStats())
+                stats.calls += 1
+                if event_type == "PostToolUseFailure":
+                    stats.failures += 1
+                    s["failures"] += 1
+                duration = payload.get("duration_ms")
+                if isinstance(duration, (int, float)):
+                    timed_keys.append((session_id, tool))
+                    durations.append(float(duration))
+                    stats.max_ms = max(stats.max_ms, float(duration))
+            tokens_in, tokens_out = payload.get("input_tokens"), payload.get("output_tokens")
+            if isinstance(tokens_in, int) or isinstance(tokens_out, int):
+                tokens_in = tokens_in if isinstance(tokens_in, int) else 0
+                tokens_out = tokens_out if isinstance(tokens_out, int) else 0
+                s["input_tokens"] += tokens_in
+                s["output_tokens"] += tokens_out
+                s["cost_usd"] += cost_usd(tokens_in, tokens_out, str(payload.get("model") or "default"))
+        for (key, bucket), n in bucket_counts(timed_keys, durations).items():
+            self.raw[key].hist[bucket] += n
+
+    def _feed_rollup_event(self, session_id: str, payload_raw: str) -> None:
+        try:
+            payload = json.loads(payload_raw)
+        except ValueError:
+            return
+        if not isinstance(payload, dict):
+            return
+        sessions = payload.get("sessions")
+        if not isinstance(sessions, dict):
+            # Older hooks posted one rollup per session with only "tools".
+            sessions = {session_id: payload.get("tools")}
+        bounds = payload.get("bucket_bounds_ms") or []
+        for sid, tools in sessions.items():
+            self._feed_rollup(sid, bounds, tools)
+
+    def _feed_rollup(self, session_id: str, bounds: list, tools: object) -> None:
+        if not isinstance(tools, dict):
+            return
+        for tool, c in tools.items():
+            if not isinstance(c, dict):
+                continue
+            stats = self.rolled.setdefault((session_id, tool), _ToolStats())
+            stats.calls += int(c.get("calls", 0))
+            stats.failures += int(c.get("failures", 0))
+            latency = c.get("latency") or {}
+            stats.max_ms = max(stats.max_ms, float(latency.get("max_ms", 0)))
+            for i, n in enumerate(latency.get("buckets") or []):
+                if n:
+                    # Re-bucket at the rollup bucket's upper bound (overflow: twice the last).
+                    upper = bounds[i] if i < len(bounds) else (bounds[-1] * 2 if bounds else 0)
+                    stats.hist[bisect_left(LATENCY_BOUNDS_MS, upper)] += int(n)
+
+    def tools(self) -> list[dict]:
+        merged: dict[str, _ToolStats] = {}
+        for key in self.raw.keys() | self.rolled.keys():
+            stats = self.rolled.get(key) or self.raw[key]
+            merged.setdefault(key[1], _ToolStats()).merge(stats)
+        out = []
+        for tool, stats in merged.items():
+            out.append({
+                "tool": tool,
+                "calls": stats.calls,
+                "failures": stats.failures,
+                "failure_rate": round(stats.failures / stats.calls, 4) if stats.calls else 0.0,
+                "timed": sum(stats.hist.values()),
+                "p50_ms": percentile(stats.hist, 50),
+                "p95_ms": percentile(stats.hist, 95),
+                "p99_ms": percentile(stats.hist, 99),
+                "max_ms": round(stats.max_ms, 2) if stats.hist else None,
+            })
+        return sorted(out, key=lambda t: -t["calls"])
+
+    def traces(self) -> list[dict]:
+        """Session trees, one per trace (or per root session without a trace id)."""
+        children: dict[str, list[str]] = {}
+        for sid, s in self.sessions.items():
+            parent = s["parent_session_id"]
+            if parent and parent != sid:
+                children.setdefault(parent, []).append(sid)
+
+        def node(sid: str, seen: set) -> dict:
+            seen.add(sid)
+            s = self.sessions.get(sid, {})
+            kids = [node(c, seen) for c in sorted(children.get(sid, [])) if c not in seen]
+            return {"session_id": sid, "events": s.get("events", 0), "failures": s.get("failures", 0),
+                    "cost_usd": round(s.get("cost_usd", 0.0), 4), "children": kids}
+
+        roots = [sid for sid, s in self.sessions.items()
+                 if not s["parent_session_id"] or s["parent_session_id"] not in self.sessions]
+        out = []
+        for sid in sorted(roots, key=lambda r: self.sessions[r]["first_ts"]):
+            s = self.sessions[sid]
+            out.append({"trace_id": s["trace_id"] or sid, "source_app": s["source_app"],
+                        "first_ts": s["first_ts"], "last_ts": s["last_ts"], "root": node(sid, set())})
+        return out
+
+    def report(self) -> dict:
+        by_app: dict[str, dict] = {}
+        for s in self.sessions.values():
+            app = by_app.setdefault(s["source_app"], {"source_app": s["source_app"], "sessions": 0, "events": 0,
+                                                      "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0})
+            app["sessions"] += 1
+            for key in ("events", "input_tokens", "output_tokens", "cost_usd"):
+                app[key] += s[key]
+        sessions = sorted(self.sessions.values(), key=lambda s: -s["cost_usd"])
+        for entry in (*by_app.values(), *sessions):
+            entry["cost_usd"] = round(entry["cost_usd"], 4)
+        return {
+            "events": self.events,
+            "first_ts": self.first_ts,
+            "last_ts": self.last_ts,
+            "event_types": dict(self.event_types.most_common()),
+            "total_cost_usd": round(sum(a["cost_usd"] for a in by_app.values()), 4),
+            "by_source_app": sorted(by_app.values(), key=lambda a: -a["cost_usd"]),
+            "sessions": sessions,
+            "tools": self.tools(),
+            "traces": self.traces(),
+        }
+
+
+def to_markdown(report: dict, *, max_traces: int = 20, max_rows: int = 25) -> str:
+    from datetime import datetime, timezone
+
+    def when(ms):
+        return datetime.fromtimestamp(ms / 1000, timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC") if ms else "—"
+
+    def ms(v):
+        return "—" if v is None else f"{v:,.1f}"
+
+    lines = [
+        "# Observability run report",
+        "",
+        f"- **Events:** {report['events']:,} from {when(report['first_ts'])} to {when(report['last_ts'])}",
+        f"- **Sessions:** {len(report['sessions']):,} in {len(report['traces']):,} traces",
+        f"- **Tool failures:** {sum(t['failures'] for t in report['tools']):,}",
+        f"- **Token cost:** ${report['total_cost_usd']:,.2f}",
+        "",
+        "## Cost by source app",
+        "",
+        "| Source app | Sessions | Events | Input tokens | Output tokens | Cost (USD) |",
+        "|---|---:|---:|---:|---:|---:|",
+    ]
+    for a in report["by_source_app"]:
+        lines.append(f"| {a['source_app']} | {a['sessions']:,} | {a['events']:,} | {a['input_tokens']:,} "
+                     f"| {a['output_tokens']:,} | {a['cost_usd']:,.2f} |")
+    lines += ["", "## Tools", "", "| Tool | Calls | Failure rate | p50 ms | p95 ms | p99 ms | Max ms |",
+              "|---|---:|---:|---:|---:|---:|---:|"]
+    for t in report["tools"][:max_rows]:
+        lines.append(f"| {t['tool'] or '—'} | {t['calls']:,} | {t['failure_rate']:.1%} | {ms(t['p50_ms'])} "
+                     f"| {ms(t['p95_ms'])} | {ms(t['p99_ms'])} | {ms(t['max_ms'])} |")
+    lines += ["", "## Most expensive sessions", "", "| Session | Source app | Events | Failures | Cost (USD) |",
+              "|---|---|---:|---:|---:|"]
+    for s in report["sessions"][:max_rows]:
+        lines.append(f"| `{s['session_id']}` | {s['source_app']} | {s['events']:,} | {s['failures']:,} "
+                     f"| {s['cost_usd']:,.2f} |")
+    lines += ["", "## Traces", ""]
+
+    def walk(node: dict, depth: int) -> None:
+        lines.append(f"{'  ' * depth}- `{node['session_id']}` — {node['events']:,} events, "
+                     f"{node['failures']:,} failures, ${node['cost_usd']:,.2f}")
+        for child in node["children"]:
+            walk(child, depth + 1)
+
+    for trace in report["traces"][:max_traces]:
+        lines.append(f"**{trace['trace_id']}** ({trace['source_app']}, {when(trace['first_ts'])})")
+        lines.append("")
+        walk(trace["root"], 0)
+        lines.append("")
+    if len(report["traces"]) > max_traces:
+        lines.append(f"_{len(report['traces']) - max_traces} more traces not shown._")
+    return "\n".join(lines).rstrip() + "\n"
+
+
+def analyze(path: str, **filters) -> dict:
+    conn, time_col = open_db(path)
+    try:
+        analysis = Analysis()
+        for rows in scan(conn, time_col, **filters):
+            analysis.feed(rows)
+        return analysis.report()
+    finally:
+        conn.close()
+
+
+def main(argv: list[str]) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("db", help="path to the server's SQLite file (data.sqlite or events.db)")
+    parser.add_argument("--format", choices=("md", "json"), default="md")
+    parser.add_argument("--out", help="write the report here instead of stdout")
+    parser.add_argument("--since", type=int, help="only events at or after this epoch-ms timestamp")
+    parser.add_argument("--until", type=int, help="only events before this epoch-ms timestamp")
+    parser.add_argument("--source-app", help="only events from this source_app")
+    parser.add_argument("--chunk", type=int, default=CHUNK_ROWS, help="rows per keyset page")
+    parser.add_argument("--traces", type=int, default=20, help="trace trees shown in Markdown output")
+    args = parser.parse_args(argv)
+
+    try:
+        report = analyze(args.db, chunk=max(1, args.chunk), since=args.since, until=args.until,
+                         source_app=args.source_app)
+    except (OSError, ValueError) as e:
+        print(f"analyze: {e}", file=sys.stderr)
+        return 1
+    text = to_markdown(report, max_traces=args.traces) if args.format == "md" else json.dumps(report, indent=2) + "\n"
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
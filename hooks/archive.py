@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""Move aged events out of the server's SQLite store into compressed archives.
+
+    python archive.py export ../server/data.sqlite --dest archive --older-than-days 3
+    python archive.py read archive --since 1772100000000 --source-app api > events.ndjson
+
+Export walks ``events`` in id order from a high-water mark kept in
+``<dest>/cursor.json`` and takes every row older than the cutoff, the same
+predicate server/ttl.ts prunes by. Hook timestamps come from the clients,
+so a row can be dated ahead of rows after it. Such a row must not hold back
+the aged rows behind it, which the TTL pruner would delete unarchived. Young
+rows the mark passes over are kept in the cursor as ``held`` and exported
+by whichever later run finds them old enough. Each batch is
+written as gzipped NDJSON, one file per day (UTC) and source_app:
+
+    <dest>/2026-02-26/<source_app>/<first id>-<last id>.ndjson.gz
+
+with ``payload`` and ``tags`` stored as parsed JSON. Large strings that the
+hooks sent once as ``{"$blob": hash}`` references stay references, but their
+content is copied out of the ``blobs`` table into the file, as a ``blobs``
+map on the first record that uses each hash, the same shape the hooks post.
+The server prunes blobs by TTL, so each partition has to stand on its own.
+Before a batch is
+written its file names are recorded in the cursor as pending; each file is
+written to a temp name, fsynced and renamed into place; then the cursor
+moves, recording which rows the batch holds, and only those are deleted.
+After a crash the next run removes files of the unfinished batch and
+deletes the rows of a finished one, so the archive holds every row exactly
+once.
+
+The reader streams matching partitions line by line, skipping whole days
+and apps by directory name, so scanning a range never loads a partition
+into memory. Every event it yields carries the ``blobs`` its payload refers
+to, wherever in the file they were stored.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+
+BATCH_ROWS = 20000
+BLOB_LOOKUP_CHUNK = 500  # hashes (or held ids) per query, under SQLite's variable limit
+DAY_MS = 86_400_000
+_SAFE = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+def _fsync_dir(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_atomic(path: str, text: str) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(os.path.dirname(path))
+
+
+def partition_name(source_app: str) -> str:
+    """Directory name for a source_app (path-safe, never empty)."""
+    return _SAFE.sub("_", source_app or "unknown").strip(".") or "unknown"
+
+
+def _day(ms: int) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(ms / 1000))
+
+
+def _blob_refs(value, found: dict) -> dict:
+    """Collect the hashes of {"$blob": hash} references in a parsed payload, in order."""
+    if isinstance(value, dict):
+        digest = value.get("$blob")
+        if isinstance(digest, str):
+            found[digest] = None
+        else:
+            for item in value.values():
+                _blob_refs(item, found)
+    elif isinstance(value, list):
+        for item in value:
+            _blob_refs(item, found)
+    return found
+
+
+def _record(row) -> dict:
+    id_, event_type, session_id, trace_id, parent, source_app, tags, payload, timestamp = row
+    try:
+        tags = json.loads(tags)
+    except (TypeError, ValueError):
+        pass  # keep the raw string rather than lose it
+    try:
+        payload = json.loads(payload)
+    except (TypeError, ValueError):
+        pass
+    return {"id": id_, "event_type": event_type, "session_id": session_id, "trace_id": trace_id,
+            "parent_session_id": parent, "source_app": source_app, "tags": tags, "payload": payload,
+            "timestamp": timestamp}
+
+
+class Exporter:
+    """Archives aged rows of ``db`` into ``dest``; see run()."""
+
+    def __init__(self, db: str, dest: str, *, batch: int = BATCH_ROWS, delete: bool = True) -> None:
+        if not os.path.exists(db):
+            raise FileNotFoundError(f"no such database: {db}")
+        self.dest = dest
+        self.batch = max(1, batch)
+        self.delete = delete
+        os.makedirs(dest, exist_ok=True)
+        self.cursor_path = os.path.join(dest, "cursor.json")
+        self.conn = sqlite3.connect(db, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA busy_timeout = 30000")  # the server keeps writing meanwhile
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(events)")}
+        if not columns:
+            raise ValueError(f"{db}: no events table")
+        self.time_col = "timestamp" if "timestamp" in columns else "created_at"
+        self.has_blobs = bool(self.conn.execute("PRAGMA table_info(blobs)").fetchall())
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _load_cursor(self) -> dict:
+        try:
+            with open(self.cursor_path) as f:
+                state = json.load(f)
+            last_id = int(state["last_id"])
+            if "held" not in state:
+                # Written before rows were held: everything up to last_id was archived.
+                return {"last_id": last_id, "pending": list(state.get("pending", [])), "held": [],
+                        "deleting": {"first": 1, "last": last_id, "cutoff": 2 ** 63 - 1} if last_id else None}
+            return {"last_id": last_id, "pending": list(state["pending"]), "held": [int(i) for i in state["held"]],
+                    "deleting": state.get("deleting")}
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            return {"last_id": 0, "pending": [], "held": [], "deleting": None}
+
+    def _save_cursor(self, last_id: int, pending: list[str], held: list[int] = (),
+                     deleting: dict | None = None) -> None:
+        _write_atomic(self.cursor_path, json.dumps({"last_id": last_id, "pending": pending, "held": list(held),
+                                                    "deleting": deleting, "updated": int(time.time() * 1000)}))
+
+    def cursor(self) -> int:
+        return self._load_cursor()["last_id"]
+
+    def _delete_archived(self, deleting: dict | None) -> int:
+        """Delete the rows of a written batch: listed ids, or aged rows in an id range."""
+        if not self.delete or not deleting:
+            return 0
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            if "ids" in deleting:
+                deleted = 0
+                for i in range(0, len(deleting["ids"]), BLOB_LOOKUP_CHUNK):
+                    chunk = deleting["ids"][i:i + BLOB_LOOKUP_CHUNK]
+                    marks = ",".join("?" * len(chunk))
+                    deleted += self.conn.execute(f"DELETE FROM events WHERE id IN ({marks})", chunk).rowcount
+            else:
+                deleted = self.conn.execute(
+                    f"DELETE FROM events WHERE id BETWEEN ? AND ? AND {self.time_col} < ?",
+                    (deleting["first"], deleting["last"], deleting["cutoff"])).rowcount
+            self.conn.execute("COMMIT")
+        except sqlite3.Error:
+            self.conn.execute("ROLLBACK")
+            raise
+        return deleted
+
+    def _export(self, rows: list, last_id: int, held: list[int], committed: tuple[int, list[int], dict]) -> int:
+        """Write one batch and move the cursor to ``committed``; returns the file count.
+
+        ``last_id``/``held`` describe the cursor before the batch, which a
+        crash while writing falls back to.
+        """
+        plan = self._plan(rows)
+        self._save_cursor(last_id, list(plan), held)
+        for path, group in plan.items():
+            self._write(path, group)
+        self._save_cursor(committed[0], [], committed[1], committed[2])
+        return len(plan)
+
+    def _plan(self, rows: list) -> dict[str, list]:
+        """Archive path -> rows, one file per (day, source_app) in the batch."""
+        plan: dict[str, list] = {}
+        for row in rows:
+            directory = os.path.join(self.dest, _day(row[8]), partition_name(row[5]))
+            plan.setdefault(directory, []).append(row)
+        return {os.path.join(d, f"{group[0][0]}-{group[-1][0]}.ndjson.gz"): group for d, group in plan.items()}
+
+    def _blobs(self, hashes: list[str]) -> dict[str, str]:
+        """Content of the given blobs still in the database (pruned ones are left out)."""
+        if not self.has_blobs:
+            return {}
+        found: dict[str, str] = {}
+        for i in range(0, len(hashes), BLOB_LOOKUP_CHUNK):
+            chunk = hashes[i:i + BLOB_LOOKUP_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            found.update(self.conn.execute(f"SELECT hash, content FROM blobs WHERE hash IN ({marks})", chunk))
+        return found
+
+    def _write(self, path: str, rows: list) -> None:
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        records = [_record(row) for row in rows]
+        refs = [_blob_refs(r["payload"], {}) for r in records]
+        blobs = self._blobs(list({digest: None for found in refs for digest in found}))
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) as gz:
+                for record, found in zip(records, refs):
+                    first = {digest: blobs.pop(digest) for digest in found if digest in blobs}
+                    if first:
+                        record["blobs"] = first
+                    gz.write(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp, path)
+        _fsync_dir(directory)
+
+    def run(self, cutoff_ms: int) -> dict:
+        """Export and delete every aged row past the cursor. Returns counts."""
+        state = self._load_cursor()
+        last_id, held = state["last_id"], state["held"]
+        if state["pending"]:
+            # Files of a batch that died before the cursor moved: it is redone below.
+            for path in state["pending"]:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            self._save_cursor(last_id, [], held, state["deleting"])
+        # Rows archived by a run that died before its delete.
+        deleted = self._delete_archived(state["deleting"])
+        exported, files = 0, 0
+        columns = (f"id, event_type, session_id, trace_id, parent_session_id, source_app, tags, payload, "
+                   f"{self.time_col}")
+
+        # Held rows first: those old enough by now go out, vanished ones are forgotten.
+        ripe, young = [], []
+        for i in range(0, len(held), BLOB_LOOKUP_CHUNK):
+            chunk = held[i:i + BLOB_LOOKUP_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            for row in self.conn.execute(f"SELECT {columns} FROM events WHERE id IN ({marks}) ORDER BY id", chunk):
+                (ripe if row[8] < cutoff_ms else young).append(row)
+        held = [row[0] for row in young]
+        for i in range(0, len(ripe), self.batch):
+            batch, later = ripe[i:i + self.batch], [row[0] for row in ripe[i + self.batch:]]
+            deleting = {"ids": [row[0] for row in batch]}
+            files += self._export(batch, last_id, sorted(deleting["ids"] + later + held),
+                                  (last_id, sorted(later + held), deleting))
+            deleted += self._delete_archived(deleting)
+            exported += len(batch)
+
+        sql = f"SELECT {columns} FROM events WHERE id > ? AND {self.time_col} < ? ORDER BY id LIMIT ?"
+        passed = f"SELECT id FROM events WHERE id > ? AND id < ? AND {self.time_col} >= ? ORDER BY id"
+        while True:
+            rows = self.conn.execute(sql, (last_id, cutoff_ms, self.batch)).fetchall()
+            if not rows:
+                break
+            # Younger rows among these ids (e.g. future-dated by a skewed clock) wait in held.
+            now_held = held + [r[0] for r in self.conn.execute(passed, (last_id, rows[-1][0], cutoff_ms))]
+            deleting = {"first": rows[0][0], "last": rows[-1][0], "cutoff": cutoff_ms}
+            files += self._export(rows, last_id, held, (rows[-1][0], now_held, deleting))
+            last_id, held = rows[-1][0], now_held
+            deleted += self._delete_archived(deleting)
+            exported += len(rows)
+            if len(rows) < self.batch:
+                break
+        if deleted:
+            try:
+                self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error:
+                pass  # the server holds a read transaction; its own checkpoints catch up
+        return {"exported": exported, "deleted": deleted, "files": files, "last_id": last_id, "held": len(held)}
+
+
+def read(dest: str, *, since: int | None = None, until: int | None = None, source_app: str | None = None,
+         session_id: str | None = None):
+    """Yield archived events in [since, until), partition by partition, in id order within each."""
+    try:
+        days = sorted(d for d in os.listdir(dest) if re.fullmatch(r"\d{4}-\d{2}-\d{2}", d))
+    except FileNotFoundError:
+        return
+    first_day = _day(since) if since is not None else None
+    last_day = _day(until - 1) if until is not None else None
+    app_dir = partition_name(source_app) if source_app is not None else None
+    for day in days:
+        if (first_day and day < first_day) or (last_day and day > last_day):
+            continue
+        day_path = os.path.join(dest, day)
+        apps = [app_dir] if app_dir else sorted(os.listdir(day_path))
+        for app in apps:
+            app_path = os.path.join(day_path, app)
+            try:
+                names = [n for n in os.listdir(app_path) if n.endswith(".ndjson.gz")]
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            for name in sorted(names, key=lambda n: int(n.split("-", 1)[0])):
+                blobs: dict[str, str] = {}
+                with gzip.open(os.path.join(app_path, name), "rt", encoding="utf-8") as f:
+                    for line in f:
+                        event = json.loads(line)
+                        blobs.update(event.pop("blobs", None) or {})
+                        ts = event["timestamp"]
+                        if (since is not None and ts < since) or (until is not None and ts >= until):
+                            continue
+                        if session_id is not None and event["session_id"] != session_id:
+                            continue
+                        if source_app is not None and event["source_app"] != source_app:
+                            continue
+                        own = {d: blobs[d] for d in _blob_refs(event["payload"], {}) if d in blobs}
+                        if own:
+                            event["blobs"] = own
+                        yield event
+
+
+def main(argv: list[str]) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    e = sub.add_parser("export", help="archive and delete aged events")
+    e.add_argument("db", help="path to the server's SQLite file")
+    e.add_argument("--dest", required=True, help="archive directory")
+    e.add_argument("--older-than-days", type=float, default=3.0)
+    e.add_argument("--batch", type=int, default=BATCH_ROWS, help="rows per batch")
+    e.add_argument("--keep", action="store_true", help="export without deleting from the database")
+    r = sub.add_parser("read", help="stream archived events as NDJSON")
+    r.add_argument("dest")
+    r.add_argument("--since", type=int, help="epoch ms, inclusive")
+    r.add_argument("--until", type=int, help="epoch ms, exclusive")
+    r.add_argument("--source-app")
+    r.add_argument("--session")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "read":
+        out = sys.stdout
+        for event in read(args.dest, since=args.since, until=args.until, source_app=args.source_app,
+                          session_id=args.session):
+            out.write(json.dumps(event) + "\n")
+        return 0
+    try:
+        exporter = Exporter(args.db, args.dest, batch=args.batch, delete=not args.keep)
+    except (OSError, ValueError) as err:
+        print(f"archive: {err}", file=sys.stderr)
+        return 1
+    try:
+        result = exporter.run(int(time.time() * 1000 - args.older_than_days * DAY_MS))
+    finally:
+        exporter.close()
+    print(json.dumps(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""End-to-end overhead benchmark for the hook scripts.
+
+Every hook runs as a real subprocess against a local stub server (see
+stub_server.py), once per run for wall time, and once more per run through a
+probe that splits the same work into phases:
+
+    startup    process spawn to first line of Python (interpreter init)
+    import     _base + the hook module
+    parse      stdin read + JSON decode
+    build      build_payload
+    serialize  JSON encode for the wire
+    network    relay hand-off or POST, including spooling on failure
+
+    python bench_hooks.py --servers fast,hang --sizes tiny,huge --runs 20 \\
+        --out bench.json --budget bench_budget.json
+
+Results (p50/p95/p99 per scenario) go to --out as JSON. With --budget, any
+scenario over its limits is listed and the exit status is 1, so CI can fail
+on an overhead regression. Budget files map fnmatch patterns over
+"<event>/<server>/<size>" to limits on dotted result keys, e.g.
+{"*/fast/tiny": {"wall_ms.p95": 200, "phases_ms.network.p95": 20}}.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PHASES = ("startup", "import", "parse", "build", "serialize", "network")
+SIZES = {"tiny": 64, "small": 16 * 1024, "large": 1024 * 1024, "huge": 8 * 1024 * 1024}
+
+
+def _probe() -> None:
+    """Run one hook in-process with phase timers. Invoked as a subprocess."""
+    started = time.time_ns()
+    timings = dict.fromkeys(PHASES, 0)
+    timings["startup"] = started - int(os.environ["OBS_BENCH_SPAWN_NS"])
+    module_name = sys.argv[2]
+    sys.path.insert(0, HERE)
+
+    t = time.perf_counter_ns()
+    import _base
+    module = __import__(module_name)
+    timings["import"] = time.perf_counter_ns() - t
+
+    def timed(phase, fn):
+        def wrapper(*args, **kwargs):
+            t = time.perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timings[phase] += time.perf_counter_ns() - t
+        return wrapper
+
+    _base.build_payload = timed("build", _base.build_payload)
+    _base.serialize = timed("serialize", _base.serialize)
+    _base.deliver = timed("network", _base.deliver)
+
+    t = time.perf_counter_ns()
+    data = _base.read_hook_input()
+    timings["parse"] = time.perf_counter_ns() - t
+    module.main(data)
+
+    with open(os.environ["OBS_BENCH_OUT"], "w") as f:
+        json.dump({k: v / 1e6 for k, v in timings.items()}, f)
+
+
+def synth_input(event: str, size: str) -> bytes:
+    """A hook stdin document whose tool payload is roughly ``size`` bytes."""
+    n = SIZES[size]
+    body = ("lorem ipsum dolor sit amet\n" * (n // 27 + 1))[:n]
+    return json.dumps({
+        "hook_event_name": event,
+        "session_id": "bench-session",
+        "tool_name": "Write",
+        "tool_input": {"file_path": "/tmp/bench.txt", "content": body},
+        "tool_response": {"filePath": "/tmp/bench.txt", "content": body, "success": True},
+        "prompt": body[:4096],
+        "message": "bench",
+    }).encode()
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    """Nearest-rank p50/p95/p99 plus max, in the values' unit."""
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, -(-len(ordered) * p // 100) - 1))]
+
+    return {"p50": round(rank(50), 3), "p95": round(rank(95), 3), "p99": round(rank(99), 3), "max": round(ordered[-1], 3)}
+
+
+def run_scenario(event: str, module: str, server: str, size: str, runs: int, *,
+                 delay: float = 0.2, pyz: str | None = None) -> dict:
+    import subprocess
+    import tempfile
+    from stub_server import StubServer
+
+    stdin = synth_input(event, size)
+    script = [sys.executable, "-S", pyz] if pyz else [sys.executable, os.path.join(HERE, f"{module}.py")]
+    walls: list[float] = []
+    phases: dict[str, list[float]] = {p: [] for p in PHASES}
+    with StubServer(server, delay) as stub, tempfile.TemporaryDirectory() as state:
+        env = dict(os.environ, OBS_SERVER=stub.url, OBS_STATE_DIR=state)
+        out = os.path.join(state, "probe.json")
+        for _ in range(runs):
+            t = time.perf_counter()
+            subprocess.run(script, input=stdin, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            walls.append((time.perf_counter() - t) * 1000)
+
+            env["OBS_BENCH_OUT"] = out
+            env["OBS_BENCH_SPAWN_NS"] = str(time.time_ns())
+            subprocess.run([sys.executable, "-S", __file__, "--probe", module], input=stdin, env=env,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                with open(out) as f:
+                    sample = json.load(f)
+                os.unlink(out)
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+            for p in PHASES:
+                phases[p].append(sample[p])
+    return {
+        "scenario": f"{event}/{server}/{size}",
+        "event": event,
+        "server": server,
+        "size": size,
+        "input_bytes": len(stdin),
+        "runs": runs,
+        "wall_ms": percentiles(walls),
+        "phases_ms": {p: percentiles(v) for p, v in phases.items()},
+    }
+
+
+def _lookup(result: dict, dotted: str):
+    value = result
+    for key in dotted.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def check_budget(results: list[dict], budget: dict[str, dict[str, float]]) -> list[str]:
+    """Every budget limit a result exceeds, as human-readable lines."""
+    from fnmatch import fnmatchcase
+
+    violations = []
+    for result in results:
+        for pattern, limits in budget.items():
+            if not fnmatchcase(result["scenario"], pattern):
+                continue
+            for key, limit in limits.items():
+                value = _lookup(result, key)
+                if isinstance(value, (int, float)) and value > limit:
+                    violations.append(f"{result['scenario']}: {key} = {value:.1f} > {limit}")
+    return violations
+
+
+def main(argv: list[str]) -> int:
+    import argparse
+    import platform
+
+    sys.path.insert(0, HERE)
+    import dispatch
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hooks", default=",".join(dispatch.HOOKS), help="comma-separated event names")
+    parser.add_argument("--servers", default="fast", help="comma-separated stub modes: fast,slow,refuse,hang")
+    parser.add_argument("--sizes", default="tiny,large", help=f"comma-separated: {','.join(SIZES)}")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.2, help="slow-mode response delay (s)")
+    parser.add_argument("--pyz", help="benchmark this zipapp (run with -S) instead of the scripts")
+    parser.add_argument("--out", default="bench_output.json")
+    parser.add_argument("--budget", help="JSON budget file; exit 1 on any violation")
+    args = parser.parse_args(argv)
+
+    results = []
+    for event in args.hooks.split(","):
+        module = dispatch.HOOKS[event]
+        for server in args.servers.split(","):
+            for size in args.sizes.split(","):
+                result = run_scenario(event, module, server, size, args.runs, delay=args.delay, pyz=args.pyz)
+                results.append(result)
+                ph = result["phases_ms"]
+                print(f"{result['scenario']:<36} wall p50 {result['wall_ms']['p50']:7.1f}  "
+                      f"p95 {result['wall_ms']['p95']:7.1f}  p99 {result['wall_ms']['p99']:7.1f} ms  | "
+                      + "  ".join(f"{p} {ph[p]['p50']:.1f}" for p in PHASES), flush=True)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runs": args.runs,
+            "target": args.pyz or "scripts",
+            "created": int(time.time()),
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.out}")
+
+    if args.budget:
+        with open(args.budget) as f:
+            violations = check_budget(results, json.load(f))
+        for line in violations:
+            print(f"OVER BUDGET  {line}")
+        return 1 if violations else 0
+    return 0
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--probe"]:
+        _probe()
+    else:
+        sys.exit(main(sys.argv[1:]))
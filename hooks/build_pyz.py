@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Bundle the hooks into one zipapp: ``python3 -S obs_hooks.pyz``.
+
+Modules are shipped as unchecked-hash .pyc files so zipimport never has to
+compile source on a hook's startup path, with their .py sources next to
+them: zipimport skips bytecode whose magic number does not match the running
+interpreter and falls back to the source, so the bundle keeps working (if
+slower) after the ``python3`` on PATH moves to another minor version.
+
+    python build_pyz.py [-o obs_hooks.pyz] [--measure N]
+
+--measure runs every event N times through the per-event scripts and through
+the zipapp and prints median wall time per hook, before and after.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import py_compile
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipapp
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+EXCLUDE = {"build_pyz.py", "bench_hooks.py", "stub_server.py", "conftest.py", "analyze.py", "loadgen.py", "_ws.py", "archive.py", "subscriber.py"}
+
+
+def _modules() -> list[Path]:
+    return sorted(
+        p for p in HERE.glob("*.py")
+        if p.name not in EXCLUDE and not p.name.startswith("test_")
+    )
+
+
+def build(target: Path) -> Path:
+    with tempfile.TemporaryDirectory() as tmp:
+        staging = Path(tmp)
+        for src in _modules():
+            py_compile.compile(
+                str(src),
+                cfile=str(staging / (src.stem + ".pyc")),
+                dfile=src.name,
+                doraise=True,
+                invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+            )
+            shutil.copyfile(src, staging / src.name)
+        (staging / "__main__.py").write_text("import dispatch\ndispatch.run()\n")
+        zipapp.create_archive(staging, target, interpreter="/usr/bin/env python3")
+    return target
+
+
+def _median_ms(cmd: list[str], stdin: bytes, env: dict[str, str], runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, input=stdin, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def measure(pyz: Path, runs: int) -> None:
+    import dispatch
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    import threading
+
+    class Sink(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self.send_response(201)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Sink)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    with tempfile.TemporaryDirectory() as state:
+        env = dict(os.environ, OBS_SERVER=f"http://127.0.0.1:{httpd.server_address[1]}", OBS_STATE_DIR=state)
+        print(f"{'event':<20} {'script ms':>10} {'pyz -S ms':>10}")
+        for event, module in dispatch.HOOKS.items():
+            stdin = json.dumps({"hook_event_name": event, "session_id": "bench", "tool_name": "Bash"}).encode()
+            before = _median_ms([sys.executable, str(HERE / f"{module}.py")], stdin, env, runs)
+            after = _median_ms([sys.executable, "-S", str(pyz)], stdin, env, runs)
+            print(f"{event:<20} {before:>10.1f} {after:>10.1f}")
+    httpd.shutdown()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", type=Path, default=HERE / "obs_hooks.pyz")
+    parser.add_argument("--measure", type=int, metavar="N", help="compare startup over N runs per hook")
+    args = parser.parse_args()
+    target = build(args.output)
+    print(f"built {target} ({target.stat().st_size} bytes)")
+    if args.measure:
+        measure(target, args.measure)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
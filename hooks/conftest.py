@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _isolated_state_dir(tmp_path, monkeypatch):
+    """Keep relay sockets, spool segments and caches out of the real home dir."""
+    monkeypatch.setenv("OBS_STATE_DIR", str(tmp_path / "state"))
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""Single entry point for every hook event.
+
+Routes on ``hook_event_name`` to the matching hook module's ``main()`` and
+imports only that module, so one settings entry (or the zipapp built by
+build_pyz.py) serves all 12 lifecycle events. Like the standalone scripts,
+it runs through _base.run_hook, which reports each run's overhead.
+"""
+import _base
+
+HOOKS = {
+    "SessionStart": "session_start",
+    "SessionEnd": "session_end",
+    "Stop": "stop",
+    "SubagentStart": "subagent_start",
+    "SubagentStop": "subagent_stop",
+    "PreToolUse": "pre_tool_use",
+    "PostToolUse": "post_tool_use",
+    "PostToolUseFailure": "post_tool_use_failure",
+    "Notification": "notification",
+    "PermissionRequest": "permission_request",
+    "UserPromptSubmit": "user_prompt_submit",
+    "PreCompact": "pre_compact",
+}
+
+
+def main(data: dict) -> None:
+    module = HOOKS.get(data.get("hook_event_name", ""))
+    if module is None:
+        return  # unknown or future event: observe nothing rather than fail
+    __import__(module).main(data)
+
+
+def run() -> None:
+    _base.run_hook(main)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""Swarm load generator for the ingest server.
+
+Builds events with the hooks' own ``_base.build_payload`` and sends them
+open-loop: each event has a scheduled send time fixed in advance, and a slow
+server does not slow the schedule down. Latency is measured from the
+scheduled time, so queueing inside the generator counts against the server
+rather than hiding it. Each POST is a fresh connection, like a hook.
+
+    synth   N agents in lead -> subagent trees with a weighted tool mix
+    replay  sessions read from an events database, in their original timing
+            divided by --compress (or at --rate, if given)
+
+    python loadgen.py synth --agents 20 --rate 500 --duration 30 --ws
+    python loadgen.py replay ../server/events.db --compress 60 --out load.json
+
+With --ws the generator also listens on /stream and reports fan-out lag: how
+long after a POST was sent its event reached a WebSocket client. Every event
+carries ``payload.loadgen.seq`` for this. Synthetic events use source_app
+``loadgen``; replayed ones get ``loadgen-<run>-`` in front of their recorded
+session, parent, trace and source_app ids, so they never join a real
+session and the rows are easy to find and delete afterwards.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+import _base
+
+TOOL_MIX = {
+    "Read": 35, "Grep": 15, "Bash": 20, "Edit": 10, "Glob": 8, "Write": 5,
+    "WebFetch": 2, "mcp__github__get_issue": 3, "mcp__context7__query-docs": 2,
+}
+FAILURE_RATE = 0.05
+SUBAGENTS_PER_LEAD = 3
+MODELS = ("claude-opus-4-6", "claude-sonnet-4-6", "claude-haiku-4-5")
+
+
+def _tool_input(tool: str, rng: random.Random) -> dict:
+    n = rng.randrange(1000)
+    if tool == "Bash":
+        return {"command": rng.choice(["pytest -q", "git status", "ls -la", "npm run build"]) + f" # {n}"}
+    if tool in ("Read", "Edit", "Write"):
+        return {"file_path": f"/repo/src/module_{n}.py"}
+    if tool in ("Grep", "Glob"):
+        return {"pattern": f"def handler_{n}"}
+    if tool == "WebFetch":
+        return {"url": f"https://example.com/docs/{n}"}
+    return {"query": f"item {n}"}
+
+
+def synth(agents: int, *, seed: int = 0, source_app: str = "loadgen"):
+    """Yield an endless interleaved event stream for ``agents`` concurrent agents.
+
+    Agents are grouped into trees: each lead spawns up to SUBAGENTS_PER_LEAD
+    subagents (SubagentStart with parent_session_id, shared trace_id). Every
+    agent then loops over tool calls (PreToolUse + PostToolUse or, at
+    FAILURE_RATE, PostToolUseFailure, with span fields) and periodic
+    TokenUsage, ending each episode with Stop/SubagentStop.
+    """
+    rng = random.Random(seed)
+    tools, weights = list(TOOL_MIX), list(TOOL_MIX.values())
+    run = f"{seed:x}{int(time.time()):x}"
+
+    def agent(index: int):
+        group = index // (SUBAGENTS_PER_LEAD + 1)
+        lead_id = f"loadgen-{run}-lead{group}"
+        is_lead = index % (SUBAGENTS_PER_LEAD + 1) == 0
+        session_id = lead_id if is_lead else f"loadgen-{run}-sub{index}"
+        parent = None if is_lead else lead_id
+        model = MODELS[0] if is_lead else rng.choice(MODELS[1:])
+
+        def event(event_type: str, payload: dict) -> dict:
+            return _base.build_payload(event_type=event_type, session_id=session_id, source_app=source_app,
+                                       payload=payload, parent_session_id=parent, trace_id=lead_id)
+
+        yield event("SessionStart" if is_lead else "SubagentStart", {"model": model, "agent_type": "lead" if is_lead else "worker"})
+        turn = 0
+        while True:
+            for _ in range(rng.randint(3, 12)):
+                tool = rng.choices(tools, weights)[0]
+                tool_input = _tool_input(tool, rng)
+                span_id = f"{rng.getrandbits(64):016x}"
+                yield event("PreToolUse", {"tool": tool, "input": tool_input, "span_id": span_id})
+                duration = round(rng.lognormvariate(3.5, 1.2), 3)
+                span = {"span_id": span_id, "start_ts": int(time.time() * 1000), "duration_ms": duration}
+                if rng.random() < FAILURE_RATE:
+                    yield event("PostToolUseFailure", {"tool": tool, "error": "exit status 1", "interrupted": False, **span})
+                else:
+                    yield event("PostToolUse", {"tool": tool, "is_mcp": tool.startswith("mcp__"), "input": tool_input,
+                                                "response_summary": "ok", **span})
+            yield event("TokenUsage", {"model": model, "turn": turn, "input_tokens": rng.randint(2000, 40000),
+                                       "output_tokens": rng.randint(100, 4000)})
+            turn += 1
+            yield event("Stop" if is_lead else "SubagentStop", {"stop_hook_active": False})
+
+    streams = [agent(i) for i in range(agents)]
+    while True:
+        yield next(rng.choice(streams))
+
+
+def replay(path: str, *, compress: float = 1.0, since: int | None = None, source_app: str | None = None,
+           run: str | None = None):
+    """Yield (offset_secs, event) from a recorded database, timing divided by ``compress``.
+
+    Session, parent, trace and source_app ids become ``loadgen-<run>-<recorded>``.
+    The trace_id is passed through that way, even when empty, so it is never
+    looked up in this host's session registry.
+    """
+    import analyze
+
+    prefix = f"loadgen-{run or format(int(time.time()), 'x')}-"
+
+    def tag(value: str | None) -> str | None:
+        return prefix + value if value else value
+
+    conn, time_col = analyze.open_db(path)
+    try:
+        start = None
+        for rows in analyze.scan(conn, time_col, since=since, source_app=source_app):
+            for _, event_type, session_id, trace_id, parent, app, payload_raw, ts in rows:
+                try:
+                    payload = json.loads(payload_raw)
+                except ValueError:
+                    payload = {}
+                start = ts if start is None else start
+                event = _base.build_payload(event_type=event_type, session_id=tag(session_id) or "unknown",
+                                            source_app=tag(app) or prefix + "unknown",
+                                            payload=payload if isinstance(payload, dict) else {},
+                                            parent_session_id=tag(parent), trace_id=tag(trace_id) or "")
+                yield max(0.0, (ts - start) / 1000 / compress), event
+    finally:
+        conn.close()
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    from bench_hooks import percentiles as _percentiles
+
+    return _percentiles(values)
+
+
+class LoadRun:
+    """One open-loop run: schedule, send, and collect per-event results."""
+
+    def __init__(self, server: str, *, workers: int = 64, timeout: float = 5.0, ws: bool = False) -> None:
+        self.server = server.rstrip("/")
+        self.workers = workers
+        self.timeout = timeout
+        self.ws = ws
+        self.latencies: list[float] = []
+        self.service: list[float] = []
+        self.errors: dict[str, int] = {}
+        self.sent_at: dict[int, float] = {}
+        self.lags: list[float] = []
+        self.received = 0
+        self.scheduled = 0
+        self.max_behind = 0.0
+        self._errors_lock = threading.Lock()
+
+    def _post(self, seq: int, body: bytes, scheduled: float) -> None:
+        started = time.time()
+        if self.ws:
+            self.sent_at[seq] = started
+        try:
+            status, _, _ = _base.http_request("POST", f"{self.server}/events", body,
+                                              headers={"Content-Type": "application/json"}, timeout=self.timeout)
+            outcome = None if status is not None and status < 300 else f"http {status}"
+        except (OSError, ValueError, IndexError) as e:
+            # An overloaded server that closes the connection leaves an empty
+            # or garbled status line, which http_request fails to parse.
+            outcome = type(e).__name__
+        done = time.time()
+        if outcome is None:
+            self.latencies.append((done - scheduled) * 1000)
+            self.service.append((done - started) * 1000)
+        else:
+            with self._errors_lock:
+                self.errors[outcome] = self.errors.get(outcome, 0) + 1
+
+    async def _listen(self, ready: asyncio.Event, stop: asyncio.Event) -> None:
+        import _ws
+
+        url = "ws" + self.server[4:] + "/stream" if self.server.startswith("http") else self.server + "/stream"
+        try:
+            ws = await _ws.connect(url, timeout=self.timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            self.errors[f"ws {type(e).__name__}"] = 1
+            ready.set()
+            return
+        ready.set()
+        async with ws:
+            while not stop.is_set():
+                try:
+                    message = await asyncio.wait_for(ws.recv(), 0.2)
+                except asyncio.TimeoutError:
+                    continue
+                if message is None:
+                    return
+                now = time.time()
+                try:
+                    seq = json.loads(json.loads(message)["payload"])["loadgen"]["seq"]
+                except (ValueError, KeyError, TypeError):
+                    continue
+                sent = self.sent_at.get(seq)
+                if sent is not None:
+                    self.received += 1
+                    self.lags.append((now - sent) * 1000)
+
+    async def run(self, schedule, *, duration: float | None = None, drain_secs: float = 2.0) -> dict:
+        """Send every (offset_secs, event) of ``schedule`` at its offset from now."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        loop = asyncio.get_running_loop()
+        pool = ThreadPoolExecutor(self.workers)
+        stop, ready = asyncio.Event(), asyncio.Event()
+        listener = loop.create_task(self._listen(ready, stop)) if self.ws else None
+        if listener:
+            await ready.wait()
+        pending = set()
+        t0 = time.time()
+        for seq, (offset, event) in enumerate(schedule):
+            if duration is not None and offset >= duration:
+                break
+            scheduled = t0 + offset
+            delay = scheduled - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                self.max_behind = max(self.max_behind, -delay)
+            event["payload"] = {**event.get("payload", {}), "loadgen": {"seq": seq}}
+            body = _base.serialize(event)
+            if body is None:
+                continue
+            self.scheduled += 1
+            task = loop.run_in_executor(pool, self._post, seq, body, scheduled)
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.wait(pending)
+        elapsed = time.time() - t0
+        if listener:
+            deadline = time.time() + drain_secs
+            while self.received < len(self.latencies) and time.time() < deadline:
+                await asyncio.sleep(0.05)
+            stop.set()
+            await listener
+        pool.shutdown()
+        return self.report(elapsed)
+
+    def report(self, elapsed: float) -> dict:
+        ok = len(self.latencies)
+        report = {
+            "scheduled": self.scheduled,
+            "ok": ok,
+            "errors": dict(sorted(self.errors.items())),
+            "error_rate": round(1 - ok / self.scheduled, 4) if self.scheduled else 0.0,
+            "elapsed_secs": round(elapsed, 3),
+            "offered_rate": round(self.scheduled / elapsed, 1) if elapsed else 0.0,
+            "throughput": round(ok / elapsed, 1) if elapsed else 0.0,
+            "max_schedule_lag_ms": round(self.max_behind * 1000, 1),
+            "latency_ms": percentiles(self.latencies),
+            "service_ms": percentiles(self.service),
+        }
+        if self.ws:
+            report["ws"] = {"received": self.received, "missed": max(0, ok - self.received),
+                            "lag_ms": percentiles(self.lags)}
+        return report
+
+
+def fixed_rate(events, rate: float):
+    """Pair an event stream with evenly spaced offsets at ``rate`` per second."""
+    for i, event in enumerate(events):
+        yield i / rate, event
+
+
+def main(argv: list[str]) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--server", default=os.environ.get("OBS_SERVER", _base.OBS_SERVER))
+    parser.add_argument("--workers", type=int, default=64, help="max POSTs in flight")
+    parser.add_argument("--timeout", type=float, default=5.0, help="per-request timeout (s)")
+    parser.add_argument("--ws", action="store_true", help="measure WebSocket fan-out lag on /stream")
+    parser.add_argument("--out", help="write the JSON report here")
+    sub = parser.add_subparsers(dest="mode", required=True)
+    s = sub.add_parser("synth", help="synthetic agent swarm")
+    s.add_argument("--agents", type=int, default=10)
+    s.add_argument("--rate", type=float, default=100.0, help="events per second")
+    s.add_argument("--duration", type=float, default=10.0, help="seconds")
+    s.add_argument("--seed", type=int, default=0)
+    r = sub.add_parser("replay", help="replay sessions from an events database")
+    r.add_argument("db")
+    r.add_argument("--compress", type=float, default=1.0, help="divide recorded gaps by this factor")
+    r.add_argument("--rate", type=float, help="ignore recorded timing and send at this fixed rate")
+    r.add_argument("--since", type=int, help="only events at or after this epoch-ms timestamp")
+    r.add_argument("--source-app")
+    r.add_argument("--duration", type=float, help="stop after this many seconds of schedule")
+    args = parser.parse_args(argv)
+
+    if args.mode == "synth":
+        schedule = fixed_rate(synth(args.agents, seed=args.seed), args.rate)
+    else:
+        schedule = replay(args.db, compress=max(args.compress, 1e-9), since=args.since, source_app=args.source_app)
+        if args.rate:
+            schedule = fixed_rate((event for _, event in schedule), args.rate)
+    run = LoadRun(args.server, workers=args.workers, timeout=args.timeout, ws=args.ws)
+    try:
+        report = asyncio.run(run.run(schedule, duration=args.duration))
+    except (OSError, ValueError) as e:
+        print(f"loadgen: {e}", file=sys.stderr)
+        return 1
+    report["meta"] = {"mode": args.mode, "server": args.server, "workers": args.workers, "created": int(time.time())}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
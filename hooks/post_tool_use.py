@@ -1,21 +1,28 @@
 #!/usr/bin/env python3
 import _base
+import _rollup
+import _spans
 
 MCP_PREFIXES = ("mcp__", "mcp_")
 
 def main(data: dict) -> None:
     tool = data.get("tool_name", "")
+    payload = {
+        "tool": tool,
+        "is_mcp": any(tool.startswith(p) for p in MCP_PREFIXES),
+        "input": data.get("tool_input", {}),
+        "response_summary": _base.preview(data.get("tool_response", ""), 500),
+    }
+    if _spans.mode() != "off":
+        payload.update(_spans.finish(data) or {})
+    if not _rollup.keep("PostToolUse", data, payload):
+        return
     _base.post_event(_base.build_payload(
         event_type="PostToolUse",
         session_id=data.get("session_id", "unknown"),
         source_app=data.get("source_app", _base.SOURCE_APP),
-        payload={
-            "tool": tool,
-            "is_mcp": any(tool.startswith(p) for p in MCP_PREFIXES),
-            "input": data.get("tool_input", {}),
-            "response_summary": str(data.get("tool_response", ""))[:500],
-        },
+        payload=payload,
     ))
 
 if __name__ == "__main__":
-    main(_base.read_hook_input())
+    _base.run_hook(main)
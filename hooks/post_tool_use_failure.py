@@ -1,13 +1,23 @@
 #!/usr/bin/env python3
 import _base
+import _rollup
+import _spans
 
 def main(data: dict) -> None:
+    payload = {"tool": data.get("tool_name", ""), "error": str(data.get("error", "")), "interrupted": data.get("interrupted", False)}
+    span_mode = _spans.mode()
+    if span_mode != "off":
+        payload.update(_spans.finish(data) or {})
+    if span_mode == "combined":
+        payload["input"] = data.get("tool_input", {})  # no PreToolUse was sent with it
+    if not _rollup.keep("PostToolUseFailure", data, payload):
+        return
     _base.post_event(_base.build_payload(
         event_type="PostToolUseFailure",
         session_id=data.get("session_id", "unknown"),
         source_app=data.get("source_app", _base.SOURCE_APP),
-        payload={"tool": data.get("tool_name", ""), "error": str(data.get("error", "")), "interrupted": data.get("interrupted", False)},
+        payload=payload,
     ))
 
 if __name__ == "__main__":
-    main(_base.read_hook_input())
+    _base.run_hook(main)
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import _base
+import _transcript
 
 def main(data: dict) -> None:
     _base.post_event(_base.build_payload(
@@ -8,6 +9,7 @@ def main(data: dict) -> None:
         source_app=data.get("source_app", _base.SOURCE_APP),
         payload={"context_window_tokens": data.get("context_window_tokens", 0)},
     ))
+    _transcript.report_usage(data)
 
 if __name__ == "__main__":
-    main(_base.read_hook_input())
+    _base.run_hook(main)
@@ -1,13 +1,52 @@
 #!/usr/bin/env python3
+import json
+import time
 import _base
+import _rollup
+import _rules
+import _spans
 
 def main(data: dict) -> None:
-    _base.post_event(_base.build_payload(
-        event_type="PreToolUse",
-        session_id=data.get("session_id", "unknown"),
-        source_app=data.get("source_app", _base.SOURCE_APP),
-        payload={"tool": data.get("tool_name", ""), "input": data.get("tool_input", {})},
-    ))
+    tool = data.get("tool_name", "")
+    tool_input = data.get("tool_input", {})
+    session_id = data.get("session_id", "unknown")
+    payload = {"tool": tool, "input": tool_input}
+    span_mode = _spans.mode()
+    if span_mode != "off":
+        payload["span_id"] = _spans.start(data)
+
+    rule = None
+    if _rules.enabled():
+        # Loading (cache read, parse, compile, maybe a refresh) is timed on
+        # its own: it usually costs more than the match.
+        t = time.perf_counter_ns()
+        rules = _rules.load()
+        payload["hitl"] = {"load_us": round((time.perf_counter_ns() - t) / 1000, 1)}
+        if len(rules):
+            text = _rules.subject(tool_input)
+            t = time.perf_counter_ns()
+            rule = rules.match(tool, text)
+            payload["hitl"].update(match_us=round((time.perf_counter_ns() - t) / 1000, 1), rule_id=rule and rule.get("id"))
+
+    # In combined mode the PostToolUse span stands in for this event, unless
+    # a rule matched and the call is about to be held for a human.
+    if (span_mode != "combined" or rule is not None) and _rollup.keep("PreToolUse", data, payload):
+        _base.post_event(_base.build_payload(
+            event_type="PreToolUse",
+            session_id=session_id,
+            source_app=data.get("source_app", _base.SOURCE_APP),
+            payload=payload,
+        ))
+
+    # Only calls that matched a rule wait on the server for a human decision.
+    if rule is not None:
+        verdict = _rules.await_decision(session_id, tool, text)
+        if verdict["decision"] == "blocked":
+            print(json.dumps({"hookSpecificOutput": {
+                "hookEventName": "PreToolUse",
+                "permissionDecision": "deny",
+                "permissionDecisionReason": verdict.get("message") or "Blocked from the observability dashboard",
+            }}))
 
 if __name__ == "__main__":
-    main(_base.read_hook_input())
+    _base.run_hook(main)
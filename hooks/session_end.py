@@ -1,13 +1,18 @@
 #!/usr/bin/env python3
 import _base
+import _registry
+import _spans
 
 def main(data: dict) -> None:
+    session_id = data.get("session_id", "unknown")
     _base.post_event(_base.build_payload(
         event_type="SessionEnd",
-        session_id=data.get("session_id", "unknown"),
+        session_id=session_id,
         source_app=data.get("source_app", _base.SOURCE_APP),
         payload={"end_reason": data.get("end_reason", "")},
     ))
+    _spans.discard(session_id)
+    _registry.discard(session_id)
 
 if __name__ == "__main__":
-    main(_base.read_hook_input())
+    _base.run_hook(main)
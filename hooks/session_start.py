@@ -10,4 +10,4 @@ def main(data: dict) -> None:
     ))
 
 if __name__ == "__main__":
-    main(_base.read_hook_input())
+    _base.run_hook(main)
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import _base
+import _transcript
 
 def main(data: dict) -> None:
     if _base.STOP_HOOK_ACTIVE:
@@ -10,6 +11,7 @@ def main(data: dict) -> None:
         source_app=data.get("source_app", _base.SOURCE_APP),
         payload={"stop_reason": data.get("stop_reason", ""), "transcript_path": data.get("transcript_path", "")},
     ))
+    _transcript.report_usage(data)
 
 if __name__ == "__main__":
-    main(_base.read_hook_input())
+    _base.run_hook(main)
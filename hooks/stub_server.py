@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""Local stand-in for the observability server's ingest routes.
+
+Answers POST /events and /events/batch in one of four modes, to see how the
+hooks behave against each:
+
+    fast     201 immediately
+    slow     201 after --delay seconds
+    refuse   nothing listens on the port (connection refused)
+    hang     accepts the connection and never answers
+
+In fast and slow mode it also keeps the most recent events in memory,
+serves them from GET /events/recent?after_id= (keyset mode only), and
+broadcasts each one to WebSocket clients on GET /stream in the server's
+stored-event shape.
+
+    python stub_server.py --mode slow --delay 0.3 --port 4000
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import json
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MODES = ("fast", "slow", "refuse", "hang")
+
+
+class StubServer:
+    """Run a stub in a background thread; use as a context manager."""
+
+    def __init__(self, mode: str = "fast", delay: float = 0.2, port: int = 0) -> None:
+        if mode not in MODES:
+            raise ValueError(f"unknown mode {mode!r}; expected one of {', '.join(MODES)}")
+        self.mode = mode
+        self.delay = delay
+        self.port = port
+        self.received = 0
+        self._httpd: ThreadingHTTPServer | None = None
+        self._sock: socket.socket | None = None
+        self._hung: list[socket.socket] = []
+        self._streams: list = []
+        self.events: deque = deque(maxlen=100_000)
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._stop = threading.Event()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> "StubServer":
+        if self.mode == "refuse":
+            # Reserve a free port, then close it so connections are refused.
+            with socket.socket() as s:
+                s.bind(("127.0.0.1", self.port))
+                self.port = s.getsockname()[1]
+        elif self.mode == "hang":
+            self._sock = socket.create_server(("127.0.0.1", self.port))
+            self.port = self._sock.getsockname()[1]
+            threading.Thread(target=self._accept_and_hang, daemon=True).start()
+        else:
+            self._httpd = ThreadingHTTPServer(("127.0.0.1", self.port), self._handler())
+            self._httpd.daemon_threads = True
+            self.port = self._httpd.server_address[1]
+            threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+        if self._sock is not None:
+            self._sock.close()
+        for conn in self._hung:
+            conn.close()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _accept_and_hang(self) -> None:
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            self.received += 1
+            self._hung.append(conn)  # keep it open, never reply
+
+    def _store(self, events: list) -> None:
+        with self._lock:
+            frames = []
+            for event in events:
+                if not isinstance(event, dict):
+                    continue
+                self._next_id += 1
+                stored = {**event, "id": self._next_id,
+                          "tags": json.dumps(event.get("tags", [])),
+                          "payload": json.dumps(event.get("payload", {})),
+                          "timestamp": event.get("timestamp") or int(time.time() * 1000)}
+                stored.pop("blobs", None)
+                self.events.append(stored)
+                data = json.dumps(stored).encode()
+                n = len(data)
+                header = bytes([0x81, n]) if n < 126 else (
+                    bytes([0x81, 126]) + n.to_bytes(2, "big") if n < 1 << 16 else bytes([0x81, 127]) + n.to_bytes(8, "big"))
+                frames.append(header + data)
+            for wfile in list(self._streams) if frames else ():
+                try:
+                    wfile.write(b"".join(frames))
+                    wfile.flush()
+                except OSError:
+                    self._streams.remove(wfile)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _recent(self):
+                from urllib.parse import parse_qs, urlsplit
+
+                query = {k: v[0] for k, v in parse_qs(urlsplit(self.path).query).items()}
+                after = int(query.pop("after_id", 0))
+                limit = int(query.pop("limit", 1000))
+                tag = query.pop("tag", None)
+                with stub._lock:
+                    events = [e for e in stub.events
+                              if e["id"] > after and all(e.get(k) == v for k, v in query.items())
+                              and (tag is None or tag in json.loads(e["tags"]))][:limit]
+                body = json.dumps({"events": events, "limit": limit, "after_id": after,
+                                   "next_after_id": events[-1]["id"] if events else after,
+                                   "has_more": len(events) == limit}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.startswith("/events/recent"):
+                    self._recent()
+                    return
+                if self.path != "/stream" or self.headers.get("Upgrade", "").lower() != "websocket":
+                    self.send_error(404)
+                    return
+                key = self.headers.get("Sec-WebSocket-Key", "")
+                accept = base64.b64encode(hashlib.sha1((key + "258EAFA5-E914-47DA-95CA-C5AB0DC85B11").encode()).digest())
+                self.send_response(101)
+                self.send_header("Upgrade", "websocket")
+                self.send_header("Connection", "Upgrade")
+                self.send_header("Sec-WebSocket-Accept", accept.decode())
+                self.end_headers()
+                self.wfile.flush()
+                with stub._lock:
+                    stub._streams.append(self.wfile)
+                try:
+                    while self.rfile.read(1):  # client frames are ignored until it hangs up
+                        pass
+                except OSError:
+                    pass
+                with stub._lock:
+                    if self.wfile in stub._streams:
+                        stub._streams.remove(self.wfile)
+                self.close_connection = True
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                stub.received += 1
+                if stub.mode == "slow":
+                    time.sleep(stub.delay)
+                try:
+                    events = json.loads(body)
+                    stub._store(events if isinstance(events, list) else [events])
+                except ValueError:
+                    pass
+                body = b'{"id":1}'
+                self.send_response(201)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=MODES, default="fast")
+    parser.add_argument("--delay", type=float, default=0.2, help="response delay in slow mode (s)")
+    parser.add_argument("--port", type=int, default=4000)
+    args = parser.parse_args()
+    with StubServer(args.mode, args.delay, args.port) as stub:
+        print(f"stub server ({args.mode}) on {stub.url}", flush=True)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,18 @@
 #!/usr/bin/env python3
 import _base
+import _registry
 
 def main(data: dict) -> None:
+    session_id = data.get("session_id", "unknown")
+    entry = _registry.register(session_id, data.get("parent_session_id"))
     _base.post_event(_base.build_payload(
         event_type="SubagentStart",
-        session_id=data.get("session_id", "unknown"),
+        session_id=session_id,
         source_app=data.get("source_app", _base.SOURCE_APP),
-        payload={"model": data.get("model", "")},
+        payload={"model": data.get("model", ""), "depth": entry["depth"]},
         parent_session_id=data.get("parent_session_id"),
+        trace_id=entry["trace_id"],
     ))
 
 if __name__ == "__main__":
-    main(_base.read_hook_input())
+    _base.run_hook(main)
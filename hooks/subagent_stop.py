@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import _base
+import _transcript
 
 def main(data: dict) -> None:
     _base.post_event(_base.build_payload(
@@ -9,6 +10,7 @@ def main(data: dict) -> None:
         payload={"transcript_path": data.get("transcript_path", ""), "stop_reason": data.get("stop_reason", "")},
         parent_session_id=data.get("parent_session_id"),
     ))
+    _transcript.report_usage(data)
 
 if __name__ == "__main__":
-    main(_base.read_hook_input())
+    _base.run_hook(main)
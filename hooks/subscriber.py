@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""Resumable asyncio subscriber for the server's live event stream.
+
+    async with Subscriber(source_app="api", event_type="PostToolUseFailure",
+                          cursor_path="failures.cursor") as events:
+        async for event in events:
+            page_someone(event)
+
+On every (re)connect the subscriber opens /stream first, then backfills
+everything after its last-seen id from ``/events/recent?after_id=`` in
+large oldest-first pages, and only then switches to the live messages that
+arrived meanwhile, skipping ids it already delivered. A disconnect simply
+starts that cycle again from the last id, with exponential backoff, so the
+consumer sees each matching event once and in id order.
+
+Filters (source_app, session_id, trace_id, event_type, tag) are applied to the
+stored-event fields before the payload is decoded; the backfill passes them
+to the server. Delivered events have ``payload`` and ``tags`` decoded.
+
+Memory is bounded at both ends. Delivered events wait in a queue of
+``queue_size``; when the consumer falls behind, reading stops. Live messages
+received during a backfill wait in a buffer of ``live_buffer``; if it fills,
+the overflow is dropped and recovered by another backfill round.
+
+Connection and handshake errors are retried; anything else stops the
+background task, and iteration re-raises it once the queued events are
+consumed rather than waiting forever.
+
+    python subscriber.py --event-type Stop --cursor stop.cursor   # NDJSON on stdout
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+import _base
+
+BACKFILL_PAGE = 1000
+CURSOR_EVERY = 100  # delivered events between cursor file writes
+MAX_BACKOFF_SECS = 30.0
+
+
+class Subscriber:
+    """Async iterator of stored events matching the filters, resumable by id."""
+
+    def __init__(
+        self,
+        server: str | None = None,
+        *,
+        after_id: int | None = None,
+        source_app: str | None = None,
+        session_id: str | None = None,
+        trace_id: str | None = None,
+        event_type: str | None = None,
+        tag: str | None = None,
+        queue_size: int = 1000,
+        live_buffer: int = 10000,
+        backfill_page: int = BACKFILL_PAGE,
+        cursor_path: str | None = None,
+    ) -> None:
+        self.server = (server or os.environ.get("OBS_SERVER", _base.OBS_SERVER)).rstrip("/")
+        self.filters = {k: v for k, v in (("source_app", source_app), ("session_id", session_id),
+                                           ("trace_id", trace_id), ("event_type", event_type)) if v is not None}
+        self.tag = tag
+        self.backfill_page = backfill_page
+        self.live_buffer = live_buffer
+        self.cursor_path = cursor_path
+        # last_id: newest id seen (delivered or filtered out); delivered_id: newest
+        # id the consumer has taken, which is what the cursor file records.
+        self.last_id = after_id if after_id is not None else self._load_cursor()
+        self.delivered_id = self.last_id
+        self.reconnects = 0
+        self.dropped_live = 0
+        self.live = False  # caught up and reading /stream
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self._task: asyncio.Task | None = None
+        self._saved_id = self.last_id
+        self._unsaved = 0
+
+    # -- cursor ----------------------------------------------------------
+
+    def _load_cursor(self) -> int:
+        if not self.cursor_path:
+            return 0
+        try:
+            with open(self.cursor_path) as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def save_cursor(self) -> None:
+        """Persist the last delivered id (atomic), if a cursor_path was given."""
+        if not self.cursor_path or self._saved_id == self.delivered_id:
+            return
+        tmp = f"{self.cursor_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(str(self.delivered_id))
+        os.replace(tmp, self.cursor_path)
+        self._saved_id = self.delivered_id
+        self._unsaved = 0
+
+    # -- filtering -------------------------------------------------------
+
+    def matches(self, event: dict) -> bool:
+        """Filter on the stored-event fields only; the payload stays encoded."""
+        for key, value in self.filters.items():
+            if event.get(key) != value:
+                return False
+        if self.tag is not None:
+            tags = event.get("tags")
+            if isinstance(tags, str):
+                if f'"{self.tag}"' not in tags:  # cheap reject before decoding
+                    return False
+                try:
+                    tags = json.loads(tags)
+                except ValueError:
+                    return False
+            if not isinstance(tags, list) or self.tag not in tags:
+                return False
+        return True
+
+    @staticmethod
+    def _decode(event: dict) -> dict:
+        for key in ("payload", "tags"):
+            if isinstance(event.get(key), str):
+                try:
+                    event[key] = json.loads(event[key])
+                except ValueError:
+                    pass
+        return event
+
+    async def _deliver(self, event: dict) -> None:
+        event_id = event.get("id")
+        if not isinstance(event_id, int) or event_id <= self.last_id:
+            return  # already delivered via the other path
+        self.last_id = event_id
+        if self.matches(event):
+            await self._queue.put(self._decode(event))  # blocks while the consumer is behind
+
+    # -- backfill and live -----------------------------------------------
+
+    def _fetch_page(self, after_id: int) -> dict:
+        from urllib.parse import urlencode
+
+        query = urlencode({**self.filters, **({"tag": self.tag} if self.tag else {}),
+                           "after_id": after_id, "limit": self.backfill_page})
+        status, _, body = _base.http_request("GET", f"{self.server}/events/recent?{query}", timeout=10.0)
+        if status != 200:
+            raise ConnectionError(f"backfill: HTTP {status}")
+        page = json.loads(body)
+        if "next_after_id" not in page:
+            raise ConnectionError("backfill: server does not support after_id")
+        return page
+
+    async def _backfill(self) -> None:
+        while True:
+            page = await asyncio.to_thread(self._fetch_page, self.last_id)
+            for event in page.get("events", []):
+                await self._deliver(event)
+            # Server-side filters may skip ids; everything up to next_after_id is seen.
+            self.last_id = max(self.last_id, int(page["next_after_id"]))
+            if not page.get("has_more"):
+                return
+
+    async def _pump(self, ws, live: asyncio.Queue, overflow: asyncio.Event) -> None:
+        while (message := await ws.recv()) is not None:
+            try:
+                live.put_nowait(message)
+            except asyncio.QueueFull:
+                self.dropped_live += 1
+                overflow.set()
+
+    async def _session(self) -> None:
+        import _ws
+
+        url = "ws" + self.server[4:] + "/stream" if self.server.startswith("http") else self.server + "/stream"
+        ws = await _ws.connect(url)
+        live: asyncio.Queue = asyncio.Queue(maxsize=max(1, self.live_buffer))
+        overflow = asyncio.Event()
+        pump = asyncio.create_task(self._pump(ws, live, overflow))
+        try:
+            await self._backfill()
+            self.live = True
+            while True:
+                if overflow.is_set():
+                    overflow.clear()
+                    await self._backfill()  # live messages were dropped: fetch them instead
+                get = asyncio.create_task(live.get())
+                done, _ = await asyncio.wait({get, pump}, return_when=asyncio.FIRST_COMPLETED)
+                if get not in done:
+                    get.cancel()
+                    return  # connection closed
+                try:
+                    event = json.loads(get.result())
+                except ValueError:
+                    continue
+                if isinstance(event, dict):
+                    await self._deliver(event)
+        finally:
+            self.live = False
+            pump.cancel()
+            await ws.close()
+
+    async def _run(self) -> None:
+        backoff = 0.0
+        while True:
+            started = time.monotonic()
+            try:
+                await self._session()
+            except (OSError, ValueError, asyncio.TimeoutError):
+                pass
+            self.reconnects += 1
+            if time.monotonic() - started > MAX_BACKOFF_SECS:
+                backoff = 0.0  # the last session was healthy
+            backoff = min(MAX_BACKOFF_SECS, max(0.5, backoff * 2))
+            await asyncio.sleep(backoff)
+
+    # -- consumer API ----------------------------------------------------
+
+    def start(self) -> "Subscriber":
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                pass  # ended the task earlier; __anext__ raises it to the consumer
+            self._task = None
+        self.save_cursor()
+
+    async def __aenter__(self) -> "Subscriber":
+        return self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    def __aiter__(self) -> "Subscriber":
+        return self.start()
+
+    async def __anext__(self) -> dict:
+        task = self._task
+        if self._queue.empty() and task is not None:
+            get = asyncio.ensure_future(self._queue.get())
+            await asyncio.wait({get, task}, return_when=asyncio.FIRST_COMPLETED)
+            if not get.done():
+                get.cancel()
+                task.result()  # re-raises whatever ended the background task
+                raise StopAsyncIteration
+            event = get.result()
+        else:
+            event = await self._queue.get()
+        self.delivered_id = event["id"]
+        self._unsaved += 1
+        if self._unsaved >= CURSOR_EVERY:
+            self.save_cursor()
+        return event
+
+    async def get(self, timeout: float | None = None) -> dict:
+        """Next event, or asyncio.TimeoutError after ``timeout`` seconds."""
+        self.start()
+        return await asyncio.wait_for(self.__anext__(), timeout)
+
+
+async def _print_events(args) -> None:
+    async with Subscriber(args.server, after_id=args.after_id, source_app=args.source_app,
+                          session_id=args.session, trace_id=args.trace, event_type=args.event_type, tag=args.tag,
+                          cursor_path=args.cursor) as events:
+        async for event in events:
+            sys.stdout.write(json.dumps(event) + "\n")
+            sys.stdout.flush()
+
+
+def main(argv: list[str]) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--server", default=None)
+    parser.add_argument("--after-id", type=int, help="start after this event id (overrides --cursor)")
+    parser.add_argument("--cursor", help="file holding the last delivered id; resumed from and updated")
+    parser.add_argument("--source-app")
+    parser.add_argument("--session")
+    parser.add_argument("--trace", help="every session of one swarm (root trace_id)")
+    parser.add_argument("--event-type")
+    parser.add_argument("--tag")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_print_events(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,98 @@
+import json, sqlite3, sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import analyze
+
+
+def _db(path, time_col="timestamp"):
+    conn = sqlite3.connect(path)
+    conn.execute(f"""CREATE TABLE events (id INTEGER PRIMARY KEY AUTOINCREMENT, event_type TEXT, session_id TEXT,
+        trace_id TEXT, parent_session_id TEXT, source_app TEXT, tags TEXT DEFAULT '[]', payload TEXT, {time_col} INTEGER)""")
+    return conn
+
+
+def _add(conn, event_type, session, payload, ts, trace="t1", parent=None, app="app", time_col="timestamp"):
+    conn.execute(f"INSERT INTO events (event_type, session_id, trace_id, parent_session_id, source_app, payload, {time_col})"
+                 " VALUES (?, ?, ?, ?, ?, ?, ?)", (event_type, session, trace, parent, app, json.dumps(payload), ts))
+
+
+def _fixture(path, time_col="timestamp"):
+    conn = _db(path, time_col)
+    _add(conn, "SessionStart", "lead", {}, 1000, time_col=time_col)
+    _add(conn, "SubagentStart", "worker", {}, 1100, parent="lead", time_col=time_col)
+    for i in range(100):
+        _add(conn, "PostToolUse", "worker", {"tool": "Read", "duration_ms": i + 1}, 1200 + i, time_col=time_col)
+    _add(conn, "PostToolUseFailure", "worker", {"tool": "Bash", "error": "x", "duration_ms": 50}, 1400, time_col=time_col)
+    _add(conn, "PostToolUse", "worker", {"tool": "Bash", "duration_ms": 10}, 1401, time_col=time_col)
+    _add(conn, "TokenUsage", "lead", {"model": "claude-opus-4-6", "input_tokens": 1_000_000, "output_tokens": 100_000}, 1500, time_col=time_col)
+    conn.commit()
+    conn.close()
+
+
+def test_report_aggregates_tools_cost_and_traces(tmp_path):
+    """Tools get failure rates and percentiles, cost is priced per model, traces nest"""
+    db = tmp_path / "data.sqlite"
+    _fixture(db)
+    report = analyze.analyze(str(db), chunk=7)
+    assert report["events"] == 105
+    tools = {t["tool"]: t for t in report["tools"]}
+    assert tools["Read"]["calls"] == 100 and tools["Read"]["failures"] == 0
+    assert 45 <= tools["Read"]["p50_ms"] <= 56
+    assert 90 <= tools["Read"]["p99_ms"] <= 110
+    assert tools["Bash"]["failure_rate"] == 0.5
+    assert report["total_cost_usd"] == 22.5
+    (trace,) = report["traces"]
+    assert trace["root"]["session_id"] == "lead"
+    assert [c["session_id"] for c in trace["root"]["children"]] == ["worker"]
+
+
+def test_legacy_created_at_schema_and_filters(tmp_path):
+    """Older events.db files with created_at work, and --since filters by time"""
+    db = tmp_path / "events.db"
+    _fixture(db, time_col="created_at")
+    report = analyze.analyze(str(db), since=1400)
+    assert report["events"] == 3
+    assert {t["tool"] for t in report["tools"]} == {"Bash"}
+
+
+def test_rollups_replace_sampled_raw_events(tmp_path):
+    """A session's MetricRollup counts win over its sampled raw tool events"""
+    db = tmp_path / "data.sqlite"
+    conn = _db(db)
+    _add(conn, "PostToolUse", "s1", {"tool": "Grep", "duration_ms": 3}, 1000)
+    _add(conn, "MetricRollup", "s1", {"bucket_bounds_ms": [1, 2, 4, 8], "tools": {"Grep": {
+        "calls": 40, "failures": 2, "dropped": 39, "latency": {"count": 40, "sum_ms": 100, "max_ms": 7, "buckets": [0, 0, 30, 10]}}}}, 2000)
+    conn.commit()
+    conn.close()
+    (grep,) = analyze.analyze(str(db))["tools"]
+    assert (grep["calls"], grep["failures"], grep["timed"]) == (40, 2, 40)
+    assert grep["max_ms"] == 7
+
+
+def test_window_rollups_feed_each_session_without_becoming_one(tmp_path):
+    """A per-window MetricRollup credits its per-session counts and is not reported as a session"""
+    db = tmp_path / "data.sqlite"
+    conn = _db(db)
+    _add(conn, "PostToolUse", "s1", {"tool": "Grep", "duration_ms": 3}, 1000)
+    counters = {"calls": 5, "failures": 1, "dropped": 4, "latency": {"count": 5, "sum_ms": 20, "max_ms": 6, "buckets": [0, 0, 3, 2]}}
+    _add(conn, "MetricRollup", "metric-rollup", {"bucket_bounds_ms": [1, 2, 4, 8], "tools": {"Grep": counters},
+                                                 "sessions": {"s1": {"Grep": counters}}}, 2000)
+    conn.commit()
+    conn.close()
+    report = analyze.analyze(str(db))
+    (grep,) = report["tools"]
+    assert (grep["calls"], grep["failures"], grep["timed"]) == (5, 1, 5)
+    assert "metric-rollup" not in json.dumps(report)
+
+
+def test_markdown_output(tmp_path, capsys):
+    """The CLI writes a Markdown summary with the cost and tools sections"""
+    db = tmp_path / "data.sqlite"
+    _fixture(db)
+    out = tmp_path / "report.md"
+    assert analyze.main([str(db), "--out", str(out)]) == 0
+    text = out.read_text()
+    assert "## Cost by source app" in text and "| Read | 100 |" in text
+    assert "  - `worker`" in text
+    assert analyze.main([str(tmp_path / "missing.db")]) == 1
@@ -0,0 +1,144 @@
+import gzip, json, sqlite3, sys
+from pathlib import Path
+from unittest.mock import patch
+sys.path.insert(0, str(Path(__file__).parent))
+
+import archive
+
+DAY = archive.DAY_MS
+T0 = 1772064000000  # 2026-02-26 00:00 UTC
+
+
+def _db(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY AUTOINCREMENT, event_type TEXT, session_id TEXT,"
+                 " trace_id TEXT, parent_session_id TEXT, source_app TEXT, tags TEXT, payload TEXT, timestamp INTEGER)")
+    for app, ts in rows:
+        conn.execute("INSERT INTO events (event_type, session_id, trace_id, source_app, tags, payload, timestamp)"
+                     " VALUES ('PostToolUse', 's1', 't1', ?, '[\"a\"]', ?, ?)", (app, json.dumps({"tool": "Read", "ts": ts}), ts))
+    conn.commit()
+    conn.close()
+
+
+def _ids(path):
+    conn = sqlite3.connect(path)
+    try:
+        return [r[0] for r in conn.execute("SELECT id FROM events ORDER BY id")]
+    finally:
+        conn.close()
+
+
+def test_export_partitions_and_deletes_aged_rows(tmp_path):
+    """Aged rows go to per-day, per-app gzip NDJSON files and leave the database"""
+    db, dest = tmp_path / "data.sqlite", tmp_path / "archive"
+    _db(db, [("api", T0), ("web/ui", T0 + 10), ("api", T0 + DAY), ("api", T0 + 2 * DAY), ("api", T0 + 3 * DAY)])
+    exporter = archive.Exporter(str(db), str(dest), batch=2)
+    result = exporter.run(cutoff_ms=T0 + 2 * DAY)
+    exporter.close()
+    assert result["exported"] == 3 and result["deleted"] == 3 and result["last_id"] == 3
+    assert _ids(db) == [4, 5]
+    assert sorted(str(p.relative_to(dest)) for p in dest.rglob("*.gz")) == [
+        "2026-02-26/api/1-1.ndjson.gz", "2026-02-26/web_ui/2-2.ndjson.gz", "2026-02-27/api/3-3.ndjson.gz"]
+    with gzip.open(dest / "2026-02-26/api/1-1.ndjson.gz", "rt") as f:
+        record = json.loads(f.readline())
+    assert record["payload"] == {"tool": "Read", "ts": T0} and record["tags"] == ["a"]
+
+
+def test_future_dated_row_is_held_without_blocking_aged_rows(tmp_path):
+    """Rows are taken by age like the TTL pruner; a young row in between waits in the cursor"""
+    db, dest = tmp_path / "data.sqlite", tmp_path / "archive"
+    _db(db, [("api", T0), ("api", T0 + 5 * DAY), ("api", T0 + 1), ("api", T0 + 6 * DAY)])
+    exporter = archive.Exporter(str(db), str(dest))
+    result = exporter.run(cutoff_ms=T0 + DAY)
+    assert (result["exported"], result["last_id"], result["held"]) == (2, 3, 1)
+    assert _ids(db) == [2, 4]
+    result = exporter.run(cutoff_ms=T0 + 5 * DAY + 1)
+    exporter.close()
+    assert (result["exported"], result["held"]) == (1, 0)
+    assert _ids(db) == [4]
+    assert sorted(e["id"] for e in archive.read(str(dest))) == [1, 2, 3]
+
+
+def test_held_rows_archived_before_a_crash_are_deleted_not_exported_again(tmp_path):
+    """A held batch whose cursor moved but whose delete never ran is finished by the next run"""
+    db, dest = tmp_path / "data.sqlite", tmp_path / "archive"
+    _db(db, [("api", T0), ("api", T0 + 5 * DAY), ("api", T0 + 1)])
+    exporter = archive.Exporter(str(db), str(dest))
+    exporter.run(cutoff_ms=T0 + DAY)
+    real = archive.Exporter._delete_archived
+
+    def dies_on_held(self, deleting):
+        if deleting and "ids" in deleting:
+            raise sqlite3.OperationalError("killed")
+        return real(self, deleting)
+
+    with patch.object(archive.Exporter, "_delete_archived", dies_on_held):
+        try:
+            exporter.run(cutoff_ms=T0 + 6 * DAY)
+        except sqlite3.OperationalError:
+            pass
+    assert _ids(db) == [2]
+    assert exporter.run(cutoff_ms=T0 + 6 * DAY)["exported"] == 0
+    exporter.close()
+    assert _ids(db) == []
+    assert [e["id"] for e in archive.read(str(dest))] == [1, 3, 2]
+
+
+def test_crashed_batch_is_redone_exactly_once(tmp_path):
+    """Files of a batch whose cursor never moved are replaced, not duplicated"""
+    db, dest = tmp_path / "data.sqlite", tmp_path / "archive"
+    _db(db, [("api", T0), ("api", T0 + 1)])
+    exporter = archive.Exporter(str(db), str(dest))
+    rows = exporter.conn.execute("SELECT id, event_type, session_id, trace_id, parent_session_id, source_app,"
+                                 " tags, payload, timestamp FROM events WHERE id = 1").fetchall()
+    plan = exporter._plan(rows)
+    exporter._save_cursor(0, list(plan))
+    for path, group in plan.items():
+        exporter._write(path, group)  # ...and the process dies here
+    exporter.run(cutoff_ms=T0 + DAY)
+    exporter.close()
+    events = list(archive.read(str(dest)))
+    assert [e["id"] for e in events] == [1, 2]
+    assert _ids(db) == []
+
+
+def test_reader_filters_by_range_app_and_session(tmp_path, capsys):
+    """The reader skips partitions outside the range and streams the rest"""
+    db, dest = tmp_path / "data.sqlite", tmp_path / "archive"
+    _db(db, [("api", T0), ("web", T0 + 1), ("api", T0 + DAY), ("api", T0 + 2 * DAY)])
+    assert archive.main(["export", str(db), "--dest", str(dest), "--older-than-days", "0"]) == 0
+    capsys.readouterr()
+    assert [e["id"] for e in archive.read(str(dest), since=T0 + DAY)] == [3, 4]
+    assert [e["id"] for e in archive.read(str(dest), until=T0 + DAY, source_app="api")] == [1]
+    assert list(archive.read(str(dest), session_id="other")) == []
+    assert archive.main(["read", str(dest), "--source-app", "web"]) == 0
+    assert json.loads(capsys.readouterr().out)["id"] == 2
+
+
+def test_partitions_carry_the_blobs_their_events_reference(tmp_path):
+    """Blob content is copied into the partition once and reattached to every event read back"""
+    db, dest = tmp_path / "data.sqlite", tmp_path / "archive"
+    _db(db, [])
+    big, gone = "a" * 64, "b" * 64
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE blobs (hash TEXT PRIMARY KEY, content TEXT NOT NULL, size INTEGER NOT NULL, last_seen INTEGER NOT NULL)")
+    conn.execute("INSERT INTO blobs VALUES (?, 'file contents', 13, ?)", (big, T0))
+    for session, refs in (("s1", [big]), ("s2", [big, gone])):
+        payload = {"tool": "Read", "output": [{"$blob": d, "chars": 13, "preview": "file"} for d in refs]}
+        conn.execute("INSERT INTO events (event_type, session_id, trace_id, source_app, tags, payload, timestamp)"
+                     " VALUES ('PostToolUse', ?, 't1', 'api', '[]', ?, ?)", (session, json.dumps(payload), T0))
+    conn.commit()
+    conn.close()
+    exporter = archive.Exporter(str(db), str(dest))
+    exporter.run(cutoff_ms=T0 + DAY)
+    exporter.close()
+    conn = sqlite3.connect(db)
+    conn.execute("DELETE FROM blobs")  # the server's TTL prunes them
+    conn.commit()
+    conn.close()
+    with gzip.open(dest / "2026-02-26/api/1-2.ndjson.gz", "rt") as f:
+        stored = [json.loads(line) for line in f]
+    assert stored[0]["blobs"] == {big: "file contents"} and "blobs" not in stored[1]
+    (event,) = archive.read(str(dest), session_id="s2")
+    assert event["blobs"] == {big: "file contents"}  # the pruned one keeps only its preview
+    assert [o["$blob"] for o in event["payload"]["output"]] == [big, gone]
@@ -3,9 +3,10 @@ import sys
 import io
 import os
 from pathlib import Path
+from unittest.mock import patch
 sys.path.insert(0, str(Path(__file__).parent))
 
-from _base import build_payload, read_hook_input, OBS_SERVER
+from _base import build_payload, post_event, read_hook_input, OBS_SERVER
 
 def test_obs_server_default_url():
     """REQ-HOOK: default server URL"""
@@ -48,3 +49,78 @@ def test_post_event_silent_on_failure():
         post_event(build_payload(event_type="Stop", session_id="s", source_app="app"))
     finally:
         del os.environ["OBS_SERVER"]
+
+def test_sanitize_truncates_long_fields_and_marks_them():
+    """REQ-HOOK: fields over the per-field budget are cut and listed"""
+    from _base import sanitize
+    clean, truncated, blobs = sanitize({"input": {"command": "x" * 500}}, field_budget=100, blob_min=0)
+    assert clean["input"]["command"].startswith("x" * 100)
+    assert clean["input"]["command"].endswith("…[truncated 400 chars]")
+    assert truncated == ["input.command"]
+    assert blobs == {}
+
+def test_sanitize_enforces_event_budget():
+    """REQ-HOOK: the whole payload stays within the per-event budget"""
+    from _base import sanitize
+    payload = {"lines": ["y" * 50 for _ in range(1000)]}
+    clean, truncated, _ = sanitize(payload, field_budget=100, event_budget=2000, blob_min=0)
+    assert len(json.dumps(clean)) < 2500
+    assert clean["lines"][-1].startswith("…[+")
+    assert "lines[*]" in truncated
+
+def test_large_strings_become_blob_refs_sent_once():
+    """REQ-HOOK: repeated large content is replaced by a hash and shipped once"""
+    import hashlib
+    body = "def f():\n    return 1\n" * 1000
+    first = build_payload(event_type="PreToolUse", session_id="s", source_app="app",
+                          payload={"input": {"content": body}})
+    ref = first["payload"]["input"]["content"]
+    digest = hashlib.sha256(body.encode()).hexdigest()
+    assert ref["$blob"] == digest and ref["chars"] == len(body)
+    assert first["blobs"] == {digest: body}
+    with patch("_base._http_post", return_value=201), patch("_spool.replay_in_background"):
+        post_event(first)
+    again = build_payload(event_type="PreToolUse", session_id="s", source_app="app",
+                          payload={"input": {"content": body}})
+    assert again["payload"]["input"]["content"]["$blob"] == digest
+    assert "blobs" not in again
+
+def test_blobs_of_undelivered_events_are_sent_again(monkeypatch):
+    """REQ-HOOK: a blob only counts as sent once its event was accepted"""
+    monkeypatch.setenv("OBS_SPOOL", "0")
+    body = "y" * 10_000
+    first = build_payload(event_type="PreToolUse", session_id="s", source_app="app", payload={"content": body})
+    with patch("_base._http_post", return_value=400):
+        post_event(first)
+    with patch("_base._http_post", side_effect=TimeoutError):
+        post_event(build_payload(event_type="PreToolUse", session_id="s", source_app="app", payload={"content": body}))
+    assert "blobs" in build_payload(event_type="PreToolUse", session_id="s", source_app="app", payload={"content": body})
+
+def test_blob_content_is_capped_per_event(monkeypatch):
+    """REQ-HOOK: blobs past the per-event blob budget are cut inline and listed in _blobs_dropped"""
+    import _base
+    monkeypatch.setattr(_base, "BLOB_BUDGET", 50_000)
+    fields = {f"f{i}": str(i) * 20_000 for i in range(10)}
+    event = build_payload(event_type="PostToolUse", session_id="s", source_app="app", payload=fields)
+    assert sum(len(c.encode()) for c in event["blobs"].values()) <= 50_000
+    dropped = event["payload"]["_blobs_dropped"]
+    assert dropped[0] == "f2" and set(dropped) <= set(event["payload"]["_truncated"])
+    assert all(event["payload"][path].endswith("chars]") for path in dropped)
+    assert len(_base.serialize(event)) < 50_000 + _base.EVENT_BUDGET + 1000
+
+def test_budgets_count_utf8_bytes():
+    """REQ-HOOK: multi-byte text is bounded by its encoded size, not its length"""
+    from _base import serialize, sanitize
+    clean, truncated, _ = sanitize({"text": "é" * 16_000}, field_budget=16_384, blob_min=0)
+    assert truncated == ["text"] and len(clean["text"].split("…")[0].encode()) == 16_384
+    event = build_payload(event_type="UserPromptSubmit", session_id="s", source_app="app",
+                          payload={f"p{i}": "é" * 3_000 for i in range(20)})
+    assert len(serialize(event)) < 65_536 + 1_000
+    assert json.loads(serialize({"t": "\ud800"}))["t"] == "\ud800"  # lone surrogates still encode
+
+def test_preview_bounds_structured_values():
+    """REQ-HOOK: preview renders a bounded JSON summary of any value"""
+    from _base import preview
+    text = preview({"stdout": "z" * 1_000_000, "exit": 0}, 500)
+    assert len(text) <= 500
+    assert text.startswith('{"stdout": "zzz')
@@ -0,0 +1,53 @@
+import socket, sys, urllib.request
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import bench_hooks
+from stub_server import StubServer
+
+
+def test_percentiles_nearest_rank():
+    """Percentiles use nearest rank over the samples"""
+    p = bench_hooks.percentiles([float(i) for i in range(1, 101)])
+    assert (p["p50"], p["p95"], p["p99"], p["max"]) == (50.0, 95.0, 99.0, 100.0)
+
+
+def test_check_budget_flags_only_matching_regressions():
+    """Budget patterns match scenarios and report values over their limit"""
+    results = [
+        {"scenario": "PreToolUse/fast/tiny", "wall_ms": {"p95": 300.0}},
+        {"scenario": "PreToolUse/hang/tiny", "wall_ms": {"p95": 1100.0}},
+    ]
+    violations = bench_hooks.check_budget(results, {"*/fast/*": {"wall_ms.p95": 200}, "*/hang/*": {"wall_ms.p95": 1500}})
+    assert len(violations) == 1
+    assert violations[0].startswith("PreToolUse/fast/tiny")
+
+
+def test_stub_server_modes():
+    """fast answers 201, refuse refuses, hang never answers"""
+    with StubServer("fast") as stub:
+        req = urllib.request.Request(f"{stub.url}/events", data=b"{}", method="POST")
+        assert urllib.request.urlopen(req, timeout=2).status == 201
+    with StubServer("refuse") as stub:
+        try:
+            socket.create_connection(("127.0.0.1", stub.port), timeout=1).close()
+            assert False, "connection should be refused"
+        except ConnectionRefusedError:
+            pass
+    with StubServer("hang") as stub:
+        with socket.create_connection(("127.0.0.1", stub.port), timeout=0.2) as s:
+            s.sendall(b"POST /events HTTP/1.1\r\nContent-Length: 0\r\n\r\n")
+            try:
+                s.recv(1)
+                assert False, "hang mode should not answer"
+            except socket.timeout:
+                pass
+
+
+def test_run_scenario_reports_phases():
+    """A scenario runs the hook end to end and reports every phase"""
+    result = bench_hooks.run_scenario("PreToolUse", "pre_tool_use", "fast", "tiny", runs=2)
+    assert result["scenario"] == "PreToolUse/fast/tiny"
+    assert result["wall_ms"]["p50"] > 0
+    assert set(result["phases_ms"]) == set(bench_hooks.PHASES)
+    assert result["phases_ms"]["startup"]["p50"] > 0
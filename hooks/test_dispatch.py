@@ -0,0 +1,64 @@
+import json, subprocess, sys
+from pathlib import Path
+from unittest.mock import patch
+sys.path.insert(0, str(Path(__file__).parent))
+
+import dispatch
+
+
+def test_dispatch_routes_on_hook_event_name():
+    """REQ-HOOK: dispatcher calls the matching hook's main()"""
+    data = {"hook_event_name": "PreToolUse", "session_id": "s1", "tool_name": "Bash"}
+    with patch("_base.post_event") as mock:
+        dispatch.main(data)
+    assert mock.call_args[0][0]["event_type"] == "PreToolUse"
+
+
+def test_dispatch_ignores_unknown_event():
+    """REQ-HOOK: unknown events are ignored, never raised"""
+    with patch("_base.post_event") as mock:
+        dispatch.main({"hook_event_name": "SomethingNew"})
+    mock.assert_not_called()
+
+
+def test_every_hook_module_is_routable():
+    """REQ-HOOK: every mapped module exposes main()"""
+    for module in dispatch.HOOKS.values():
+        assert callable(__import__(module).main)
+
+
+def test_zipapp_runs_trimmed_without_urllib(tmp_path):
+    """REQ-HOOK: the built zipapp runs under -S and never imports urllib on the hot path"""
+    import build_pyz
+    pyz = build_pyz.build(tmp_path / "obs_hooks.pyz")
+    out = subprocess.run(
+        [sys.executable, "-S", "-X", "importtime", str(pyz)],
+        input=json.dumps({"hook_event_name": "Notification", "session_id": "s"}),
+        capture_output=True, text=True, timeout=30,
+        env={"OBS_SERVER": "http://127.0.0.1:1", "OBS_SPOOL": "0", "OBS_STATE_DIR": str(tmp_path)},
+    )
+    imported = {line.rsplit("|", 1)[-1].strip() for line in out.stderr.splitlines() if "|" in line}
+    assert out.returncode == 0, out.stderr
+    assert "dispatch" in imported
+    assert not {"urllib.request", "http.client", "typing"} & imported
+
+
+def test_zipapp_falls_back_to_sources_on_another_python(tmp_path):
+    """REQ-HOOK: bytecode from another Python version is skipped in favour of the bundled sources"""
+    import build_pyz, zipfile
+    pyz = build_pyz.build(tmp_path / "obs_hooks.pyz")
+    stale = tmp_path / "stale.pyz"
+    with zipfile.ZipFile(pyz) as src, zipfile.ZipFile(stale, "w") as dst:
+        assert {"dispatch.py", "dispatch.pyc", "_base.py", "_base.pyc"} <= set(src.namelist())
+        for name in src.namelist():
+            data = src.read(name)
+            if name.endswith(".pyc"):
+                data = b"\x00\x00\r\n" + data[4:]  # a magic number no interpreter uses
+            dst.writestr(name, data)
+    out = subprocess.run(
+        [sys.executable, "-S", str(stale)],
+        input=json.dumps({"hook_event_name": "Notification", "session_id": "s"}),
+        capture_output=True, text=True, timeout=30,
+        env={"OBS_SERVER": "http://127.0.0.1:1", "OBS_SPOOL": "0", "OBS_STATE_DIR": str(tmp_path)},
+    )
+    assert out.returncode == 0, out.stderr
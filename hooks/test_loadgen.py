@@ -0,0 +1,85 @@
+import asyncio, itertools, sqlite3, json, sys, time
+from pathlib import Path
+from unittest.mock import patch
+sys.path.insert(0, str(Path(__file__).parent))
+
+import loadgen
+from stub_server import StubServer
+
+
+def test_synth_builds_agent_trees():
+    """Subagents start under their lead's session and share its trace"""
+    events = list(itertools.islice(loadgen.synth(8, seed=1), 2000))
+    starts = [e for e in events if e["event_type"] == "SubagentStart"]
+    assert len(starts) == 6
+    leads = {e["session_id"] for e in events if e["event_type"] == "SessionStart"}
+    assert len(leads) == 2
+    assert all(e["parent_session_id"] in leads and e["trace_id"] == e["parent_session_id"] for e in starts)
+    tools = [e for e in events if e["event_type"] in ("PostToolUse", "PostToolUseFailure")]
+    assert all("duration_ms" in e["payload"] for e in tools)
+    assert {e["source_app"] for e in events} == {"loadgen"}
+
+
+def test_replay_compresses_recorded_timing(tmp_path):
+    """Replay offsets follow the recorded gaps divided by the compression factor"""
+    db = tmp_path / "events.db"
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, event_type TEXT, session_id TEXT, trace_id TEXT,"
+                 " parent_session_id TEXT, source_app TEXT, payload TEXT, created_at INTEGER)")
+    for i, ts in enumerate((1000, 11000, 61000)):
+        conn.execute("INSERT INTO events VALUES (?, 'PreToolUse', 's1', 't1', NULL, 'app', ?, ?)",
+                     (i + 1, json.dumps({"tool": "Read"}), ts))
+    conn.commit()
+    conn.close()
+    with patch("_registry.lookup") as lookup:
+        schedule = list(loadgen.replay(str(db), compress=10, run="r1"))
+    assert [round(offset, 3) for offset, _ in schedule] == [0.0, 1.0, 6.0]
+    assert schedule[1][1]["payload"] == {"tool": "Read"}
+    lookup.assert_not_called()
+
+
+def test_replayed_ids_are_kept_apart_from_real_sessions(tmp_path):
+    """Replayed sessions, traces and apps are renamed per run; a missing trace stays unresolved"""
+    db = tmp_path / "events.db"
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, event_type TEXT, session_id TEXT, trace_id TEXT,"
+                 " parent_session_id TEXT, source_app TEXT, payload TEXT, created_at INTEGER)")
+    conn.execute("INSERT INTO events VALUES (1, 'SubagentStart', 'child', 'root', 'root', 'api', '{}', 1000)")
+    conn.execute("INSERT INTO events VALUES (2, 'Stop', 'solo', '', NULL, 'api', '{}', 2000)")
+    conn.commit()
+    conn.close()
+    with patch("_registry.lookup") as lookup:
+        (_, child), (_, solo) = loadgen.replay(str(db), run="r1")
+    lookup.assert_not_called()
+    assert (child["session_id"], child["parent_session_id"], child["trace_id"], child["source_app"]) == (
+        "loadgen-r1-child", "loadgen-r1-root", "loadgen-r1-root", "loadgen-r1-api")
+    assert (solo["trace_id"], solo["parent_session_id"]) == ("loadgen-r1-solo", None)
+
+
+def test_open_loop_run_reports_throughput_and_fanout_lag():
+    """Against a live stub every event lands and comes back over /stream"""
+    with StubServer("fast") as stub:
+        run = loadgen.LoadRun(stub.url, workers=8, ws=True)
+        report = asyncio.run(run.run(loadgen.fixed_rate(loadgen.synth(4), 200), duration=0.5))
+    assert report["scheduled"] == 100 and report["ok"] == 100
+    assert report["error_rate"] == 0.0
+    assert report["ws"]["received"] == 100
+    assert report["latency_ms"]["p50"] > 0
+
+
+def test_errors_are_counted_not_raised():
+    """A refusing server shows up as an error rate, not a crash"""
+    with StubServer("refuse") as stub:
+        run = loadgen.LoadRun(stub.url, workers=4)
+        report = asyncio.run(run.run(loadgen.fixed_rate(loadgen.synth(2), 100), duration=0.2))
+    assert report["ok"] == 0 and report["error_rate"] == 1.0
+    assert sum(report["errors"].values()) == report["scheduled"]
+
+
+def test_unparseable_responses_count_as_errors():
+    """A connection closed before the status line is an error, not a lost exception"""
+    run = loadgen.LoadRun("http://127.0.0.1:1", workers=1)
+    with patch("_base.http_request", side_effect=[IndexError("list index out of range"), ValueError("bad status")]):
+        run._post(1, b"{}", time.time())
+        run._post(2, b"{}", time.time())
+    assert run.errors == {"IndexError": 1, "ValueError": 1}
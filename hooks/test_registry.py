@@ -0,0 +1,58 @@
+import os, sys, time
+from pathlib import Path
+from unittest.mock import patch
+sys.path.insert(0, str(Path(__file__).parent))
+
+import _base
+import _registry
+
+
+def test_nested_subagents_share_the_root_trace():
+    """Each registered level inherits the root trace_id and adds one to depth"""
+    child = _registry.register("child-1", "root-1")
+    grandchild = _registry.register("grandchild-1", "child-1")
+    assert (child["trace_id"], child["depth"]) == ("root-1", 1)
+    assert (grandchild["trace_id"], grandchild["depth"], grandchild["parent"]) == ("root-1", 2, "child-1")
+    assert _registry.lookup("grandchild-1") == grandchild
+    assert _registry.register("root-1", None)["depth"] == 0
+    assert _registry.lookup("root-1") is None  # roots are not written
+
+
+def test_build_payload_resolves_registered_sessions():
+    """Later events of a subagent carry its root trace, parent and depth; others are their own root"""
+    _registry.register("child-2", "root-2")
+    _registry.register("grandchild-2", "child-2")
+    p = _base.build_payload(event_type="PreToolUse", session_id="grandchild-2", source_app="app", payload={"tool_name": "Read"})
+    assert (p["trace_id"], p["parent_session_id"], p["payload"]["depth"]) == ("root-2", "child-2", 2)
+    p = _base.build_payload(event_type="PreToolUse", session_id="other", source_app="app", payload={})
+    assert (p["trace_id"], p["parent_session_id"]) == ("other", None)
+    assert "depth" not in p["payload"]
+
+
+def test_unusual_session_ids_are_hashed_into_the_directory():
+    """Session ids that are not plain file names never escape the registry directory"""
+    entry = _registry.register("../../etc/passwd", "root-3")
+    assert _registry.lookup("../../etc/passwd") == entry
+    assert all(Path(_registry.registry_dir(), n).is_file() for n in os.listdir(_registry.registry_dir()))
+
+
+def test_entries_expire_and_are_swept():
+    """Entries past OBS_REGISTRY_TTL_SECS are ignored by lookup and removed by sweep"""
+    _registry.register("old-child", "root-4")
+    later = time.time() + _registry.TTL_SECS + 1
+    assert _registry.lookup("old-child", now=later) is None
+    assert _registry.sweep(now=later) == 1
+    assert _registry.lookup("old-child") is None
+
+
+def test_subagent_hooks_register_and_discard():
+    """SubagentStart posts the root trace and depth; SessionEnd drops the entry"""
+    import subagent_start, session_end
+    with patch("_base.post_event") as mock:
+        subagent_start.main({"session_id": "child-5", "parent_session_id": "root-5"})
+        start = mock.call_args[0][0]
+        session_end.main({"session_id": "child-5"})
+        end = mock.call_args[0][0]
+    assert (start["trace_id"], start["payload"]["depth"]) == ("root-5", 1)
+    assert end["trace_id"] == "root-5"
+    assert _registry.lookup("child-5") is None
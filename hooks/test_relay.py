@@ -0,0 +1,101 @@
+import json, socket, sys, threading, asyncio, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import _base
+import _relay
+
+
+class _Recorder(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    received: list = []
+    batch_status = 201
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        status = self.batch_status if self.path == "/events/batch" else 201
+        if status == 201:
+            _Recorder.received.append((self.path, json.loads(body)))
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_server(batch_status=201):
+    _Recorder.received = []
+    _Recorder.batch_status = batch_status
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Recorder)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+
+
+def _start_relay(tmp_path, server, **kw):
+    path = str(tmp_path / "relay.sock")
+    relay = _relay.Relay(server, idle_exit_secs=0, **kw)
+    t = threading.Thread(target=asyncio.run, args=(relay.run(path),), daemon=True)
+    t.start()
+    for _ in range(200):
+        # The socket file appears at bind(), a moment before listen().
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+            break
+        except OSError:
+            time.sleep(0.01)
+        finally:
+            probe.close()
+    return relay, t, path
+
+
+def test_relay_coalesces_events_into_one_batch(tmp_path, monkeypatch):
+    """Events handed over the socket reach the server as a single batch"""
+    httpd, url = _start_server()
+    relay, t, path = _start_relay(tmp_path, url, window_ms=200)
+    monkeypatch.setenv("OBS_RELAY_SOCKET", path)
+    for i in range(5):
+        assert _relay.send(json.dumps({"event_type": "PreToolUse", "n": i}).encode())
+    relay.stop()
+    t.join(5)
+    httpd.shutdown()
+    batches = [body for p, body in _Recorder.received if p == "/events/batch"]
+    assert len(batches) == 1
+    assert [e["n"] for e in batches[0]] == [0, 1, 2, 3, 4]
+    assert relay.stats["delivered"] == 5
+
+
+def test_relay_falls_back_to_single_posts_without_batch_route(tmp_path, monkeypatch):
+    """An older server that 404s /events/batch still gets every event"""
+    httpd, url = _start_server(batch_status=404)
+    relay, t, path = _start_relay(tmp_path, url)
+    monkeypatch.setenv("OBS_RELAY_SOCKET", path)
+    assert _relay.send(b'{"event_type":"Stop"}')
+    assert _relay.send(b'{"event_type":"SessionEnd"}')
+    relay.stop()
+    t.join(5)
+    httpd.shutdown()
+    singles = [body["event_type"] for p, body in _Recorder.received if p == "/events"]
+    assert sorted(singles) == ["SessionEnd", "Stop"]
+
+
+def test_send_reports_missing_relay(tmp_path, monkeypatch):
+    """send() returns False so post_event can fall back to a direct POST"""
+    monkeypatch.setenv("OBS_RELAY_SOCKET", str(tmp_path / "absent.sock"))
+    monkeypatch.setenv("OBS_RELAY_AUTOSTART", "0")
+    assert _relay.send(b"{}") is False
+
+
+def test_post_event_falls_back_to_direct_post(tmp_path, monkeypatch):
+    """post_event delivers directly when OBS_RELAY=1 but no relay is running"""
+    httpd, url = _start_server()
+    monkeypatch.setenv("OBS_SERVER", url)
+    monkeypatch.setenv("OBS_RELAY", "1")
+    monkeypatch.setenv("OBS_RELAY_AUTOSTART", "0")
+    monkeypatch.setenv("OBS_RELAY_SOCKET", str(tmp_path / "absent.sock"))
+    _base.post_event(_base.build_payload(event_type="Stop", session_id="s", source_app="app"))
+    httpd.shutdown()
+    assert _Recorder.received[0][0] == "/events"
+    assert isinstance(_Recorder.received[0][1]["timestamp"], int)
@@ -0,0 +1,86 @@
+import os, sys, time
+from pathlib import Path
+from unittest.mock import patch
+sys.path.insert(0, str(Path(__file__).parent))
+
+import _rollup
+
+
+def test_bucket_is_log_scale():
+    """Durations land in power-of-two buckets with one overflow bucket"""
+    assert _rollup.bucket(0.4) == 0
+    assert _rollup.bucket(3) == 2
+    assert _rollup.bucket(1024) == 10
+    assert _rollup.bucket(10 ** 6) == len(_rollup.BUCKET_BOUNDS_MS)
+
+
+def test_sampling_policy(monkeypatch):
+    """Failures, MCP calls and HITL matches always send; the rest are sampled by call hash"""
+    monkeypatch.setenv("OBS_HITL", "0")
+    monkeypatch.setattr(_rollup, "SAMPLE_RATE", 0.0)
+    plain = {"session_id": "s1", "tool_use_id": "t1", "tool_name": "Read"}
+    assert _rollup.always_send("PostToolUseFailure", plain, {})
+    assert _rollup.always_send("PostToolUse", {**plain, "tool_name": "mcp__github__list"}, {})
+    assert _rollup.always_send("PreToolUse", plain, {"hitl": {"rule_id": "r1"}})
+    assert not _rollup.always_send("PostToolUse", plain, {})
+    assert not _rollup.sampled(plain)
+    monkeypatch.setattr(_rollup, "SAMPLE_RATE", 0.1)
+    kept = sum(_rollup.sampled({"tool_use_id": f"t{i}"}) for i in range(5000))
+    assert 350 < kept < 650
+
+
+def test_closed_window_flushes_one_rollup_for_all_sessions(monkeypatch):
+    """A closed window becomes one MetricRollup with merged and per-session counts"""
+    monkeypatch.setenv("OBS_ROLLUP", "1")
+    t0 = (int(time.time()) // _rollup.WINDOW_SECS - 2) * _rollup.WINDOW_SECS
+    for i in range(10):
+        data = {"session_id": "s1", "source_app": "app", "tool_name": "Read", "tool_use_id": f"r{i}"}
+        _rollup._append(data, "P", False, None, now=t0)
+        _rollup._append(data, "C", i == 0, 3 + i, now=t0 + 1)
+    _rollup._append({"session_id": "s2", "source_app": "app", "tool_name": "Read"}, "C", False, 40, now=t0 + 2)
+    _rollup._append({"session_id": "s2", "source_app": "app", "tool_name": "Bash"}, "F", True, 2000, now=t0 + 5)
+    with patch("_base.post_event") as mock:
+        assert _rollup.flush_closed() == 1
+        assert _rollup.flush_closed() == 0
+    (event,) = (c[0][0] for c in mock.call_args_list)
+    assert (event["event_type"], event["session_id"]) == ("MetricRollup", _rollup.ROLLUP_SESSION)
+    assert event["timestamp"] == (t0 + _rollup.WINDOW_SECS) * 1000
+    payload = event["payload"]
+    read = payload["tools"]["Read"]
+    assert (read["calls"], read["failures"], read["dropped"]) == (11, 0, 20)
+    assert read["latency"]["count"] == 11 and read["latency"]["max_ms"] == 40
+    assert sum(read["latency"]["buckets"]) == 11
+    assert payload["dropped"] == 20
+    assert payload["sessions"]["s1"]["Read"]["calls"] == 10
+    assert payload["sessions"]["s2"]["Bash"]["failures"] == 1
+    assert not [n for n in os.listdir(_rollup.rollup_dir()) if not n.startswith(".")]
+
+
+def test_hooks_drop_unsampled_events_but_count_them(monkeypatch):
+    """With OBS_ROLLUP=1 an unsampled call sends nothing; a failure still does"""
+    import pre_tool_use, post_tool_use, post_tool_use_failure
+    monkeypatch.setenv("OBS_ROLLUP", "1")
+    monkeypatch.setenv("OBS_HITL", "0")
+    monkeypatch.setattr(_rollup, "SAMPLE_RATE", 0.0)
+    data = {"session_id": "s1", "tool_use_id": "x1", "tool_name": "Grep", "tool_input": {"pattern": "a"}}
+    with patch("_base.post_event") as mock:
+        pre_tool_use.main(data)
+        post_tool_use.main(data)
+        post_tool_use_failure.main({**data, "tool_use_id": "x2", "error": "boom"})
+    assert [c[0][0]["event_type"] for c in mock.call_args_list] == ["PostToolUseFailure"]
+    (window,) = [n for n in os.listdir(_rollup.rollup_dir()) if n.endswith(".win")]
+    with open(os.path.join(_rollup.rollup_dir(), window)) as f:
+        assert len(f.readlines()) == 3
+
+
+def test_hooks_only_append_and_leave_flushing_to_a_detached_process(monkeypatch):
+    """A tool hook after a closed window starts the flusher instead of posting rollups itself"""
+    monkeypatch.setenv("OBS_ROLLUP", "1")
+    monkeypatch.setenv("OBS_HITL", "0")
+    monkeypatch.setattr(_rollup, "SAMPLE_RATE", 1.0)
+    t0 = (int(time.time()) // _rollup.WINDOW_SECS - 2) * _rollup.WINDOW_SECS
+    _rollup._append({"session_id": "s1", "tool_name": "Read"}, "C", True, 5, now=t0)
+    with patch("_base.post_event") as post, patch("_base.spawn_detached") as spawn:
+        assert _rollup.keep("PostToolUse", {"session_id": "s1", "tool_name": "Read", "tool_use_id": "r"}, {})
+    post.assert_not_called()
+    spawn.assert_called_once_with("_rollup", "flush")
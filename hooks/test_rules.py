@@ -0,0 +1,100 @@
+import io, json, os, sys, time
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest.mock import patch
+sys.path.insert(0, str(Path(__file__).parent))
+
+import _rules
+
+RULES = [
+    {"id": "r1", "tool": "Bash", "pattern": "git push", "message": "Review before pushing"},
+    {"id": "r2", "tool": "*", "pattern": "\\.env", "message": ".env access"},
+    {"id": "r3", "tool": "Bash", "pattern": "push", "message": "later rule"},
+    {"id": "bad", "tool": "*", "pattern": "(unclosed", "message": "invalid"},
+]
+
+
+def test_ruleset_first_match_in_insertion_order():
+    """Rules are matched case-insensitively; the first rule added wins"""
+    rules = _rules.RuleSet(RULES)
+    assert rules.match("Bash", "GIT PUSH origin main")["id"] == "r1"
+    assert rules.match("Read", "/app/.env")["id"] == "r2"
+    assert rules.match("Read", "git push") is None
+    assert rules.match("Bash", "ls -la") is None
+    assert len(rules) == 3  # the invalid pattern is skipped
+
+
+def test_backreference_rules_match_after_other_rules():
+    """A rule using \\1 still matches when it is not first, where combining would renumber its group"""
+    rules = _rules.RuleSet([
+        {"id": "push", "tool": "Bash", "pattern": "git (push)", "message": "push"},
+        {"id": "twice", "tool": "Bash", "pattern": "(rm) -rf .* && \\1 ", "message": "repeated rm"},
+        {"id": "env", "tool": "*", "pattern": "\\.env", "message": ".env"},
+    ])
+    assert rules.match("Bash", "rm -rf build && rm -rf dist")["id"] == "twice"
+    assert rules.match("Bash", "git push && rm -rf x && rm y")["id"] == "push"
+    assert rules.match("Bash", "cat .env")["id"] == "env"
+    assert rules.match("Bash", "rm -rf build && ls ") is None
+
+
+def test_subject_prefers_command_then_string_inputs():
+    """Rules see the command, or the tool's string inputs"""
+    assert _rules.subject({"command": "git push", "timeout": 5}) == "git push"
+    assert _rules.subject({"file_path": "/app/.env", "limit": 10}) == "/app/.env"
+
+
+def test_load_revalidates_stale_cache_with_etag():
+    """A stale cache is revalidated with If-None-Match; 304 keeps the cached rules"""
+    path = _rules._cache_path()
+    with open(path, "w") as f:
+        json.dump({"etag": '"v1"', "rules": RULES[:1]}, f)
+    os.utime(path, (0, 0))
+    with patch("_base.http_request", return_value=(304, {}, b"")) as req:
+        rules = _rules.load("http://obs")
+    assert req.call_args.kwargs["headers"] == {"If-None-Match": '"v1"'}
+    assert rules.match("Bash", "git push")["id"] == "r1"
+    with patch("_base.http_request") as req:
+        _rules.load("http://obs")
+    req.assert_not_called()  # fresh again: no network hop
+
+
+def test_malformed_cache_loads_as_no_rules():
+    """A cache that is not a dict of rule dicts yields no rules instead of crashing the hook"""
+    path = _rules._cache_path()
+    for cached in (["not", "a", "dict"], {"rules": {"r1": RULES[0]}}, {"etag": 1, "rules": ["x", None, RULES[0]]}):
+        with open(path, "w") as f:
+            json.dump(cached, f)
+        with patch("_base.http_request", side_effect=OSError):
+            rules = _rules.load("http://obs")
+        assert len(rules) == (1 if isinstance(cached, dict) and isinstance(cached["rules"], list) else 0)
+
+
+def test_pre_tool_use_only_asks_server_on_match(monkeypatch):
+    """Non-matching calls never wait on the server; blocked calls are denied"""
+    import pre_tool_use
+    monkeypatch.setattr(_rules, "load", lambda: _rules.RuleSet(RULES))
+    with patch("_base.post_event") as post, patch.object(_rules, "await_decision") as decide:
+        pre_tool_use.main({"session_id": "s", "tool_name": "Bash", "tool_input": {"command": "ls"}})
+    decide.assert_not_called()
+    hitl = post.call_args[0][0]["payload"]["hitl"]
+    assert hitl["rule_id"] is None and hitl["match_us"] >= 0 and hitl["load_us"] >= 0
+
+    out = io.StringIO()
+    with patch("_base.post_event"), redirect_stdout(out), \
+            patch.object(_rules, "await_decision", return_value={"decision": "blocked", "message": "nope"}) as decide:
+        pre_tool_use.main({"session_id": "s", "tool_name": "Bash", "tool_input": {"command": "git push"}})
+    decide.assert_called_once_with("s", "Bash", "git push")
+    decision = json.loads(out.getvalue())["hookSpecificOutput"]
+    assert decision["permissionDecision"] == "deny"
+    assert decision["permissionDecisionReason"] == "nope"
+
+
+def test_match_time_stays_in_microseconds():
+    """Evaluating a few hundred rules against a miss stays well under a millisecond"""
+    many = [{"id": str(i), "tool": "Bash", "pattern": f"forbidden-{i}\\b", "message": ""} for i in range(300)]
+    rules = _rules.RuleSet(many)
+    rules.match("Bash", "warm up")
+    t = time.perf_counter()
+    for _ in range(100):
+        rules.match("Bash", "npm test -- --watch=false")
+    assert (time.perf_counter() - t) / 100 < 0.001
@@ -0,0 +1,64 @@
+import sys, time
+from pathlib import Path
+from unittest.mock import patch
+sys.path.insert(0, str(Path(__file__).parent))
+
+import _spans
+
+
+def test_finish_pairs_with_start_by_tool_use_id():
+    """A start and its finish share the span id; the finish reports duration"""
+    data = {"session_id": "s1", "tool_use_id": "toolu_1", "tool_name": "Bash", "tool_input": {"command": "ls"}}
+    span_id = _spans.start(data)
+    time.sleep(0.01)
+    span = _spans.finish(data)
+    assert span["span_id"] == span_id
+    assert span["duration_ms"] >= 10
+    assert abs(span["start_ts"] - time.time() * 1000) < 5000
+    assert _spans.finish(data) is None  # slot was released
+
+
+def test_key_falls_back_to_tool_and_input():
+    """Without tool_use_id, identical tool+input pairs up; other input does not"""
+    _spans.start({"session_id": "s1", "tool_name": "Read", "tool_input": {"file_path": "/a"}})
+    assert _spans.finish({"session_id": "s1", "tool_name": "Read", "tool_input": {"file_path": "/b"}}) is None
+    assert _spans.finish({"session_id": "s1", "tool_name": "Read", "tool_input": {"file_path": "/a"}}) is not None
+
+
+def test_many_concurrent_spans_and_expiry(monkeypatch):
+    """More open spans than a probe window evicts the oldest; expired starts report nothing"""
+    calls = [{"session_id": "s1", "tool_use_id": f"t{i}"} for i in range(600)]
+    for c in calls:
+        _spans.start(c)
+    found = sum(_spans.finish(c) is not None for c in calls)
+    assert 0 < found <= _spans.SLOTS
+    assert _spans.finish(calls[-1]) is None
+
+    monkeypatch.setattr(_spans, "TTL_SECS", 0.0)
+    _spans.start(calls[0])
+    time.sleep(0.001)
+    assert _spans.finish(calls[0]) is None
+
+
+def test_combined_mode_sends_only_the_finishing_event(monkeypatch):
+    """OBS_SPAN_MODE=combined skips PreToolUse and PostToolUse carries the span"""
+    import pre_tool_use, post_tool_use
+    monkeypatch.setenv("OBS_SPAN_MODE", "combined")
+    data = {"session_id": "s1", "tool_use_id": "toolu_9", "tool_name": "Bash", "tool_input": {"command": "ls"}}
+    with patch("_base.post_event") as mock:
+        pre_tool_use.main(data)
+        post_tool_use.main({**data, "tool_response": "ok"})
+    events = [c[0][0] for c in mock.call_args_list]
+    assert [e["event_type"] for e in events] == ["PostToolUse"]
+    assert {"span_id", "start_ts", "duration_ms"} <= events[0]["payload"].keys()
+
+
+def test_session_end_discards_span_file():
+    """SessionEnd removes the session's span store"""
+    import session_end
+    _spans.start({"session_id": "s2", "tool_use_id": "x"})
+    path = Path(_spans._path("s2"))
+    assert path.exists()
+    with patch("_base.post_event"):
+        session_end.main({"session_id": "s2"})
+    assert not path.exists()
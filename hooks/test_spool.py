@@ -0,0 +1,93 @@
+import json, sys
+from pathlib import Path
+from unittest.mock import patch
+sys.path.insert(0, str(Path(__file__).parent))
+
+import _base
+import _spool
+
+
+def _events(n):
+    return [json.dumps({"event_type": "PreToolUse", "n": i}).encode() for i in range(n)]
+
+
+class _FakeForwarder:
+    def __init__(self, fail_after=None):
+        self.delivered = []
+        self.fail_after = fail_after
+
+    def post_batch(self, batch):
+        if self.fail_after is not None and len(self.delivered) + len(batch) > self.fail_after:
+            return batch
+        self.delivered.extend(json.loads(b)["n"] for b in batch)
+        return []
+
+
+def test_append_then_replay_in_order():
+    """Spooled events are replayed oldest first and the spool ends empty"""
+    _spool.append(_events(5))
+    _spool.append(_events(3))
+    r = _spool.Replayer(batch_size=2, concurrency=2)
+    r.forwarder = _FakeForwarder()
+    assert r.drain() is True
+    assert r.forwarder.delivered == [0, 1, 2, 3, 4, 0, 1, 2]
+    assert _spool.depth()["records"] == 0
+
+
+def test_replay_resumes_after_failure_without_resending():
+    """A failing server stops the drain; acknowledged events are not resent"""
+    _spool.append(_events(6))
+    r = _spool.Replayer(batch_size=2, concurrency=1)
+    r.forwarder = _FakeForwarder(fail_after=4)
+    assert r.drain() is False
+    assert r.forwarder.delivered == [0, 1, 2, 3]
+    r.forwarder = _FakeForwarder()
+    assert r.drain() is True
+    assert r.forwarder.delivered == [4, 5]
+    assert _spool.status()["replay"]["total_replayed"] == 6
+
+
+def test_torn_record_is_skipped():
+    """A crash mid-write loses only the torn record, not the next append"""
+    _spool.append(_events(1))
+    seg = _spool._segments(_spool.spool_dir())[-1]
+    with open(seg, "ab") as f:
+        f.write(b"deadbeef {\"trunc")
+    _spool.append(_events(2))
+    assert [json.loads(line)["n"] for _, line in _spool.read_records(seg)] == [0, 0, 1]
+
+
+def test_segments_rotate_and_cap_drops_oldest(monkeypatch):
+    """Segments roll over at the size cap and the total size stays bounded"""
+    monkeypatch.setattr(_spool, "SEGMENT_BYTES", 200)
+    monkeypatch.setattr(_spool, "MAX_BYTES", 600)
+    for _ in range(20):
+        _spool.append(_events(2))
+    status = _spool.status()
+    assert status["segments"] > 1
+    assert status["bytes"] <= 600 + 200
+    assert status["dropped"] > 0
+
+
+def test_cap_waits_for_a_draining_replayer_and_tolerates_vanished_segments(monkeypatch):
+    """Eviction never races the replayer, and a segment removed meanwhile is skipped"""
+    monkeypatch.setattr(_spool, "SEGMENT_BYTES", 200)
+    monkeypatch.setattr(_spool, "MAX_BYTES", 600)
+    with _spool._Lock(".replay.lock") as owned:
+        assert owned
+        for _ in range(20):
+            _spool.append(_events(2))
+        assert _spool.status()["dropped"] == 0
+    directory = _spool.spool_dir()
+    segments = _spool._segments(directory)
+    Path(segments[0]).unlink()  # the replayer drained it after it was listed
+    with patch.object(_spool, "_segments", return_value=segments), _spool._Lock(".lock"):
+        _spool._enforce_cap(directory)
+    assert _spool.status()["bytes"] <= 600 + 200
+
+
+def test_failed_post_is_spooled(monkeypatch):
+    """post_event writes the event to the spool when the server is down"""
+    monkeypatch.setenv("OBS_SERVER", "http://localhost:1")
+    _base.post_event(_base.build_payload(event_type="Stop", session_id="s", source_app="app"))
+    assert _spool.depth()["records"] == 1
@@ -0,0 +1,109 @@
+import asyncio, json, sys
+from pathlib import Path
+from unittest.mock import patch
+sys.path.insert(0, str(Path(__file__).parent))
+
+import _base
+from stub_server import StubServer
+from subscriber import Subscriber
+
+
+def _post(url, n, start=0, **fields):
+    for i in range(start, start + n):
+        event = {"event_type": "Notification", "session_id": "s1", "trace_id": "t1", "source_app": "app",
+                 "tags": [], "payload": {"i": i}, **fields}
+        _base.http_request("POST", f"{url}/events", json.dumps(event).encode())
+
+
+async def _take(sub, n, timeout=5.0):
+    return [await sub.get(timeout) for _ in range(n)]
+
+
+async def _until_live(sub):
+    for _ in range(200):
+        if sub.live:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("subscriber never went live")
+
+
+def test_backfill_then_live_in_order():
+    """History is backfilled in id order, then live events follow with no gap or repeat"""
+    async def scenario(url):
+        _post(url, 5)
+        async with Subscriber(url, after_id=0, backfill_page=2) as sub:
+            first = await _take(sub, 5)
+            await _until_live(sub)
+            await asyncio.to_thread(_post, url, 3, 5)
+            rest = await _take(sub, 3)
+        return first + rest
+
+    with StubServer("fast") as stub:
+        events = asyncio.run(scenario(stub.url))
+    assert [e["payload"]["i"] for e in events] == list(range(8))
+    assert [e["id"] for e in events] == sorted({e["id"] for e in events})
+
+
+def test_cursor_resumes_after_restart(tmp_path):
+    """A new subscriber with the same cursor file picks up after the last delivered event"""
+    cursor = tmp_path / "sub.cursor"
+
+    async def scenario(url):
+        _post(url, 4)
+        async with Subscriber(url, cursor_path=str(cursor)) as sub:
+            first = await _take(sub, 2)
+        _post(url, 2, 4)
+        async with Subscriber(url, cursor_path=str(cursor)) as sub:
+            rest = await _take(sub, 4)
+        return first, rest
+
+    with StubServer("fast") as stub:
+        first, rest = asyncio.run(scenario(stub.url))
+    assert [e["payload"]["i"] for e in first] == [0, 1]
+    assert [e["payload"]["i"] for e in rest] == [2, 3, 4, 5]
+    assert cursor.read_text() == str(rest[-1]["id"])
+
+
+def test_filters_skip_payload_decoding():
+    """Non-matching events are rejected on outer fields; payloads stay encoded"""
+    sub = Subscriber("http://127.0.0.1:1", source_app="api", tag="ci")
+    assert not sub.matches({"source_app": "web", "tags": '["ci"]', "payload": "{not json"})
+    assert not sub.matches({"source_app": "api", "tags": '["cid"]', "payload": "{}"})
+    assert sub.matches({"source_app": "api", "tags": '["ci"]', "payload": "{}"})
+
+
+def test_slow_consumer_keeps_memory_bounded():
+    """A stalled consumer caps the queue; dropped live messages are recovered by backfill"""
+    async def scenario(url):
+        async with Subscriber(url, after_id=0, queue_size=2, live_buffer=5, source_app="app") as sub:
+            await _until_live(sub)
+            await asyncio.to_thread(_post, url, 50)
+            await asyncio.sleep(0.3)
+            assert sub._queue.qsize() <= 2
+            events = await _take(sub, 50)
+            assert sub.dropped_live > 0
+        return events
+
+    with StubServer("fast") as stub:
+        events = asyncio.run(scenario(stub.url))
+    assert [e["payload"]["i"] for e in events] == list(range(50))
+
+
+def test_unexpected_errors_end_iteration_instead_of_hanging():
+    """An error the reconnect loop does not handle is raised to the consumer after the queued events"""
+    async def scenario():
+        async def broken(self):
+            await self._deliver({"id": 1, "source_app": "app", "tags": "[]", "payload": "{}"})
+            raise KeyError("next_after_id")
+        seen = []
+        with patch.object(Subscriber, "_session", broken):
+            async with Subscriber("http://127.0.0.1:1", after_id=0) as sub:
+                try:
+                    async for event in sub:
+                        seen.append(event["id"])
+                except KeyError as err:
+                    return seen, err
+        return seen, None
+
+    seen, err = asyncio.run(asyncio.wait_for(scenario(), 5))
+    assert seen == [1] and isinstance(err, KeyError)
@@ -0,0 +1,107 @@
+import io, json, os, sys, time
+from pathlib import Path
+from unittest.mock import patch
+sys.path.insert(0, str(Path(__file__).parent))
+
+import _base
+import _telemetry
+
+
+def _window_start(windows_ago: int) -> int:
+    return (int(time.time()) // _telemetry.WINDOW_SECS - windows_ago) * _telemetry.WINDOW_SECS
+
+
+def test_post_direct_counts_delivery_outcomes(monkeypatch):
+    """Timeouts, errors and server errors are told apart; all of them spool"""
+    monkeypatch.setattr(_base, "OUTCOMES", {})
+    with patch("_base._spool_quietly") as spool, patch("_spool.replay_in_background"):
+        with patch("_base._http_post", side_effect=TimeoutError):
+            _base.deliver(b"{}")
+        with patch("_base._http_post", side_effect=ConnectionRefusedError):
+            _base.deliver(b"{}")
+        with patch("_base._http_post", return_value=503):
+            _base.deliver(b"{}")
+        with patch("_base._http_post", return_value=201):
+            _base.deliver(b"{}")
+    assert _base.OUTCOMES == {"timeout": 1, "error": 1, "server_error": 1, "ok": 1}
+    assert spool.call_count == 3
+    assert _telemetry.outcome(_base.OUTCOMES) == "timeout"
+    assert _telemetry.outcome({}) == "idle"
+
+
+def test_dispatch_records_one_line_per_invocation(monkeypatch):
+    """dispatch.run appends its phase timings to the current telemetry window"""
+    import dispatch
+    monkeypatch.setattr(sys, "stdin", io.StringIO(json.dumps({"hook_event_name": "Notification", "session_id": "s"})))
+    monkeypatch.setattr(_base, "OUTCOMES", {})
+    with patch("_base._http_post", return_value=201), patch("_spool.replay_in_background"):
+        dispatch.run()
+    (name,) = [n for n in os.listdir(_telemetry.telemetry_dir()) if n.endswith(".win")]
+    app, event, outcome, deliveries, *phases = (Path(_telemetry.telemetry_dir()) / name).read_text().rstrip("\n").split("\t")
+    assert (app, event, outcome, deliveries) == (_base.SOURCE_APP, "Notification", "ok", "ok=1")
+    assert len(phases) == len(_telemetry.PHASES)
+    assert int(phases[_telemetry.PHASES.index("run")]) > 0
+
+
+def test_dispatch_skips_telemetry_when_disabled(monkeypatch):
+    """OBS_TELEMETRY=0 records nothing"""
+    import dispatch
+    monkeypatch.setenv("OBS_TELEMETRY", "0")
+    monkeypatch.setattr(sys, "stdin", io.StringIO("{}"))
+    dispatch.run()
+    assert not os.path.exists(os.path.join(_base.state_dir(), "telemetry"))
+
+
+def test_closed_window_flushes_one_event_per_source_app():
+    """A closed window becomes one HookTelemetry event per app with outcomes and phase histograms"""
+    t0 = _window_start(2)
+    telemetry = _telemetry.telemetry_dir()
+    _telemetry._rollup.append_line(telemetry, _telemetry.WINDOW_SECS, ("api", "PreToolUse", "ok", "ok=1", 30000, 120, 80, 40, 900, 1500), t0)
+    _telemetry._rollup.append_line(telemetry, _telemetry.WINDOW_SECS, ("api", "PostToolUse", "timeout", "timeout=1", "", 100, 90, 30, 1000400, 1001000), t0 + 1)
+    _telemetry._rollup.append_line(telemetry, _telemetry.WINDOW_SECS, ("web", "Stop", "idle", "", 25000, 50, 0, 0, 0, 300), t0 + 2)
+    with patch("_base.post_event") as mock:
+        assert _telemetry.flush_closed() == 2
+        assert _telemetry.flush_closed() == 0
+    events = {e["source_app"]: e for e in (c[0][0] for c in mock.call_args_list)}
+    api = events["api"]
+    assert api["event_type"] == "HookTelemetry"
+    assert api["timestamp"] == (t0 + _telemetry.WINDOW_SECS) * 1000
+    p = api["payload"]
+    assert p["invocations"] == 2
+    assert p["outcomes"] == {"ok": 1, "timeout": 1}
+    assert p["hooks"] == {"PreToolUse": 1, "PostToolUse": 1}
+    assert p["phases"]["startup"]["count"] == 1  # unknown startup is left out
+    network = p["phases"]["network"]
+    assert network["max_ms"] == 1000.4 and sum(network["buckets"]) == 2
+    assert network["buckets"][_telemetry.BUCKET_BOUNDS_MS.index(1024)] == 1
+    assert events["web"]["payload"]["outcomes"] == {"idle": 1}
+
+
+def test_closed_window_starts_a_flusher_except_under_stop_hook_active(monkeypatch):
+    """The hook never posts telemetry itself, and a Stop hook that posts nothing leaves windows alone"""
+    _telemetry._rollup.append_line(_telemetry.telemetry_dir(), _telemetry.WINDOW_SECS,
+                                   ("api", "Stop", "idle", "", 1, 1, 1, 1, 1, 1), _window_start(2))
+    with patch("_base.post_event") as post, patch("_base.spawn_detached") as spawn:
+        monkeypatch.setattr(_base, "STOP_HOOK_ACTIVE", True)
+        _telemetry.record({"hook_event_name": "Stop"}, time.perf_counter_ns())
+        assert _telemetry.flush_closed() == 0
+        spawn.assert_not_called()
+        monkeypatch.setattr(_base, "STOP_HOOK_ACTIVE", False)
+        _telemetry.record({"hook_event_name": "Notification"}, time.perf_counter_ns())
+        spawn.assert_called_once_with("_telemetry", "flush")
+    post.assert_not_called()
+    assert len([n for n in os.listdir(_telemetry.telemetry_dir()) if n.endswith(".win")]) == 2
+
+
+def test_standalone_hook_scripts_record_telemetry(tmp_path):
+    """A per-event <event>.py command, as initialize.sh installs, reports its overhead too"""
+    import subprocess
+    out = subprocess.run(
+        [sys.executable, str(Path(__file__).parent / "notification.py")],
+        input=json.dumps({"hook_event_name": "Notification", "session_id": "s"}),
+        capture_output=True, text=True, timeout=30,
+        env={"OBS_SERVER": "http://127.0.0.1:1", "OBS_SPOOL": "0", "OBS_STATE_DIR": str(tmp_path)},
+    )
+    assert out.returncode == 0, out.stderr
+    (window,) = (tmp_path / "telemetry").glob("*.win")
+    assert window.read_text().split("\t")[1:3] == ["Notification", "error"]
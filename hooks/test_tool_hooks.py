@@ -65,3 +65,30 @@ def test_user_prompt_submit():
         user_prompt_submit.main(data)
     p = mock.call_args[0][0]
     assert len(p["payload"]["prompt"]) <= 1000
+
+
+def test_post_tool_use_bounds_large_response():
+    """REQ-HOOK: post_tool_use summarizes a multi-MB response without forwarding it"""
+    import post_tool_use
+    data = {"session_id": "s1", "tool_name": "Read", "tool_input": {"file_path": "/x"},
+            "tool_response": {"file": {"content": "q" * 5_000_000}}}
+    with patch("_base.post_event") as mock:
+        post_tool_use.main(data)
+    p = mock.call_args[0][0]
+    assert len(p["payload"]["response_summary"]) <= 500
+    assert len(json.dumps(p["payload"])) < 70_000
+
+
+def test_tool_hooks_carry_span():
+    """REQ-HOOK: PostToolUse and PostToolUseFailure carry the PreToolUse span"""
+    import pre_tool_use, post_tool_use, post_tool_use_failure
+    ok = {"session_id": "s1", "tool_use_id": "toolu_a", "tool_name": "Bash", "tool_input": {"command": "ls"}}
+    bad = {**ok, "tool_use_id": "toolu_b", "error": "exit 1"}
+    with patch("_base.post_event") as mock:
+        pre_tool_use.main(ok)
+        pre_tool_use.main(bad)
+        post_tool_use.main(ok)
+        post_tool_use_failure.main(bad)
+    pre_a, pre_b, post, failure = [c[0][0]["payload"] for c in mock.call_args_list]
+    assert post["span_id"] == pre_a["span_id"] and post["duration_ms"] >= 0
+    assert failure["span_id"] == pre_b["span_id"] and "start_ts" in failure
@@ -0,0 +1,88 @@
+import json, sys
+from pathlib import Path
+from unittest.mock import patch
+sys.path.insert(0, str(Path(__file__).parent))
+
+import _transcript
+
+
+def _assistant(msg_id, inp, out, model="claude-sonnet-4-6"):
+    return json.dumps({
+        "type": "assistant", "timestamp": "2026-01-01T12:00:00.000Z",
+        "message": {"id": msg_id, "model": model, "usage": {
+            "input_tokens": inp, "output_tokens": out,
+            "cache_creation_input_tokens": 10, "cache_read_input_tokens": 20}},
+    }) + "\n"
+
+
+def _user(text):
+    return json.dumps({"type": "user", "message": {"role": "user", "content": text}}) + "\n"
+
+
+def test_update_reads_only_appended_turns(tmp_path):
+    """Each update returns just the turns written since the previous one"""
+    t = tmp_path / "session.jsonl"
+    t.write_text(_user("hi") + _assistant("m1", 100, 5) + _assistant("m1", 100, 40))
+    idx = _transcript.TranscriptIndex(str(t))
+    first = idx.update()
+    assert [(x["turn"], x["message_id"], x["output_tokens"]) for x in first] == [(0, "m1", 40)]
+    with open(t, "a") as f:
+        f.write(_user("more") + _assistant("m2", 300, 7) + '{"partial": ')
+    second = idx.update()
+    assert [(x["turn"], x["message_id"]) for x in second] == [(1, "m2")]
+    assert idx.update() == []
+
+
+def test_message_continued_in_a_later_update_is_corrected(tmp_path):
+    """A streamed message split across updates moves its index slot and reports only the growth"""
+    t = tmp_path / "session.jsonl"
+    t.write_text(_assistant("m1", 100, 1))
+    idx = _transcript.TranscriptIndex(str(t))
+    assert [x["output_tokens"] for x in idx.update()] == [1]
+    with open(t, "a") as f:
+        f.write(_assistant("m1", 100, 30) + _assistant("m1", 100, 50))
+    (fix,) = idx.update()
+    assert (fix["turn"], fix["continued"], fix["input_tokens"], fix["output_tokens"]) == (0, True, 0, 49)
+    assert idx.turn(0)["output_tokens"] == 50 and idx.turn_count() == 1
+    with open(t, "a") as f:
+        f.write(_assistant("m1", 100, 50) + _assistant("m2", 10, 2))
+    assert [(x["turn"], x["message_id"]) for x in idx.update()] == [(1, "m2")]
+
+
+def test_turn_random_access_uses_sidecar(tmp_path):
+    """turn(n) reads one index slot instead of rescanning the file"""
+    t = tmp_path / "session.jsonl"
+    t.write_text("".join(_assistant(f"m{i}", i, i) for i in range(5)))
+    idx = _transcript.TranscriptIndex(str(t))
+    idx.update()
+    assert idx.turn_count() == 5
+    assert idx.turn(3)["input_tokens"] == 3
+    assert idx.turn(5) is None
+
+
+def test_rewritten_transcript_is_reindexed(tmp_path):
+    """A shorter or replaced file restarts the index from the top"""
+    t = tmp_path / "session.jsonl"
+    t.write_text(_assistant("a", 1, 1) + _assistant("b", 2, 2))
+    idx = _transcript.TranscriptIndex(str(t))
+    idx.update()
+    t.write_text(_assistant("c", 3, 3))
+    assert [x["message_id"] for x in idx.update()] == ["c"]
+    assert idx.turn_count() == 1
+
+
+def test_report_usage_emits_token_usage_events(tmp_path, monkeypatch):
+    """Stop emits per-turn TokenUsage events and folds a long backlog per model"""
+    import stop
+    monkeypatch.setattr(_transcript, "MAX_TURN_EVENTS", 2)
+    t = tmp_path / "session.jsonl"
+    t.write_text("".join(_assistant(f"m{i}", 1000, 100) for i in range(5)))
+    with patch("_base.post_event") as mock:
+        stop.main({"session_id": "s1", "transcript_path": str(t)})
+    events = [c[0][0] for c in mock.call_args_list]
+    assert events[0]["event_type"] == "Stop"
+    usage = [e["payload"] for e in events if e["event_type"] == "TokenUsage"]
+    assert usage[0]["turns"] == 3 and usage[0]["input_tokens"] == 3000
+    assert [u["turn"] for u in usage[1:]] == [3, 4]
+    assert sum(u["output_tokens"] for u in usage) == 500
+    assert all(e["timestamp"] == 1767268800000 for e in events if e["event_type"] == "TokenUsage")
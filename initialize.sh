@@ -11,8 +11,10 @@
 #   1. Checks prerequisites (bun, python3)
 #   2. Installs dashboard server + client dependencies (once)
 #   3. Creates the target directory if it does not exist
-#   4. Copies observability hooks into <target>/.claude/hooks/
+#   4. Copies observability hooks into <target>/.claude/hooks/ and bundles
+#      them into obs_hooks.pyz (falls back to dispatch.py if that fails)
 #   5. Generates <target>/.claude/settings.json with all 12 hooks wired up
+#      to that single dispatcher
 #   6. Optionally initialises a git repository in the target project
 #
 # Run from anywhere — the script locates the dashboard directory automatically.
@@ -108,14 +110,25 @@ success "Copied $(ls "${HOOKS_SRC}"/*.py | wc -l | tr -d ' ') hook scripts"
 
 HOOKS_ABS="${TARGET_PATH}/.claude/hooks"
 
+# Detect python binary
+PYTHON_BIN="$(command -v python3 || command -v python)"
+
+# One dispatcher serves every event. The zipapp is compiled by the same
+# interpreter that will run it; the copied dispatch.py is the fallback.
+info "Building hook bundle…"
+if "${PYTHON_BIN}" "${HOOKS_SRC}/build_pyz.py" -o "${HOOKS_ABS}/obs_hooks.pyz" >/dev/null; then
+  HOOK_CMD="${PYTHON_BIN} -S ${HOOKS_ABS}/obs_hooks.pyz"
+  success "Built obs_hooks.pyz"
+else
+  HOOK_CMD="${PYTHON_BIN} ${HOOKS_ABS}/dispatch.py"
+  warn "Could not build obs_hooks.pyz — hooks will run through dispatch.py"
+fi
+
 # ── Generate settings.json ────────────────────────────────────────────────────
 info "Generating .claude/settings.json…"
 
 SETTINGS_FILE="${TARGET_PATH}/.claude/settings.json"
 
-# Detect python binary
-PYTHON_BIN="$(command -v python3 || command -v python)"
-
 cat > "${SETTINGS_FILE}" <<EOF
 {
   "env": {
@@ -125,40 +138,40 @@ cat > "${SETTINGS_FILE}" <<EOF
   },
   "hooks": {
     "SessionStart": [
-      {"matcher": "*", "hooks": [{"type": "command", "command": "${PYTHON_BIN} ${HOOKS_ABS}/session_start.py"}]}
+      {"matcher": "*", "hooks": [{"type": "command", "command": "${HOOK_CMD}"}]}
     ],
     "SessionEnd": [
-      {"matcher": "*", "hooks": [{"type": "command", "command": "${PYTHON_BIN} ${HOOKS_ABS}/session_end.py"}]}
+      {"matcher": "*", "hooks": [{"type": "command", "command": "${HOOK_CMD}"}]}
     ],
     "Stop": [
-      {"matcher": "*", "hooks": [{"type": "command", "command": "STOP_HOOK_ACTIVE=1 ${PYTHON_BIN} ${HOOKS_ABS}/stop.py"}]}
+      {"matcher": "*", "hooks": [{"type": "command", "command": "STOP_HOOK_ACTIVE=1 ${HOOK_CMD}"}]}
     ],
     "SubagentStart": [
-      {"matcher": "*", "hooks": [{"type": "command", "command": "${PYTHON_BIN} ${HOOKS_ABS}/subagent_start.py"}]}
+      {"matcher": "*", "hooks": [{"type": "command", "command": "${HOOK_CMD}"}]}
     ],
     "SubagentStop": [
-      {"matcher": "*", "hooks": [{"type": "command", "command": "${PYTHON_BIN} ${HOOKS_ABS}/subagent_stop.py"}]}
+      {"matcher": "*", "hooks": [{"type": "command", "command": "${HOOK_CMD}"}]}
     ],
     "PreToolUse": [
-      {"matcher": "*", "hooks": [{"type": "command", "command": "${PYTHON_BIN} ${HOOKS_ABS}/pre_tool_use.py"}]}
+      {"matcher": "*", "hooks": [{"type": "command", "command": "${HOOK_CMD}"}]}
     ],
     "PostToolUse": [
-      {"matcher": "*", "hooks": [{"type": "command", "command": "${PYTHON_BIN} ${HOOKS_ABS}/post_tool_use.py"}]}
+      {"matcher": "*", "hooks": [{"type": "command", "command": "${HOOK_CMD}"}]}
     ],
     "PostToolUseFailure": [
-      {"matcher": "*", "hooks": [{"type": "command", "command": "${PYTHON_BIN} ${HOOKS_ABS}/post_tool_use_failure.py"}]}
+      {"matcher": "*", "hooks": [{"type": "command", "command": "${HOOK_CMD}"}]}
     ],
     "Notification": [
-      {"matcher": "*", "hooks": [{"type": "command", "command": "${PYTHON_BIN} ${HOOKS_ABS}/notification.py"}]}
+      {"matcher": "*", "hooks": [{"type": "command", "command": "${HOOK_CMD}"}]}
     ],
     "PermissionRequest": [
-      {"matcher": "*", "hooks": [{"type": "command", "command": "${PYTHON_BIN} ${HOOKS_ABS}/permission_request.py"}]}
+      {"matcher": "*", "hooks": [{"type": "command", "command": "${HOOK_CMD}"}]}
     ],
     "UserPromptSubmit": [
-      {"matcher": "*", "hooks": [{"type": "command", "command": "${PYTHON_BIN} ${HOOKS_ABS}/user_prompt_submit.py"}]}
+      {"matcher": "*", "hooks": [{"type": "command", "command": "${HOOK_CMD}"}]}
     ],
     "PreCompact": [
-      {"matcher": "*", "hooks": [{"type": "command", "command": "${PYTHON_BIN} ${HOOKS_ABS}/pre_compact.py"}]}
+      {"matcher": "*", "hooks": [{"type": "command", "command": "${HOOK_CMD}"}]}
     ]
   }
 }
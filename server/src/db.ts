@@ -21,6 +21,17 @@ export function initDb(path = 'data.sqlite') {
   db.exec(`CREATE INDEX IF NOT EXISTS idx_events_session   ON events(session_id)`)
   db.exec(`CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events(timestamp)`)
   db.exec(`CREATE INDEX IF NOT EXISTS idx_events_type      ON events(event_type)`)
+  // Whole-swarm lookups: hooks stamp every subagent event with its root trace_id
+  db.exec(`CREATE INDEX IF NOT EXISTS idx_events_trace     ON events(trace_id, id)`)
+  // Content-addressed payload blobs (large tool inputs/outputs sent once by the hooks)
+  db.exec(`
+    CREATE TABLE IF NOT EXISTS blobs (
+      hash      TEXT    PRIMARY KEY,
+      content   TEXT    NOT NULL,
+      size      INTEGER NOT NULL,
+      last_seen INTEGER NOT NULL
+    )
+  `)
 }
 
 export function getDb(): Database {
@@ -1,88 +1,172 @@
 import { Elysia } from 'elysia'
 import { readFile } from 'fs/promises'
 import { resolve } from 'path'
+import { createHash } from 'crypto'
 import { getDb } from '../db'
 import { broadcast } from '../broadcast'
+import type { StoredEvent } from '../types'
 
 const REQUIRED_STRING_FIELDS = ['event_type', 'session_id', 'trace_id'] as const
 
-export const eventsRouter = new Elysia()
-  .post('/events', ({ body, set }) => {
-    const event = body as Record<string, unknown>
+type InsertResult =
+  | { ok: true; event: StoredEvent }
+  | { ok: false; status: number; error: string }
 
-    // C1 fix: validate each required field is a non-empty string
-    for (const field of REQUIRED_STRING_FIELDS) {
-      if (typeof event[field] !== 'string' || !(event[field] as string).trim()) {
-        set.status = 400
-        return { error: `Missing or invalid required field: ${field}` }
-      }
-    }
+const BLOB_HASH = /^[0-9a-f]{64}$/
 
-    // I1 fix: validate timestamp
-    let timestamp: number
-    if (event.timestamp !== undefined) {
-      const ts = Number(event.timestamp)
-      if (!Number.isFinite(ts) || ts <= 0) {
-        set.status = 400
-        return { error: 'Invalid timestamp: must be a positive finite number' }
-      }
-      timestamp = Math.round(ts)
-    } else {
-      timestamp = Date.now()
+/**
+ * Store the content-addressed blobs an event carries. The hooks replace large
+ * repeated strings in payloads with {"$blob": hash} references and attach the
+ * content only the first time; GET /blobs/:hash resolves them. Content that
+ * does not match its hash is ignored.
+ */
+function storeBlobs(blobs: unknown, seenAt: number): void {
+  if (typeof blobs !== 'object' || blobs === null || Array.isArray(blobs)) return
+  const stmt = getDb().prepare(`
+    INSERT INTO blobs (hash, content, size, last_seen) VALUES ($hash, $content, $size, $last_seen)
+    ON CONFLICT(hash) DO UPDATE SET last_seen = MAX(last_seen, excluded.last_seen)
+  `)
+  for (const [hash, content] of Object.entries(blobs as Record<string, unknown>)) {
+    if (!BLOB_HASH.test(hash) || typeof content !== 'string') continue
+    if (createHash('sha256').update(content).digest('hex') !== hash) continue
+    stmt.run({ $hash: hash, $content: content, $size: content.length, $last_seen: seenAt })
+  }
+}
+
+const INSERT_SQL = `
+  INSERT INTO events
+    (event_type, session_id, trace_id, parent_session_id, source_app, tags, payload, timestamp)
+  VALUES
+    ($event_type, $session_id, $trace_id, $parent_session_id, $source_app, $tags, $payload, $timestamp)
+`
+
+/**
+ * Validate one event and insert it. Shared by POST /events and POST
+ * /events/batch so both routes apply exactly the same rules. Invalid events
+ * are returned as 400 results; database errors are thrown, so a batch rolls
+ * back as a whole and the caller reports a retryable 5xx. Callers broadcast
+ * the stored event only once it is committed.
+ */
+function insertEvent(event: Record<string, unknown>): InsertResult {
+  // C1 fix: validate each required field is a non-empty string
+  for (const field of REQUIRED_STRING_FIELDS) {
+    if (typeof event[field] !== 'string' || !(event[field] as string).trim()) {
+      return { ok: false, status: 400, error: `Missing or invalid required field: ${field}` }
     }
+  }
 
-    // I2 fix: validate tags is array of strings
-    const rawTags = event.tags
-    if (rawTags !== undefined && !Array.isArray(rawTags)) {
-      set.status = 400
-      return { error: 'Invalid tags: must be an array' }
+  // I1 fix: validate timestamp
+  let timestamp: number
+  if (event.timestamp !== undefined) {
+    const ts = Number(event.timestamp)
+    if (!Number.isFinite(ts) || ts <= 0) {
+      return { ok: false, status: 400, error: 'Invalid timestamp: must be a positive finite number' }
     }
-    const tags = Array.isArray(rawTags)
-      ? rawTags.filter((t): t is string => typeof t === 'string')
-      : []
+    timestamp = Math.round(ts)
+  } else {
+    timestamp = Date.now()
+  }
+
+  // I2 fix: validate tags is array of strings
+  const rawTags = event.tags
+  if (rawTags !== undefined && !Array.isArray(rawTags)) {
+    return { ok: false, status: 400, error: 'Invalid tags: must be an array' }
+  }
+  const tags = Array.isArray(rawTags)
+    ? rawTags.filter((t): t is string => typeof t === 'string')
+    : []
+
+  // I4 fix: treat string "null" as SQL null
+  const parentSessionId =
+    typeof event.parent_session_id === 'string' && event.parent_session_id !== 'null'
+      ? event.parent_session_id
+      : null
 
-    // I4 fix: treat string "null" as SQL null
-    const parentSessionId =
-      typeof event.parent_session_id === 'string' && event.parent_session_id !== 'null'
-        ? event.parent_session_id
-        : null
+  const payloadObj = typeof event.payload === 'object' && event.payload !== null && !Array.isArray(event.payload)
+    ? event.payload as Record<string, unknown>
+    : {}
 
-    const payloadObj = typeof event.payload === 'object' && event.payload !== null && !Array.isArray(event.payload)
-      ? event.payload as Record<string, unknown>
-      : {}
+  const sourceApp = typeof event.source_app === 'string' ? event.source_app : 'unknown'
 
-    // C2 fix: wrap DB operations in try/catch
+  const result = getDb().prepare(INSERT_SQL).run({
+    $event_type:        event.event_type as string,
+    $session_id:        event.session_id as string,
+    $trace_id:          event.trace_id as string,
+    $parent_session_id: parentSessionId,
+    $source_app:        sourceApp,
+    $tags:              JSON.stringify(tags),
+    $payload:           JSON.stringify(payloadObj),
+    $timestamp:         timestamp,
+  })
+  const id = Number(result.lastInsertRowid)
+  storeBlobs(event.blobs, timestamp)
+  return {
+    ok: true,
+    event: { id, event_type: event.event_type as string, session_id: event.session_id as string, trace_id: event.trace_id as string, parent_session_id: parentSessionId, source_app: sourceApp, tags: JSON.stringify(tags), payload: JSON.stringify(payloadObj), timestamp },
+  }
+}
+
+function databaseError(err: unknown): string {
+  return `Database error: ${err instanceof Error ? err.message : String(err)}`
+}
+
+const MAX_BATCH = 1000
+
+export const eventsRouter = new Elysia()
+  .post('/events', ({ body, set }) => {
+    let result: InsertResult
     try {
-      const db = getDb()
-      const stmt = db.prepare(`
-        INSERT INTO events
-          (event_type, session_id, trace_id, parent_session_id, source_app, tags, payload, timestamp)
-        VALUES
-          ($event_type, $session_id, $trace_id, $parent_session_id, $source_app, $tags, $payload, $timestamp)
-      `)
-      const result = stmt.run({
-        $event_type:        event.event_type as string,
-        $session_id:        event.session_id as string,
-        $trace_id:          event.trace_id as string,
-        $parent_session_id: parentSessionId,
-        $source_app:        typeof event.source_app === 'string' ? event.source_app : 'unknown',
-        $tags:              JSON.stringify(tags),
-        $payload:           JSON.stringify(payloadObj),
-        $timestamp:         timestamp,
-      })
-      set.status = 201
-      broadcast({ id: Number(result.lastInsertRowid), event_type: event.event_type, session_id: event.session_id, trace_id: event.trace_id, parent_session_id: parentSessionId, source_app: typeof event.source_app === 'string' ? event.source_app : 'unknown', tags: JSON.stringify(tags), payload: JSON.stringify(payloadObj), timestamp })
-      return { id: Number(result.lastInsertRowid), timestamp }
+      result = insertEvent(body as Record<string, unknown>)
     } catch (err) {
       set.status = 500
-      return { error: `Database error: ${err instanceof Error ? err.message : String(err)}` }
+      return { error: databaseError(err) }
     }
+    if (!result.ok) {
+      set.status = result.status
+      return { error: result.error }
+    }
+    broadcast(result.event)
+    set.status = 201
+    return { id: result.event.id, timestamp: result.event.timestamp }
+  })
+  // Bulk ingest used by the hook relay daemon: one request, one transaction.
+  // Invalid events are reported per index and do not reject the rest; a
+  // database error rolls the whole batch back with a 500 so the relay retries
+  // it, and nothing is broadcast until the batch has committed.
+  .post('/events/batch', ({ body, set }) => {
+    if (!Array.isArray(body)) {
+      set.status = 400
+      return { error: 'Invalid batch: must be an array of events' }
+    }
+    if (body.length > MAX_BATCH) {
+      set.status = 413
+      return { error: `Batch too large: max ${MAX_BATCH} events` }
+    }
+    const results: InsertResult[] = []
+    try {
+      getDb().transaction(() => {
+        for (const item of body) {
+          const event = typeof item === 'object' && item !== null ? item as Record<string, unknown> : {}
+          results.push(insertEvent(event))
+        }
+      })()
+    } catch (err) {
+      set.status = 500
+      return { error: databaseError(err) }
+    }
+    for (const r of results) if (r.ok) broadcast(r.event)
+    const rejected = results
+      .map((r, index) => (r.ok ? null : { index, error: r.error }))
+      .filter((r): r is { index: number; error: string } => r !== null)
+    set.status = 201
+    return { accepted: results.length - rejected.length, rejected }
   })
   .get('/events/recent', ({ query, set }) => {
     try {
       const db = getDb()
       const limit  = Math.min(Math.max(0, Math.floor(Number(query.limit)  || 100)), 500)  // also fixes I1
       const offset = Math.max(0, Math.floor(Number(query.offset) || 0))                    // also fixes I1
+      const afterId = query.after_id === undefined ? null : Math.max(0, Math.floor(Number(query.after_id) || 0))
 
       const conditions: string[] = []
       const params: Record<string, unknown> = {}
@@ -90,6 +174,7 @@ export const eventsRouter = new Elysia()
       if (query.source_app) { conditions.push('source_app = $source_app'); params.$source_app = query.source_app }
       if (query.session_id)  { conditions.push('session_id = $session_id');  params.$session_id  = query.session_id }
       if (query.event_type)  { conditions.push('event_type = $event_type');  params.$event_type  = query.event_type }
+      if (query.trace_id)    { conditions.push('trace_id = $trace_id');      params.$trace_id    = query.trace_id }
       if (query.tag) {
         // I2 fix: escape LIKE metacharacters in tag value
         const escapedTag = String(query.tag).replace(/%/g, '\\%').replace(/_/g, '\\_')
@@ -97,6 +182,17 @@ export const eventsRouter = new Elysia()
         params.$tag = `%"${escapedTag}"%`
       }
 
+      // Keyset mode for consumers catching up: oldest-first after a known id,
+      // larger pages, and no COUNT(*) so a deep cursor costs the same as a shallow one.
+      if (afterId !== null) {
+        const pageLimit = Math.min(Math.max(1, Math.floor(Number(query.limit) || 1000)), 5000)
+        conditions.push('id > $after_id')
+        params.$after_id = afterId
+        const events = db.query(`SELECT * FROM events WHERE ${conditions.join(' AND ')} ORDER BY id ASC LIMIT ${pageLimit}`).all(params) as { id: number }[]
+        const next = events.length ? events[events.length - 1].id : afterId
+        return { events, limit: pageLimit, after_id: afterId, next_after_id: next, has_more: events.length === pageLimit }
+      }
+
       const where = conditions.length ? `WHERE ${conditions.join(' AND ')}` : ''
       const events   = db.query(`SELECT * FROM events ${where} ORDER BY timestamp DESC LIMIT ${limit} OFFSET ${offset}`).all(params)
       const totalRow = db.query(`SELECT COUNT(*) as count FROM events ${where}`).get(params) as { count: number }
@@ -131,6 +227,16 @@ export const eventsRouter = new Elysia()
       return { error: `Database error: ${err instanceof Error ? err.message : String(err)}` }
     }
   })
+  .get('/blobs/:hash', ({ params, set }) => {
+    try {
+      const row = getDb().query('SELECT hash, content, size FROM blobs WHERE hash = ?').get(params.hash)
+      if (!row) { set.status = 404; return { error: 'Blob not found' } }
+      return row
+    } catch (err) {
+      set.status = 500
+      return { error: `Database error: ${err instanceof Error ? err.message : String(err)}` }
+    }
+  })
   .get('/transcript', async ({ query, set }) => {
     const rawPath = typeof query.path === 'string' ? query.path : ''
     if (!rawPath || !rawPath.startsWith('/')) {
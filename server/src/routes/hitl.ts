@@ -9,6 +9,12 @@ interface HitlIntercept { id: string; session_id: string; tool_name: string; com
 const rules: HitlRule[] = []
 const intercepts = new Map<string, HitlIntercept>()
 
+// Rule-set version for ETag revalidation by the hooks' local rule cache.
+// The boot id keeps a restarted server from matching a stale cached version.
+const bootId = randomUUID().slice(0, 8)
+let rulesVersion = 0
+const rulesEtag = () => `"${bootId}-${rulesVersion}"`
+
 export const hitlRouter = new Elysia()
   .post('/hitl/rules', ({ body, set }) => {
     const b = body as Record<string, unknown>
@@ -19,18 +25,28 @@ export const hitlRouter = new Elysia()
       message: String(b.message ?? 'Approval required'),
     }
     rules.push(rule)
+    rulesVersion++
     set.status = 201
     return rule
   })
-  .get('/hitl/rules', () => rules)
+  .get('/hitl/rules', ({ request, set }) => {
+    const etag = rulesEtag()
+    set.headers['etag'] = etag
+    if (request.headers.get('if-none-match') === etag) {
+      set.status = 304
+      return ''
+    }
+    return rules
+  })
   .delete('/hitl/rules/:id', ({ params, set }) => {
     const idx = rules.findIndex(r => r.id === params.id)
     if (idx === -1) { set.status = 404; return { error: 'Rule not found' } }
     rules.splice(idx, 1)
+    rulesVersion++
     return { deleted: params.id }
   })
 
-  // Check endpoint — called by pre_tool_use.py hook before allowing tool execution
+  // Check endpoint — called by pre_tool_use.py only after its local rule engine matched
   .get('/hitl/check', ({ query }) => {
     const toolName = String(query.tool_name ?? '')
     const sessionId = String(query.session_id ?? '')
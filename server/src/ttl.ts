@@ -7,6 +7,9 @@ export function runTtlCleanup(ttlDays = 7): number {
   const db = getDb()
   const cutoffMs = Date.now() - ttlDays * 24 * 60 * 60 * 1000
   const result = db.run('DELETE FROM events WHERE timestamp < ?', [cutoffMs])
+  // Blobs are refreshed whenever an event carries them again, so anything not
+  // re-sent within the window is only referenced by pruned events.
+  db.run('DELETE FROM blobs WHERE last_seen < ?', [cutoffMs])
   if (result.changes > 0) {
     console.log(`[TTL] Pruned ${result.changes} events older than ${ttlDays} days`)
   }
@@ -7,6 +7,7 @@ export interface HookEvent {
   tags: string[]
   payload: Record<string, unknown>
   timestamp?: number
+  blobs?: Record<string, string>  // sha256 hex → content, for {"$blob": hash} refs in payload
 }
 
 export interface StoredEvent {
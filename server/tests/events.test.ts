@@ -1,6 +1,7 @@
 import { describe, it, expect, beforeAll } from 'bun:test'
-import { initDb } from '../src/db'
+import { initDb, getDb } from '../src/db'
 import app from '../src/index'
+import { createHash } from 'crypto'
 
 beforeAll(() => initDb(':memory:'))
 
@@ -99,6 +100,99 @@ describe('REQ-6.2: POST /events', () => {
   })
 })
 
+describe('POST /events/batch', () => {
+  it('stores every valid event in the batch', async () => {
+    const res = await app.handle(new Request('http://localhost/events/batch', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify([
+        { event_type: 'PreToolUse', session_id: 'batch-1', trace_id: 'batch-1', source_app: 'test', tags: [], payload: {} },
+        { event_type: 'PostToolUse', session_id: 'batch-1', trace_id: 'batch-1', source_app: 'test', tags: [], payload: {}, timestamp: 1700000000000 },
+      ])
+    }))
+    expect(res.status).toBe(201)
+    const body = await res.json()
+    expect(body.accepted).toBe(2)
+    expect(body.rejected).toEqual([])
+  })
+
+  it('reports invalid events by index without rejecting the rest', async () => {
+    const res = await app.handle(new Request('http://localhost/events/batch', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify([
+        { event_type: 'Stop', session_id: 'batch-2', trace_id: 'batch-2' },
+        { session_id: 'batch-2', trace_id: 'batch-2' },
+      ])
+    }))
+    expect(res.status).toBe(201)
+    const body = await res.json()
+    expect(body.accepted).toBe(1)
+    expect(body.rejected[0].index).toBe(1)
+  })
+
+  it('rolls the whole batch back with a 500 on a database error', async () => {
+    getDb().exec(`CREATE TRIGGER fail_batch BEFORE INSERT ON events WHEN NEW.session_id = 'batch-fail'
+                  BEGIN SELECT RAISE(ABORT, 'simulated I/O error'); END`)
+    try {
+      const res = await app.handle(new Request('http://localhost/events/batch', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify([
+          { event_type: 'Stop', session_id: 'batch-kept', trace_id: 'batch-kept' },
+          { event_type: 'Stop', session_id: 'batch-fail', trace_id: 'batch-fail' },
+        ])
+      }))
+      expect(res.status).toBe(500)
+      const recent = await (await app.handle(new Request('http://localhost/events/recent?session_id=batch-kept'))).json()
+      expect(recent.events).toEqual([])
+    } finally {
+      getDb().exec('DROP TRIGGER fail_batch')
+    }
+  })
+
+  it('returns 400 when the body is not an array', async () => {
+    const res = await app.handle(new Request('http://localhost/events/batch', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ event_type: 'Stop', session_id: 'x', trace_id: 'y' })
+    }))
+    expect(res.status).toBe(400)
+  })
+})
+
+describe('payload blobs', () => {
+  const content = 'export const x = 1\n'.repeat(500)
+  const hash = createHash('sha256').update(content).digest('hex')
+
+  it('stores blobs carried by an event and resolves them by hash', async () => {
+    const res = await app.handle(new Request('http://localhost/events', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        event_type: 'PreToolUse', session_id: 'blob-1', trace_id: 'blob-1', source_app: 'test', tags: [],
+        payload: { tool: 'Write', input: { content: { $blob: hash, chars: content.length, preview: 'export' } } },
+        blobs: { [hash]: content },
+      })
+    }))
+    expect(res.status).toBe(201)
+    const blob = await (await app.handle(new Request(`http://localhost/blobs/${hash}`))).json()
+    expect(blob.content).toBe(content)
+    expect(blob.size).toBe(content.length)
+  })
+
+  it('ignores blobs whose content does not match the hash', async () => {
+    const bogus = 'f'.repeat(64)
+    await app.handle(new Request('http://localhost/events', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ event_type: 'Stop', session_id: 'blob-2', trace_id: 'blob-2', blobs: { [bogus]: 'nope' } })
+    }))
+    const res = await app.handle(new Request(`http://localhost/blobs/${bogus}`))
+    expect(res.status).toBe(404)
+  })
+})
+
 describe('REQ-6.2: GET /events/recent', () => {
   it('REQ-6.2: returns events newest-first with total count', async () => {
     const res = await app.handle(new Request('http://localhost/events/recent'))
@@ -168,6 +262,40 @@ describe('REQ-6.2: GET /events/recent', () => {
     expect(body2.events.length).toBe(1)
     expect(body1.events[0].id).not.toBe(body2.events[0].id)
   })
+  it('after_id pages oldest-first by id without a total', async () => {
+    const ids: number[] = []
+    for (let i = 0; i < 3; i++) {
+      const res = await app.handle(new Request('http://localhost/events', {
+        method: 'POST', headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ event_type: 'Notification', session_id: 'keyset-sess', trace_id: 'keyset-trace', source_app: 'keyset-app', tags: [], payload: { i } })
+      }))
+      ids.push((await res.json()).id)
+    }
+    const res1 = await app.handle(new Request(`http://localhost/events/recent?source_app=keyset-app&after_id=0&limit=2`))
+    const body1 = await res1.json()
+    expect(body1.events.map((e: any) => e.id)).toEqual(ids.slice(0, 2))
+    expect(body1.has_more).toBe(true)
+    expect(body1.total).toBeUndefined()
+    const res2 = await app.handle(new Request(`http://localhost/events/recent?source_app=keyset-app&after_id=${body1.next_after_id}&limit=2`))
+    const body2 = await res2.json()
+    expect(body2.events.map((e: any) => e.id)).toEqual([ids[2]])
+    expect(body2.has_more).toBe(false)
+    expect(body2.next_after_id).toBe(ids[2])
+  })
+
+  it('trace_id returns a whole swarm with one indexed lookup', async () => {
+    for (const [session_id, parent] of [['trace-root', null], ['trace-child', 'trace-root'], ['trace-grandchild', 'trace-child']]) {
+      await app.handle(new Request('http://localhost/events', {
+        method: 'POST', headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ event_type: 'PreToolUse', session_id, trace_id: 'swarm-trace', parent_session_id: parent, source_app: 'trace-app', tags: [], payload: {} })
+      }))
+    }
+    const res = await app.handle(new Request('http://localhost/events/recent?trace_id=swarm-trace&after_id=0'))
+    const body = await res.json()
+    expect(body.events.map((e: any) => e.session_id)).toEqual(['trace-root', 'trace-child', 'trace-grandchild'])
+    const plan = getDb().query("EXPLAIN QUERY PLAN SELECT * FROM events WHERE trace_id = 'swarm-trace' AND id > 0 ORDER BY id").all() as { detail: string }[]
+    expect(plan.some(row => row.detail.includes('idx_events_trace'))).toBe(true)
+  })
 })
 
 describe('REQ-6.2: GET /events/filter-options', () => {
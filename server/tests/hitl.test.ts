@@ -60,3 +60,27 @@ describe('HITL API', () => {
     expect(body.status).toBe('blocked')
   })
 })
+
+describe('HITL rules ETag', () => {
+  it('GET /hitl/rules returns 304 for a matching If-None-Match and a new ETag after changes', async () => {
+    const first = await app.handle(new Request('http://localhost/hitl/rules'))
+    const etag = first.headers.get('etag')
+    expect(etag).toBeTruthy()
+
+    const cached = await app.handle(new Request('http://localhost/hitl/rules', {
+      headers: { 'If-None-Match': etag! }
+    }))
+    expect(cached.status).toBe(304)
+
+    await app.handle(new Request('http://localhost/hitl/rules', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ tool: '*', pattern: '\\.env', message: '.env access' })
+    }))
+    const changed = await app.handle(new Request('http://localhost/hitl/rules', {
+      headers: { 'If-None-Match': etag! }
+    }))
+    expect(changed.status).toBe(200)
+    expect(changed.headers.get('etag')).not.toBe(etag)
+  })
+})